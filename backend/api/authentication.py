@@ -0,0 +1,259 @@
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .versions import bump, get_versions
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 5 * 60,
+    'KEY_PREFIX': 'auth-token',
+    'VERSION_CHECK_INTERVAL': None,
+}
+
+# Область счетчика версий, который увеличивается при отзыве токенов
+AUTH_SCOPE = 'auth'
+
+
+DOWNLOAD_LINK_DEFAULTS = {
+    'MAX_AGE': 60,
+}
+
+DOWNLOAD_LINK_SALT = 'api.download-link'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+def get_download_link_config():
+    return {**DOWNLOAD_LINK_DEFAULTS, **getattr(settings, 'DOWNLOAD_LINKS', {})}
+
+
+class CacheStats:
+    """Hit and miss counters of the token cache in this process."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.hits = self.misses = 0
+
+
+stats = CacheStats()
+
+
+class CacheVersion:
+    """
+    The version of the revoked tokens last seen by this process.
+
+    A cache local to the process does not see the invalidations made by
+    other processes, so every VERSION_CHECK_INTERVAL seconds the version
+    counter of AUTH_SCOPE is read from the database, and the cache is
+    cleared when another process has revoked tokens since the last check.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def check(self, cache, interval):
+        now = time.monotonic()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < interval:
+                return
+            self.checked_at = now
+
+        version = get_versions([AUTH_SCOPE])
+        with self.lock:
+            changed, self.version = version != self.version, version
+        if changed:
+            cache.clear()
+
+    def reset(self):
+        with self.lock:
+            self.version = self.checked_at = None
+
+
+cache_version = CacheVersion()
+
+
+def token_cache_key(key, config=None):
+    # Ключ токена не попадает в кэш в открытом виде
+    config = config or get_config()
+    return f"{config['KEY_PREFIX']}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def invalidate_tokens(*keys):
+    """
+    Removes tokens from the cache.
+
+    """
+    config = get_config()
+    caches[config['ALIAS']].delete_many([token_cache_key(key, config) for key in keys])
+    if config['VERSION_CHECK_INTERVAL'] is not None:
+        bump(AUTH_SCOPE)
+
+
+def invalidate_user(user_id):
+    """
+    Removes the tokens of a user from the cache.
+
+    """
+    invalidate_tokens(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+class CachedUser(SimpleLazyObject):
+    """
+    A user whose primary key and flags are known from the token cache.
+
+    The user row is loaded on first access to any other attribute, so a
+    request that only checks permissions does not query auth_user.
+    """
+
+    def __init__(self, pk, is_active, is_staff):
+        super().__init__(lambda: get_user_model().objects.get(pk=pk))
+        # Атрибуты в __dict__ находятся без загрузки пользователя
+        self.__dict__.update(
+            pk=pk, id=pk, is_active=is_active, is_staff=is_staff, is_authenticated=True, is_anonymous=False
+        )
+
+    def __bool__(self):
+        # Проверки прав начинаются с bool(request.user)
+        return True
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps authenticated tokens in a Django cache.
+
+    The cache maps the hash of a token key to the primary key, is_active
+    and is_staff of its user; neither the token nor the user row is stored.
+    A cached token is served without querying authtoken_token and
+    auth_user: request.user is a CachedUser and request.auth is the token
+    key in both cases. Entries expire after
+    TOKEN_AUTH_CACHE['TIMEOUT'] seconds; the size limit and the eviction
+    order are those of the cache backend.
+
+    The handlers in api.signals remove a token when it is deleted and the
+    tokens of a user when the user is saved, so logout, deactivation and
+    password changes take effect at once in the process that made them.
+    With a shared cache, such as Redis, they take effect in every process.
+    With a cache local to the process, TOKEN_AUTH_CACHE['VERSION_CHECK_INTERVAL']
+    must be set: other processes then drop their cached tokens within this
+    many seconds (see CacheVersion).
+    """
+
+    def authenticate_credentials(self, key):
+        config = get_config()
+        cache = caches[config['ALIAS']]
+        if config['VERSION_CHECK_INTERVAL'] is not None:
+            cache_version.check(cache, config['VERSION_CHECK_INTERVAL'])
+        cache_key = token_cache_key(key, config)
+
+        cached = cache.get(cache_key)
+        stats.count(hit=cached is not None)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, (user.pk, user.is_active, user.is_staff), timeout=config['TIMEOUT'])
+            return user, token.key
+
+        user_id, is_active, is_staff = cached
+        if not is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return CachedUser(user_id, is_active, is_staff), key
+
+
+def download_signer(path, params):
+    # Подпись действительна только для этого пути и этих параметров запроса
+    query = urlencode(sorted(
+        (key, value) for key, values in params.items() for value in values if key != 'signature'
+    ))
+    return signing.TimestampSigner(salt=f'{DOWNLOAD_LINK_SALT}:{path}?{query}')
+
+
+def sign_download(user, path, params):
+    """
+    Returns the 'signature' parameter of a download link for a user.
+
+    Args:
+        user: The user the link is issued to.
+        path: The path of the download.
+        params: The other query parameters of the link, a dictionary of lists.
+    """
+    return download_signer(path, params).sign(str(user.pk))
+
+
+class DownloadLinkAuthentication(BaseAuthentication):
+    """
+    Authenticates a request by the 'signature' query parameter of a download link.
+
+    A browser following a link can not send the token header, so downloads
+    use short-lived links created with sign_download. A link is bound to
+    the user, the path and the query parameters and expires after
+    DOWNLOAD_LINKS['MAX_AGE'] seconds.
+    """
+
+    def authenticate(self, request):
+        signature = request.query_params.get('signature')
+        if not signature:
+            return None
+
+        signer = download_signer(request.path, dict(request.query_params.lists()))
+        try:
+            user_id = signer.unsign(signature, max_age=get_download_link_config()['MAX_AGE'])
+            user = get_user_model().objects.get(pk=user_id, is_active=True)
+        except (signing.BadSignature, get_user_model().DoesNotExist):
+            raise exceptions.AuthenticationFailed('Ссылка для скачивания недействительна или устарела')
+        return user, None
+
+
+def get_request_user(request):
+    """
+    Returns the user of a request outside of DRF views.
+
+    Session users are set by AuthenticationMiddleware; API clients are
+    authenticated with CachedTokenAuthentication.
+
+    Returns:
+        The active user, or None for anonymous requests.
+
+    Raises:
+        AuthenticationFailed: If the token is invalid.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        result = CachedTokenAuthentication().authenticate(request)
+        user = result[0] if result else None
+    return user if user is not None and user.is_active else None
@@ -0,0 +1,200 @@
+import datetime
+import math
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import Customer, Payment
+from .report_cache import ReportCache
+from .synthetic import SIZES, clear_dataset, generate_dataset
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+def percentile(values, q):
+    """Returns the q-th percentile of values using the nearest-rank method."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_user():
+    user, created = User.objects.get_or_create(
+        username=BENCHMARK_USERNAME, defaults={'is_staff': True}
+    )
+    if created:
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+    return user
+
+
+def clear_report_cache():
+    ReportCache().clear()
+
+
+def get_endpoints():
+    """
+    Returns the benchmarked requests for the current dataset.
+
+    Returns:
+        A list of dictionaries with 'name', 'method', 'url', 'data' and
+        'before', a callable run before every request or None.
+    """
+    customer_id = Customer.objects.order_by('id').values_list('id', flat=True).first()
+    last_date = Payment.objects.aggregate(last=Max('payment_date'))['last'] or datetime.date.today()
+    year = {
+        'start_date': (last_date - datetime.timedelta(days=364)).isoformat(),
+        'end_date': last_date.isoformat(),
+    }
+
+    def endpoint(name, url, data=None, method='get', before=None):
+        return {'name': name, 'method': method, 'url': url, 'data': data or {}, 'before': before}
+
+    endpoints = [
+        endpoint('auth-login', reverse('login'), {
+            'username': BENCHMARK_USERNAME, 'password': BENCHMARK_PASSWORD
+        }, method='post'),
+        endpoint('customers-list', reverse('customers-list'), {'limit': 50}),
+        endpoint('customers-filter', reverse('customers-list'), {'sex': 'true', 'name': 'Ив', 'limit': 50}),
+        endpoint('customers-search', reverse('customers-search'), {'q': 'Иван'}),
+        endpoint('customers-search-phone', reverse('customers-search'), {'q': '+7 (900) 00'}),
+        endpoint('financial-report', reverse('financial-report'), before=clear_report_cache),
+        endpoint('financial-report-year', reverse('financial-report'), year, before=clear_report_cache),
+        endpoint('financial-report-year-cached', reverse('financial-report'), year),
+        endpoint('financial-report-detail', reverse('financial-report-detail'), {**year, 'limit': 100}),
+        endpoint('financial-report-export-csv', reverse('financial-report-export'), {**year, 'type': 'csv'}),
+        endpoint('financial-report-cache', reverse('financial-report-cache')),
+    ]
+    if customer_id is not None:
+        endpoints.append(endpoint('customer-detail', reverse('customer-detail', args=[customer_id])))
+    return endpoints
+
+
+def send(client, endpoint):
+    """Sends a request and reads the whole response, including streamed content."""
+    response = getattr(client, endpoint['method'])(endpoint['url'], endpoint['data'])
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    response.close()
+    return response.status_code
+
+
+def measure(client, endpoint, iterations, warmup):
+    """
+    Measures the latency, query count and peak memory of one endpoint.
+
+    Peak memory is measured in a separate request, because tracemalloc
+    slows down the measured requests.
+    """
+    before = endpoint['before'] or (lambda: None)
+    for _ in range(warmup):
+        before()
+        send(client, endpoint)
+
+    timings = []
+    queries = []
+    statuses = set()
+    for _ in range(iterations):
+        before()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            statuses.add(send(client, endpoint))
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context))
+
+    before()
+    tracemalloc.start()
+    try:
+        send(client, endpoint)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'endpoint': endpoint['name'],
+        'method': endpoint['method'].upper(),
+        'url': endpoint['url'],
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(sizes, iterations=20, warmup=2, seed=0, log=None):
+    """
+    Benchmarks every endpoint through the Django test client.
+
+    For every dataset size the database is filled with a synthetic dataset
+    and each endpoint is requested 'iterations' times with token
+    authentication. The database is emptied before every size, so this
+    must only be run against a test database.
+
+    Args:
+        sizes: Names of dataset sizes from api.synthetic.SIZES.
+        iterations: The number of measured requests per endpoint.
+        warmup: The number of unmeasured requests sent first.
+        seed: The seed of the dataset generator.
+        log: An optional callable receiving progress messages.
+
+    Returns:
+        A dictionary with the environment description and a list of
+        results, one per (size, endpoint).
+    """
+    log = log or (lambda message: None)
+    results = []
+    datasets = {}
+    for size in sizes:
+        log(f'Generating the {size} dataset')
+        clear_dataset()
+        datasets[size] = generate_dataset(**SIZES[size], seed=seed)
+        clear_report_cache()
+
+        token, _ = Token.objects.get_or_create(user=benchmark_user())
+        client = Client(headers={'Authorization': f'Token {token.key}'})
+        for endpoint in get_endpoints():
+            result = measure(client, endpoint, iterations, warmup)
+            results.append({'size': size, **result})
+            log(f"{size:>8} {result['endpoint']:<30} p50={result['p50_ms']:.1f}ms "
+                f"p95={result['p95_ms']:.1f}ms queries={result['queries']} "
+                f"peak={result['peak_memory_kb']:.0f}KiB")
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'iterations': iterations,
+        'warmup': warmup,
+        'seed': seed,
+        'datasets': datasets,
+        'results': results,
+    }
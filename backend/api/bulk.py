@@ -0,0 +1,171 @@
+from django.db import transaction
+
+from .cube import payment_keys, refresh_cubes
+from .filters import CUSTOMER_FILTERS, filter_customers, parse_boolean
+from .models import Customer, Payment, normalize_name
+from .rollup import refresh_rollups
+from .search import index_customers, remove_customers
+from .serializers import CustomerSerializer
+from .signals import suspended
+from .versions import bump
+
+# Наибольшее число идентификаторов в одном запросе
+MAX_BULK_IDS = 10000
+# Размер пачки для запросов с IN (...), чтобы не упереться в лимит параметров SQLite
+CHUNK_SIZE = 500
+
+NAME_FIELDS = ('last_name', 'first_name', 'middle_name')
+# Поля, от которых зависят ячейки куба аналитики
+CUBE_FIELDS = ('sex', 'birth_date')
+
+
+def chunks(values, size=CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def select_customers(payload):
+    """
+    Returns the customers selected by a bulk request.
+
+    The payload contains either 'ids', a list of customer ids, or 'filter',
+    a mapping with the parameters of filter_customers. An empty filter is
+    rejected, so a request can not touch every customer by accident.
+
+    Raises:
+        ValueError: If the payload is not an object or the selection is
+            missing or invalid.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('Тело запроса должно быть объектом с ids или filter')
+    ids = payload.get('ids')
+    params = payload.get('filter')
+    if (ids is None) == (params is None):
+        raise ValueError('Укажите либо ids, либо filter')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in ids
+        ):
+            raise ValueError('Параметр ids должен быть непустым списком целых чисел')
+        if len(ids) > MAX_BULK_IDS:
+            raise ValueError(f'Параметр ids может содержать не более {MAX_BULK_IDS} значений')
+        return Customer.objects.filter(pk__in=ids)
+
+    if not isinstance(params, dict) or not params:
+        raise ValueError('Параметр filter должен быть непустым объектом')
+    unknown = set(params) - set(CUSTOMER_FILTERS)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры фильтра: {', '.join(sorted(unknown))}")
+    return filter_customers(Customer.objects.all(), params)
+
+
+def get_dry_run(request):
+    data = request.data if isinstance(request.data, dict) else {}
+    value = data.get('dry_run', request.query_params.get('dry_run', False))
+    return parse_boolean(value, 'dry_run')
+
+
+def validate_update(data):
+    """
+    Validates the fields of a bulk update.
+
+    phone_number is unique and can not be assigned to several customers,
+    so it can only be changed one customer at a time.
+
+    Raises:
+        ValueError: If no fields are given.
+        ValidationError: If a field is invalid.
+    """
+    if not isinstance(data, dict) or not data:
+        raise ValueError('Параметр data должен быть непустым объектом')
+    if 'phone_number' in data:
+        raise ValueError('Номер телефона нельзя изменить у нескольких покупателей сразу')
+
+    serializer = CustomerSerializer(data=data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def payment_months(customer_ids):
+    months = set()
+    for chunk in chunks(customer_ids):
+        months.update(Payment.objects.filter(customer_id__in=chunk).dates('payment_date', 'month'))
+    return months
+
+
+def update_customers(queryset, data, dry_run=False):
+    """
+    Updates the selected customers in a single transaction.
+
+    QuerySet.update does not send model signals, so the search index, the
+    analytics cube and the version counters are updated here once for all
+    customers.
+
+    Args:
+        queryset: The selected customers.
+        data: Validated field values.
+        dry_run: If True, only count the customers.
+
+    Returns:
+        The number of updated customers.
+    """
+    if dry_run:
+        return queryset.count()
+
+    with transaction.atomic():
+        # Идентификаторы фиксируются заранее: обновление может изменить поля фильтра
+        ids = list(queryset.values_list('id', flat=True))
+        if 'last_name' in data:
+            data = {**data, 'last_name_lower': normalize_name(data['last_name'])}
+        for chunk in chunks(ids):
+            Customer.objects.filter(pk__in=chunk).update(**data)
+            if set(NAME_FIELDS) & set(data):
+                index_customers(Customer.objects.filter(pk__in=chunk).only('id', *NAME_FIELDS))
+        if set(CUBE_FIELDS) & set(data):
+            keys = set()
+            for chunk in chunks(ids):
+                keys.update(payment_keys(Payment.objects.filter(customer_id__in=chunk)))
+            refresh_cubes(keys)
+        if ids:
+            bump('customer', payment_months(ids))
+    return len(ids)
+
+
+def delete_customers(queryset, dry_run=False):
+    """
+    Deletes the selected customers and their payments in a single transaction.
+
+    The per-row signal handlers are suspended during the cascaded delete;
+    the affected rollup rows and cube cells, the version counters and the
+    search index are updated once afterwards.
+
+    Args:
+        queryset: The selected customers.
+        dry_run: If True, only count the rows that would be deleted.
+
+    Returns:
+        A dictionary with the numbers of deleted customers and payments.
+    """
+    payments = Payment.objects.filter(customer__in=queryset)
+    if dry_run:
+        return {'customers': queryset.count(), 'payments': payments.count()}
+
+    with transaction.atomic(), suspended():
+        ids = list(queryset.values_list('id', flat=True))
+        keys = payment_keys(payments)
+        _, deleted = queryset.delete()
+
+        refresh_rollups(keys)
+        refresh_cubes(keys)
+        for chunk in chunks(ids):
+            remove_customers(chunk)
+        if keys:
+            bump('payment', {month for month, _ in keys})
+        if ids:
+            bump('customer', [])
+
+    return {
+        'customers': deleted.get(Customer._meta.label, 0),
+        'payments': deleted.get(Payment._meta.label, 0),
+    }
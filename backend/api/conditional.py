@@ -0,0 +1,77 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .report_cache import normalize_period
+from .versions import get_validators
+
+# Области данных, от которых зависят ответы со списком и карточкой покупателя
+CUSTOMER_SCOPES = ('customer',)
+
+
+def request_period(request):
+    """Returns the normalized period of the 'start_date' and 'end_date' parameters."""
+    return normalize_period(request.query_params.get('start_date'), request.query_params.get('end_date'))
+
+
+def make_etag(request, versions, last_modified):
+    """
+    Returns a strong ETag for the versions of the data behind a response.
+
+    Only the request path, the negotiated media type and the version
+    counters are hashed, never the response itself. The time of the last
+    write is included, so the tags differ after the counters are reset.
+    """
+    fingerprint = repr((
+        request.get_full_path(), getattr(request, 'accepted_media_type', None), versions, last_modified,
+    ))
+    return f'"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+
+
+def conditional_on_versions(scopes, get_period=None):
+    """
+    Answers conditional GET requests from the DataVersion counters.
+
+    The decorated view is called only when the If-None-Match or
+    If-Modified-Since header of the request does not match the current
+    counters; otherwise 304 is returned after a single query. The counters
+    read are stored in request.data_versions, so the view can reuse them.
+
+    Args:
+        scopes: Names of the data scopes the response is built from.
+        get_period: A callable returning the (start_date, end_date) of the
+            request, or None for responses that cover all months. If it
+            raises ValueError, the view is called to report the error.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            try:
+                start_date, end_date = get_period(request) if get_period else (None, None)
+            except ValueError:
+                return view(request, *args, **kwargs)
+
+            versions, last_modified = get_validators(scopes, start_date, end_date)
+            request.data_versions = versions
+            etag = make_etag(request, versions, last_modified)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                # Браузер хранит ответ и перед каждым использованием проверяет его по ETag,
+                # поэтому страницы фронтенда получают 304 без изменений в клиентском коде
+                patch_cache_control(response, private=True, no_cache=True)
+                # Представление зависит от формата ответа, см. api.renderers
+                patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,292 @@
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Concat, ExtractYear, TruncMonth
+
+from .filters import parse_boolean
+from .models import CubeCell, Payment
+from .periods import month_start, parse_month
+from .rollup import key_batches, month_key_filter, payment_key_filter
+
+# Нижние границы возрастных групп, кроме первой
+AGE_BANDS = (18, 25, 35, 45, 55, 65)
+
+CELL_FIELDS = ('language_id', 'teacher_id', 'revenue', 'payments', 'enrollments', 'grade_total', 'graded')
+
+# Измерение: поля ячейки и выражения, которые попадают в строку результата
+DIMENSIONS = {
+    'year': ((), {'year': ExtractYear('month')}),
+    'month': (('month',), {}),
+    'language': (('language_id',), {'language_name': F('language__name')}),
+    'course': (('course_id',), {'course_name': F('course__name')}),
+    'teacher': (('teacher_id',), {
+        'teacher_name': Concat('teacher__last_name', Value(' '), 'teacher__first_name'),
+    }),
+    'sex': (('sex',), {}),
+    'age_band': (('age_band',), {}),
+}
+
+# Показатель: суммируемые поля ячейки, из которых он вычисляется
+MEASURES = {
+    'revenue': ('revenue',),
+    'payments': ('payments',),
+    'enrollments': ('enrollments',),
+    'fill_rate': ('payments', 'enrollments'),
+    'avg_grade': ('grade_total', 'graded'),
+}
+
+ID_FILTERS = ('language', 'course', 'teacher')
+
+
+def band_label(lower, upper=None):
+    return f'{lower}+' if upper is None else f'{lower}-{upper - 1}'
+
+
+AGE_BAND_LABELS = tuple(
+    band_label(lower, upper) for lower, upper in zip((0, *AGE_BANDS), (*AGE_BANDS, None))
+)
+
+
+def age_band(birth_date, day):
+    """Returns the age band of a person born on birth_date at the given day."""
+    age = day.year - birth_date.year - ((day.month, day.day) < (birth_date.month, birth_date.day))
+    lower = 0
+    for upper in AGE_BANDS:
+        if age < upper:
+            return band_label(lower, upper)
+        lower = upper
+    return band_label(lower)
+
+
+def compute_cube_cells(payments=None):
+    """
+    Aggregates payments into unsaved CubeCell rows.
+
+    Every payment is an enrollment; paid payments add to the revenue and
+    graded payments to the grade total. The age band is taken at the
+    payment date, so a cell never changes as the customers grow older.
+
+    Args:
+        payments: A queryset of payment objects, all payments by default.
+
+    Returns:
+        A list of CubeCell instances ordered by month, course, sex and age band.
+    """
+    if payments is None:
+        payments = Payment.objects.all()
+
+    rows = payments.values_list(
+        'payment_date', 'course_id', 'course__language_id', 'course__teacher_id',
+        'customer__sex', 'customer__birth_date', 'status', 'amount', 'grade'
+    )
+
+    cells = {}
+    for payment_date, course_id, language_id, teacher_id, sex, birth_date, status, amount, grade in rows.iterator():
+        key = (month_start(payment_date), course_id, sex, age_band(birth_date, payment_date))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = CubeCell(
+                month=key[0], course_id=course_id, language_id=language_id,
+                teacher_id=teacher_id, sex=sex, age_band=key[3],
+            )
+        cell.enrollments += 1
+        if status == 'paid':
+            cell.payments += 1
+            cell.revenue += amount
+        if grade is not None:
+            cell.grade_total += grade
+            cell.graded += 1
+    return [cells[key] for key in sorted(cells)]
+
+
+def payment_keys(payments):
+    """Returns the (month, course_id) cube keys touched by the payments."""
+    return set(
+        payments.annotate(month=TruncMonth('payment_date')).values_list('month', 'course_id').distinct()
+    )
+
+
+def refresh_cube(month, course_id):
+    """
+    Recomputes the cells of a single (month, course) from its payments.
+
+    Args:
+        month: Any date within the month to refresh.
+        course_id: The course whose cells should be refreshed.
+    """
+    refresh_cubes([(month, course_id)])
+
+
+def refresh_cubes(keys):
+    """
+    Recomputes the cells of several (month, course) keys, see refresh_rollups.
+
+    Args:
+        keys: (month, course_id) pairs; a month may be any date within it.
+    """
+    for batch in key_batches(keys):
+        cells = compute_cube_cells(Payment.objects.filter(payment_key_filter(batch)))
+        # Без точки сохранения: пересчет обычно выполняется внутри транзакции записи платежа
+        with transaction.atomic(savepoint=False):
+            CubeCell.objects.filter(month_key_filter(batch)).delete()
+            CubeCell.objects.bulk_create(cells)
+
+
+@transaction.atomic
+def rebuild_cube(batch_size=1000):
+    """
+    Rebuilds the whole cube from the payments.
+
+    Returns:
+        The number of cells created.
+    """
+    CubeCell.objects.all().delete()
+    cells = compute_cube_cells()
+    CubeCell.objects.bulk_create(cells, batch_size=batch_size)
+    return len(cells)
+
+
+def check_cube():
+    """
+    Compares the stored cube with the cube computed from the payments.
+
+    Returns:
+        A list of human readable differences, empty if the cube is consistent.
+    """
+    def key(cell):
+        return cell.month, cell.course_id, cell.sex, cell.age_band
+
+    expected = {key(cell): cell for cell in compute_cube_cells()}
+    stored = {key(cell): cell for cell in CubeCell.objects.iterator()}
+
+    problems = []
+    for cell_key in sorted(expected.keys() | stored.keys()):
+        month, course_id, sex, band = cell_key
+        label = f"{month:%Y-%m} course={course_id} sex={sex} age={band}"
+        if cell_key not in stored:
+            problems.append(f"{label}: missing")
+        elif cell_key not in expected:
+            problems.append(f"{label}: unexpected")
+        else:
+            for field in CELL_FIELDS:
+                if getattr(expected[cell_key], field) != getattr(stored[cell_key], field):
+                    problems.append(
+                        f"{label}: {field} is {getattr(stored[cell_key], field)}, "
+                        f"expected {getattr(expected[cell_key], field)}"
+                    )
+    return problems
+
+
+def parse_names(value, allowed, label):
+    names = list(dict.fromkeys(name.strip() for name in (value or '').split(',') if name.strip()))
+    unknown = set(names) - set(allowed)
+    if unknown:
+        raise ValueError(f"Неизвестные {label}: {', '.join(sorted(unknown))}")
+    return names
+
+
+def parse_ids(value, name):
+    try:
+        return [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError:
+        raise ValueError(f"Параметр {name} должен быть списком целых чисел через запятую")
+
+
+def parse_cube_query(params):
+    """
+    Parses the query parameters of the analytics cube.
+
+    Supported parameters:
+        - dimensions: Comma separated names of DIMENSIONS to group by;
+          without dimensions the whole selection is rolled up into one row.
+        - measures: Comma separated names of MEASURES, all by default.
+        - start_month, end_month: Bounds of the months, 'YYYY-MM'.
+        - language, course, teacher: Comma separated ids to keep.
+        - sex: 'true' or 'false'.
+        - age_band: Comma separated labels of AGE_BAND_LABELS.
+
+    Returns:
+        A tuple (dimensions, measures, lookups) for query_cube.
+
+    Raises:
+        ValueError: If a parameter has an invalid value.
+    """
+    dimensions = parse_names(params.get('dimensions'), DIMENSIONS, 'измерения')
+    measures = parse_names(params.get('measures'), MEASURES, 'показатели') or list(MEASURES)
+
+    lookups = {}
+    if params.get('start_month'):
+        lookups['month__gte'] = parse_month(params['start_month'])
+    if params.get('end_month'):
+        lookups['month__lte'] = parse_month(params['end_month'])
+    for name in ID_FILTERS:
+        if params.get(name):
+            lookups[f'{name}_id__in'] = parse_ids(params[name], name)
+    if params.get('sex') not in (None, ''):
+        lookups['sex'] = parse_boolean(params['sex'], 'sex')
+    if params.get('age_band'):
+        lookups['age_band__in'] = parse_names(params['age_band'], AGE_BAND_LABELS, 'возрастные группы')
+    return dimensions, measures, lookups
+
+
+def measure_values(sums, measures):
+    values = {}
+    for measure in measures:
+        if measure == 'revenue':
+            values[measure] = float(sums['sum_revenue'] or 0)
+        elif measure in ('payments', 'enrollments'):
+            values[measure] = sums[f'sum_{measure}'] or 0
+        elif measure == 'fill_rate':
+            enrollments = sums['sum_enrollments']
+            values[measure] = round(sums['sum_payments'] / enrollments, 4) if enrollments else None
+        else:
+            graded = sums['sum_graded']
+            values[measure] = round(sums['sum_grade_total'] / graded, 2) if graded else None
+    return values
+
+
+def query_cube(dimensions=(), measures=tuple(MEASURES), lookups=None):
+    """
+    Aggregates the cube cells in a single grouped query.
+
+    Slicing and dicing are done with lookups on the cells, rolling up by
+    leaving dimensions out: the cells are summed over every dimension that
+    is not requested. Ratios are computed from the summed components, so
+    they stay correct at every level.
+
+    Args:
+        dimensions: Names of DIMENSIONS to group by; without dimensions
+            the result is a single row of totals.
+        measures: Names of MEASURES to compute.
+        lookups: Field lookups selecting the cells.
+
+    Returns:
+        A list of rows ordered by the dimensions. Every row contains the
+        dimension values (ids together with names) and the measures.
+    """
+    cells = CubeCell.objects.filter(**(lookups or {}))
+    sums = {
+        f'sum_{field}': Sum(field)
+        for measure in measures for field in MEASURES[measure]
+    }
+
+    if not dimensions:
+        return [measure_values(cells.aggregate(**sums), measures)]
+
+    fields, expressions, ordering = [], {}, []
+    for dimension in dimensions:
+        dimension_fields, dimension_expressions = DIMENSIONS[dimension]
+        fields.extend(dimension_fields)
+        expressions.update(dimension_expressions)
+        ordering.extend([*dimension_fields, *dimension_expressions])
+    columns = [*fields, *expressions]
+
+    rows = cells.values(*fields, **expressions).annotate(**sums).order_by(*ordering)
+
+    result = []
+    for row in rows:
+        data = {column: row[column] for column in columns}
+        if 'month' in data:
+            data['month'] = data['month'].strftime('%Y-%m')
+        data.update(measure_values(row, measures))
+        result.append(data)
+    return result
@@ -0,0 +1,66 @@
+from .models import normalize_name
+from .periods import to_date
+
+# Верхняя граница для поиска по префиксу через диапазон строк
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+# Параметры, которые понимает filter_customers
+CUSTOMER_FILTERS = ('sex', 'birth_date_from', 'birth_date_to', 'name')
+
+BOOLEAN_VALUES = {
+    'true': True, '1': True,
+    'false': False, '0': False,
+}
+
+
+def parse_boolean(value, name):
+    try:
+        return BOOLEAN_VALUES[str(value).lower()]
+    except KeyError:
+        raise ValueError(f"Параметр {name} должен быть true или false")
+
+
+def prefix_range(field, prefix):
+    """
+    Returns lookups selecting the values of a field that start with prefix.
+
+    Unlike startswith, a range condition can use a B-tree index on every
+    database backend.
+    """
+    return {
+        f'{field}__gte': prefix,
+        f'{field}__lt': prefix + PREFIX_UPPER_BOUND,
+    }
+
+
+def filter_customers(queryset, params):
+    """
+    Applies the customer list filters to a queryset.
+
+    Supported parameters:
+        - sex: 'true' or 'false'.
+        - birth_date_from, birth_date_to: Bounds of the birth date, 'YYYY-MM-DD'.
+        - name: Prefix of the last name, case-insensitive.
+
+    Args:
+        queryset: A queryset of Customer objects.
+        params: A mapping with the filter parameters.
+
+    Returns:
+        The filtered queryset.
+
+    Raises:
+        ValueError: If a parameter has an invalid value.
+    """
+    lookups = {}
+
+    if params.get('sex') not in (None, ''):
+        lookups['sex'] = parse_boolean(params['sex'], 'sex')
+    if params.get('birth_date_from'):
+        lookups['birth_date__gte'] = to_date(params['birth_date_from'])
+    if params.get('birth_date_to'):
+        lookups['birth_date__lte'] = to_date(params['birth_date_to'])
+    if params.get('name'):
+        lookups.update(prefix_range('last_name_lower', normalize_name(params['name'])))
+
+    return queryset.filter(**lookups)
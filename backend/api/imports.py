@@ -0,0 +1,158 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Customer, normalize_name, normalize_phone
+from .search import index_customers
+from .serializers import CustomerSerializer
+from .versions import bump
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class CustomerImportListSerializer(serializers.ListSerializer):
+    """
+    Validates every row of a batch and keeps the valid ones.
+
+    Unlike the default ListSerializer it does not discard the valid rows
+    when other rows have errors: validated_data is a list of
+    (index, data) pairs and row_errors maps row indexes to their errors.
+    """
+
+    def to_internal_value(self, data):
+        self.row_errors = {}
+        rows = []
+        for index, item in enumerate(data):
+            try:
+                rows.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                self.row_errors[index] = exc.detail
+        return rows
+
+
+class CustomerImportSerializer(CustomerSerializer):
+    """
+    CustomerSerializer without the per-row uniqueness query for phone_number.
+
+    Uniqueness is checked by import_customers with one query per batch.
+    """
+
+    class Meta(CustomerSerializer.Meta):
+        extra_kwargs = {'phone_number': {'validators': []}}
+        list_serializer_class = CustomerImportListSerializer
+
+
+def get_batch_size(value=None):
+    """
+    Returns the import batch size from a query parameter or the settings.
+
+    Raises:
+        ValueError: If the batch size is not a positive integer.
+    """
+    if value is None:
+        return getattr(settings, 'CUSTOMER_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    try:
+        batch_size = int(value)
+    except ValueError:
+        raise ValueError('Параметр batch_size должен быть целым числом')
+    if batch_size < 1:
+        raise ValueError('Параметр batch_size должен быть положительным')
+    return batch_size
+
+
+def body_too_large(request):
+    """
+    Returns True if the request body exceeds CUSTOMER_IMPORT_MAX_SIZE.
+
+    The size is taken from the Content-Length header, so an oversized body
+    is rejected before it is read.
+    """
+    max_size = getattr(settings, 'CUSTOMER_IMPORT_MAX_SIZE', DEFAULT_MAX_SIZE)
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or 0) > max_size
+    except ValueError:
+        return False
+
+
+def unique_phone_error():
+    field = Customer._meta.get_field('phone_number')
+    return field.error_messages['unique'] % {
+        'model_name': Customer._meta.verbose_name,
+        'field_label': field.verbose_name,
+    }
+
+
+def import_batch(rows, first_row, seen_phones):
+    """
+    Validates and inserts one batch of customers in a single transaction.
+
+    Returns:
+        A tuple (created, errors).
+    """
+    serializer = CustomerImportSerializer(data=rows, many=True)
+    serializer.is_valid()
+
+    errors = [
+        {'row': first_row + index, 'errors': row_errors}
+        for index, row_errors in serializer.row_errors.items()
+    ]
+    valid = [(first_row + index, data) for index, data in serializer.validated_data]
+
+    # Одна проверка уникальности телефонов на всю пачку
+    existing = set(
+        Customer.objects.filter(
+            phone_number__in=[data['phone_number'] for _, data in valid]
+        ).values_list('phone_number', flat=True)
+    )
+
+    customers = []
+    for row, data in valid:
+        phone_number = data['phone_number']
+        if phone_number in existing or phone_number in seen_phones:
+            errors.append({'row': row, 'errors': {'phone_number': [unique_phone_error()]}})
+            continue
+        seen_phones.add(phone_number)
+        customers.append(Customer(
+            **data, phone_digits=normalize_phone(phone_number), last_name_lower=normalize_name(data['last_name'])
+        ))
+
+    with transaction.atomic():
+        created = Customer.objects.bulk_create(customers)
+        # bulk_create не отправляет сигналы, поэтому индексы обновляются явно
+        index_customers(created)
+        if created:
+            bump('customer', [])
+
+    return len(created), errors
+
+
+def import_customers(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Imports customers in batches.
+
+    Every batch is validated with a single serializer call, checked for
+    duplicate phone numbers with a single query and inserted with
+    bulk_create in its own transaction. Invalid rows are skipped and
+    reported; valid rows are inserted.
+
+    Args:
+        rows: A list of dictionaries with customer fields.
+        batch_size: The number of rows per batch and transaction.
+
+    Returns:
+        A dictionary with the number of created customers and a list of
+        {'row': index, 'errors': {...}} entries, ordered by row.
+    """
+    created = 0
+    errors = []
+    seen_phones = set()
+    for start in range(0, len(rows), batch_size):
+        batch_created, batch_errors = import_batch(rows[start:start + batch_size], start, seen_phones)
+        created += batch_created
+        errors += batch_errors
+
+    return {
+        'created': created,
+        'errors': sorted(errors, key=lambda error: error['row']),
+    }
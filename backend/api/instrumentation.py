@@ -0,0 +1,50 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+# Наблюдатели за запросами текущего HTTP-запроса; контекст копируется в потоки sync_to_async
+_observers = ContextVar('query_observers', default=())
+
+
+def observe_queries(execute, sql, params, many, context):
+    observers = _observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for observer in observers:
+            observer.record(sql, params, many, elapsed)
+
+
+def install(connection, **kwargs):
+    if observe_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_queries)
+
+
+connection_created.connect(install, dispatch_uid='api.instrumentation.install')
+
+
+@contextmanager
+def observing(observer):
+    """
+    Passes every query of the current context to observer.record.
+
+    Unlike connection.execute_wrapper, which wraps only the connection of
+    the current thread, the observer also sees the queries made in threads
+    started with sync_to_async, because they run in a copy of the context.
+    observer.record is called with (sql, params, many, elapsed seconds) and
+    must be thread safe.
+    """
+    install(connection)
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
@@ -0,0 +1,119 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+
+from .models import Course, Teacher
+from .views.financial_report import get_activity_rows
+
+# Метрика: выражение над итогами преподавателя в запросе рейтинга
+SORT_METRICS = {
+    'revenue': 'totals.revenue',
+    'salary': 'totals.salary',
+    'students': 'totals.students',
+    'courses': 'COALESCE(courses_count.value, 0)',
+    'efficiency': 'CASE WHEN totals.revenue > 0 THEN totals.salary * 100.0 / totals.revenue ELSE 0 END',
+}
+
+DIRECTIONS = {'desc': 'DESC', 'asc': 'ASC'}
+
+# Имена столбцов объединенного запроса задаются списком столбцов CTE
+LEADERBOARD_SQL = """
+WITH activity (month, teacher_id, salary, revenue, students) AS ({activity})
+SELECT
+    teacher.id, teacher.last_name, teacher.first_name,
+    totals.salary, totals.revenue, totals.students, COALESCE(courses_count.value, 0),
+    RANK() OVER (ORDER BY {metric} {direction}) AS position,
+    COUNT(*) OVER () AS total
+FROM (
+    SELECT activity.teacher_id, SUM(activity.salary) AS salary, SUM(activity.revenue) AS revenue,
+           SUM(activity.students) AS students
+    FROM activity
+    GROUP BY activity.teacher_id
+) totals
+JOIN {teacher} teacher ON teacher.id = totals.teacher_id
+LEFT JOIN (
+    SELECT course.teacher_id, COUNT(*) AS value
+    FROM {course} course
+    GROUP BY course.teacher_id
+) courses_count ON courses_count.teacher_id = totals.teacher_id
+ORDER BY {metric} {direction}, teacher.id
+LIMIT %s OFFSET %s
+"""
+
+
+def parse_sort(sort, order):
+    """
+    Parses the 'sort' and 'order' query parameters of the leaderboard.
+
+    Returns:
+        A tuple (metric, direction), ('revenue', 'desc') by default.
+
+    Raises:
+        ValueError: If the metric or the direction is unknown.
+    """
+    sort = sort or 'revenue'
+    order = order or 'desc'
+    if sort not in SORT_METRICS:
+        raise ValueError(f"Неизвестная метрика сортировки: {sort}. Допустимые значения: {', '.join(SORT_METRICS)}")
+    if order not in DIRECTIONS:
+        raise ValueError('Параметр order должен быть asc или desc')
+    return sort, order
+
+
+def efficiency(salary, revenue):
+    return round((salary / revenue * 100) if revenue > 0 else 0, 2)
+
+
+def teacher_leaderboard(start_date=None, end_date=None, sort='revenue', order='desc', limit=10, offset=0):
+    """
+    Ranks the teachers active in a period by one of their statistics.
+
+    The activity of the period is aggregated by teacher, ranked with a
+    window function and cut to one page in a single query, so the cost of
+    a page does not depend on the number of teachers. The statistics match
+    get_teacher_statistics.
+
+    Args:
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+        sort: The metric to rank by, one of SORT_METRICS.
+        order: 'desc' for the best first, 'asc' for the worst first.
+        limit: The number of teachers to return.
+        offset: The number of teachers to skip.
+
+    Returns:
+        A tuple (rows, total), where total is the number of ranked teachers,
+        or 0 if the page is past the end. Teachers with equal values share
+        the same rank.
+    """
+    try:
+        activity, params = get_activity_rows(start_date, end_date).query.sql_with_params()
+    except EmptyResultSet:
+        return [], 0
+
+    sql = LEADERBOARD_SQL.format(
+        metric=SORT_METRICS[sort],
+        direction=DIRECTIONS[order],
+        activity=activity,
+        teacher=connection.ops.quote_name(Teacher._meta.db_table),
+        course=connection.ops.quote_name(Course._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        rows = cursor.fetchall()
+
+    leaderboard = []
+    for teacher_id, last_name, first_name, salary, revenue, students, courses_count, rank, _ in rows:
+        # SQLite суммирует денежные поля как числа с плавающей точкой; суммы в отчете точные до копейки
+        total_salary = round(float(salary), 2)
+        total_revenue = round(float(revenue), 2)
+        leaderboard.append({
+            'rank': rank,
+            'teacher_id': teacher_id,
+            'name': f"{last_name} {first_name}",
+            'total_salary': total_salary,
+            'total_revenue': total_revenue,
+            'total_students': students,
+            'courses_count': courses_count,
+            'efficiency': efficiency(total_salary, total_revenue),
+        })
+    return leaderboard, rows[0][-1] if rows else 0
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import close_months, open_past_months
+
+
+class Command(BaseCommand):
+    help = 'Freezes the report figures of past months as immutable snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            action='append',
+            dest='months',
+            metavar='YYYY-MM',
+            help='Month to close; may be repeated. By default all past months that are not closed yet.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of threads computing the months in parallel; 0 computes them in the main thread.',
+        )
+
+    def handle(self, *args, **options):
+        months = options['months'] or open_past_months()
+        if not months:
+            self.stdout.write('No months to close')
+            return
+
+        try:
+            closed = close_months(months, workers=options['workers'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {len(closed)} months: {closed[0]:%Y-%m} - {closed[-1]:%Y-%m}"
+        ))
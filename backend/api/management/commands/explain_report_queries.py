@@ -0,0 +1,56 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.periods import to_date
+from api.query_plans import explain_report_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN on the queries of the financial report and shows the index used '
+        'by each of them and the tables read with a full scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-date',
+            help='Start of the explained report period (YYYY-MM-DD); by default a year before the end date.',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='End of the explained report period (YYYY-MM-DD); by default today.',
+        )
+        parser.add_argument(
+            '--fail-on-scan',
+            action='append',
+            default=[],
+            metavar='TABLE',
+            help='Exit with an error if the table is read with a full scan; may be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end_date = to_date(options['end_date']) or datetime.date.today()
+            start_date = to_date(options['start_date']) or end_date - datetime.timedelta(days=365)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        results = explain_report_queries(start_date, end_date)
+        failed = []
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(result['case']))
+            self.stdout.write(f"  {result['sql'][:200]}")
+            self.stdout.write(f"  indexes: {', '.join(result['indexes']) or '-'}")
+            if result['full_scans']:
+                self.stdout.write(self.style.WARNING(f"  full scans: {', '.join(result['full_scans'])}"))
+            if options['verbosity'] > 1:
+                for line in result['plan']:
+                    self.stdout.write(f"    {line}")
+            failed.extend(
+                (result['case'], table) for table in result['full_scans'] if table in options['fail_on_scan']
+            )
+
+        if failed:
+            raise CommandError('Full table scans: ' + ', '.join(f'{table} ({case})' for case, table in failed))
+        self.stdout.write(self.style.SUCCESS(f"Explained {len(results)} queries"))
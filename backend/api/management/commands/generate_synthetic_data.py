@@ -0,0 +1,72 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.synthetic import SIZES, clear_dataset, generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Generates a reproducible synthetic dataset of customers, teachers, courses and payments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            choices=sorted(SIZES),
+            default='small',
+            help='Preset dataset size; the options below override its values.',
+        )
+        for name in ('customers', 'teachers', 'languages', 'courses', 'payments'):
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name}.')
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=3,
+            help='Length of the payment period in years.',
+        )
+        parser.add_argument(
+            '--start-date',
+            type=datetime.date.fromisoformat,
+            help='First day of the payment period, YYYY-MM-DD.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random generator.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of rows inserted per query.',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the existing customers, teachers, languages, courses and payments first.',
+        )
+
+    def handle(self, *args, **options):
+        sizes = {
+            name: options[name] if options[name] is not None else value
+            for name, value in SIZES[options['size']].items()
+        }
+
+        if options['clear']:
+            clear_dataset()
+            self.stdout.write('Existing data deleted')
+
+        try:
+            counts = generate_dataset(
+                **sizes,
+                start_date=options['start_date'],
+                years=options['years'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        summary = ', '.join(f'{name}={count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Dataset generated: {summary}'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cube import check_cube, rebuild_cube
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the analytics cube from payments and checks its consistency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check-only',
+            action='store_true',
+            help='Only compare the stored cube with the payments, without rebuilding it.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of cube cells inserted per query.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check_only']:
+            created = rebuild_cube(batch_size=options['batch_size'])
+            self.stdout.write(f"Cube rebuilt: {created} cells")
+
+        problems = check_cube()
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f"Cube is inconsistent: {len(problems)} differences")
+
+        self.stdout.write(self.style.SUCCESS('Cube is consistent'))
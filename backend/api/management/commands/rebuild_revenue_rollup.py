@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollup import check_rollup, rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly revenue rollup from payments and checks its consistency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check-only',
+            action='store_true',
+            help='Only compare the stored rollup with the payments, without rebuilding it.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows inserted per query.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check_only']:
+            created = rebuild_rollup(batch_size=options['batch_size'])
+            self.stdout.write(f"Rollup rebuilt: {created} rows")
+
+        problems = check_rollup()
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f"Rollup is inconsistent: {len(problems)} differences")
+
+        self.stdout.write(self.style.SUCCESS('Rollup is consistent'))
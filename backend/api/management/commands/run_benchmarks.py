@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import run_benchmarks
+from api.synthetic import SIZES
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the API endpoints on synthetic datasets and writes the results to a JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='small,medium',
+            help=f"Comma separated dataset sizes: {', '.join(SIZES)}.",
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Number of measured requests per endpoint.',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Number of unmeasured requests per endpoint.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the dataset generator.',
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark-results.json',
+            help='Path of the JSON file with the results.',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        unknown = set(sizes) - set(SIZES)
+        if unknown or not sizes:
+            raise CommandError(f"Unknown dataset sizes: {', '.join(sorted(unknown))}")
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive')
+
+        # Замеры выполняются на отдельной тестовой базе, рабочие данные не затрагиваются
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = run_benchmarks(
+                sizes,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,141 @@
+import bisect
+import threading
+
+from django.conf import settings
+
+from . import authentication
+from .report_cache import ReportCache
+
+DEFAULTS = {
+    # Границы корзин гистограммы времени ответа, в секундах
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    # Запросы к базе дольше порога пишутся в лог; None отключает лог
+    'SLOW_QUERY_MS': None,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PERFORMANCE_METRICS', {})}
+
+
+class RouteStats:
+    """Cumulative statistics of the requests to one route."""
+
+    def __init__(self, buckets):
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.db_duration = 0.0
+        self.queries = 0
+        self.response_bytes = 0
+        self.statuses = {}
+
+    def observe(self, index, duration, db_duration, queries, response_bytes, status):
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.duration += duration
+        self.db_duration += db_duration
+        self.queries += queries
+        self.response_bytes += response_bytes
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+class MetricsRegistry:
+    """
+    In-process request metrics, grouped by HTTP method and URL route.
+
+    Each worker process keeps its own registry; the counters grow from the
+    start of the process, as Prometheus expects from counters and histograms.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or get_config()['BUCKETS'])
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def observe(self, method, route, duration, db_duration, queries, response_bytes, status):
+        """
+        Records one request.
+
+        Args:
+            method: The HTTP method.
+            route: The URL pattern of the view, for example 'api/customers/<int:pk>/'.
+            duration: The wall time of the request in seconds.
+            db_duration: The time spent in database queries in seconds.
+            queries: The number of database queries.
+            response_bytes: The size of the response body.
+            status: The response status code.
+        """
+        index = bisect.bisect_left(self.buckets, duration)
+        with self.lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats(self.buckets)
+            stats.observe(index, duration, db_duration, queries, response_bytes, status)
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+
+        """
+        lines = []
+
+        def family(name, kind, description):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self.lock:
+            routes = sorted(self.routes.items())
+
+            family('api_request_duration_seconds', 'histogram', 'Wall time of API requests.')
+            for (method, route), stats in routes:
+                labels = f'method="{method}",route="{escape(route)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'api_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}')
+                lines.append(f'api_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            for name, attribute, description in (
+                ('api_request_db_duration_seconds_total', 'db_duration', 'Time spent in database queries.'),
+                ('api_request_queries_total', 'queries', 'Number of database queries.'),
+                ('api_response_bytes_total', 'response_bytes', 'Size of response bodies.'),
+            ):
+                family(name, 'counter', description)
+                for (method, route), stats in routes:
+                    value = getattr(stats, attribute)
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{method="{method}",route="{escape(route)}"}} {value}')
+
+            family('api_responses_total', 'counter', 'Number of responses by status code.')
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(
+                        f'api_responses_total{{method="{method}",route="{escape(route)}",status="{status}"}} {count}'
+                    )
+
+        cache_stats = ReportCache().stats()
+        for name in ('hits', 'misses', 'evictions'):
+            family(f'financial_report_cache_{name}_total', 'counter', f'Financial report cache {name}.')
+            lines.append(f'financial_report_cache_{name}_total {cache_stats[name]}')
+        family('financial_report_cache_entries', 'gauge', 'Financial reports in the cache.')
+        lines.append(f"financial_report_cache_entries {cache_stats['entries']}")
+
+        auth_stats = authentication.stats.snapshot()
+        for name in ('hits', 'misses'):
+            family(f'token_auth_cache_{name}_total', 'counter', f'Token authentication cache {name} in this process.')
+            lines.append(f'token_auth_cache_{name}_total {auth_stats[name]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import get_request_user
+from .instrumentation import observing
+from .metrics import get_config, registry
+from .profiling import profile_request
+
+logger = logging.getLogger('api.performance')
+
+
+class RequestTimer:
+    """Query observer that measures the queries of one request."""
+
+    def __init__(self, request, slow_query_ms):
+        self.request = request
+        self.slow_query_ms = slow_query_ms
+        self.queries = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, sql, params, many, elapsed):
+        with self.lock:
+            self.queries += 1
+            self.duration += elapsed
+        if self.slow_query_ms is not None and elapsed * 1000 >= self.slow_query_ms:
+            match = self.request.resolver_match
+            logger.warning(
+                'Slow query %.1f ms in %s: %s',
+                elapsed * 1000, match.view_name if match else self.request.path, sql
+            )
+
+
+def route_of(request):
+    match = request.resolver_match
+    return match.route if match else 'unmatched'
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request and reports the results in Server-Timing headers.
+
+    Records the wall time, the time and number of database queries and the
+    response size, and adds them to the per-route metrics served by the
+    metrics view. The headers of a streamed response are sent before its
+    body, so they cover the time until the response object is returned,
+    while the metrics are recorded after the whole body has been sent.
+
+    The middleware works in both sync and async chains; queries made by
+    async views in worker threads are counted as well. DB time is the sum
+    of the query times, so with concurrent queries it can exceed the wall time.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        timer = RequestTimer(request, self.config['SLOW_QUERY_MS'])
+        started = time.perf_counter()
+        with observing(timer):
+            response = self.get_response(request)
+        return self.finish(request, response, timer, started)
+
+    async def __acall__(self, request):
+        timer = RequestTimer(request, self.config['SLOW_QUERY_MS'])
+        started = time.perf_counter()
+        with observing(timer):
+            response = await self.get_response(request)
+        return self.finish(request, response, timer, started)
+
+    def finish(self, request, response, timer, started):
+        duration = time.perf_counter() - started
+        size = 0 if response.streaming else len(response.content)
+        timings = [
+            f'total;dur={duration * 1000:.1f}',
+            f'db;dur={timer.duration * 1000:.1f};desc="{timer.queries} queries"',
+            f'app;dur={max(duration - timer.duration, 0) * 1000:.1f}',
+            f'size;desc="{size} bytes"',
+        ]
+        # Представление могло добавить свои измерения, например время разделов отчета
+        if response.has_header('Server-Timing'):
+            timings.append(response['Server-Timing'])
+        response['Server-Timing'] = ', '.join(timings)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(request, response, response.streaming_content, timer, started)
+        else:
+            self.observe(request, response, timer, started, size)
+        return response
+
+    def stream(self, request, response, content, timer, started):
+        size = 0
+        with observing(timer):
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        self.observe(request, response, timer, started, size)
+
+    def observe(self, request, response, timer, started, size):
+        registry.observe(
+            request.method, route_of(request), time.perf_counter() - started,
+            timer.duration, timer.queries, size, response.status_code
+        )
+
+
+def is_staff(request):
+    """
+    Returns True if the request is made by a staff user.
+
+    DRF authenticates API requests inside the views, so the user is
+    determined here with get_request_user.
+    """
+    try:
+        user = get_request_user(request)
+    except AuthenticationFailed:
+        return False
+    return bool(user and user.is_staff)
+
+
+def wants_profile(request):
+    return request.GET.get('profile') == '1'
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when a staff user adds 'profile=1' to the query string.
+
+    The profile and the list of SQL queries are saved by profile_request,
+    and the file name of the profile, relative to PROFILING['DIRECTORY'],
+    is returned in the X-Profile header. Other
+    requests are passed through without any additional work. In an async
+    chain the profiled request is run synchronously in a worker thread, so
+    the profiler sees the sync views that Django runs in the same thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not wants_profile(request) or not is_staff(request):
+            return self.get_response(request)
+        return self.profile(self.get_response, request)
+
+    async def __acall__(self, request):
+        if not wants_profile(request) or not await sync_to_async(is_staff)(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.profile)(async_to_sync(self.get_response), request)
+
+    def profile(self, get_response, request):
+        response, name = profile_request(get_response, request)
+        response['X-Profile'] = name
+        return response
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def fill_monthly_revenue(apps, schema_editor):
+    Payment = apps.get_model('api', 'Payment')
+    MonthlyRevenue = apps.get_model('api', 'MonthlyRevenue')
+
+    rows = Payment.objects.annotate(
+        month=TruncMonth('payment_date')
+    ).values(
+        'month', 'course_id', 'course__teacher_id', 'course__price', 'course__teacher__salary'
+    ).annotate(
+        paid=Count('id', filter=Q(status='paid'))
+    ).order_by('month', 'course_id')
+
+    MonthlyRevenue.objects.bulk_create((
+        MonthlyRevenue(
+            month=row['month'],
+            course_id=row['course_id'],
+            teacher_id=row['course__teacher_id'],
+            revenue=row['course__price'] * row['paid'],
+            payment_count=row['paid'],
+            teacher_salary=row['course__teacher__salary'],
+            teacher_active=row['paid'] > 0,
+        )
+        for row in rows.iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_course_teacher_delete_teachercourse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('teacher_salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('teacher_active', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.course')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.teacher')),
+            ],
+            options={
+                'unique_together': {('month', 'course', 'teacher')},
+            },
+        ),
+        migrations.RunPython(fill_monthly_revenue, migrations.RunPython.noop),
+    ]
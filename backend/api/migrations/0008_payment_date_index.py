@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'id'], name='api_payment_payment_ef8b6a_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_payment_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['last_name', 'id'], name='api_custome_last_na_c44b66_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['sex', 'last_name', 'id'], name='api_custome_sex_c6920c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['birth_date'], name='api_custome_birth_d_c626a4_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:26
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_phone_digits(apps, schema_editor):
+    Customer = apps.get_model('api', 'Customer')
+
+    batch = []
+    for customer in Customer.objects.only('id', 'phone_number').iterator(chunk_size=2000):
+        customer.phone_digits = re.sub(r'\D', '', customer.phone_number or '')
+        batch.append(customer)
+        if len(batch) >= 2000:
+            Customer.objects.bulk_update(batch, ['phone_digits'])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, ['phone_digits'])
+
+
+def create_name_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE api_customer_fts USING fts5("
+            "last_name, first_name, middle_name, tokenize='unicode61', prefix='2 3')"
+        )
+        schema_editor.execute(
+            "INSERT INTO api_customer_fts (rowid, last_name, first_name, middle_name) "
+            "SELECT id, last_name, first_name, COALESCE(middle_name, '') FROM api_customer"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in ('last_name', 'first_name', 'middle_name'):
+            schema_editor.execute(
+                f"CREATE INDEX api_customer_{field}_trgm ON api_customer USING gin ({field} gin_trgm_ops)"
+            )
+
+
+def drop_name_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_customer_fts")
+    elif vendor == 'postgresql':
+        for field in ('last_name', 'first_name', 'middle_name'):
+            schema_editor.execute(f"DROP INDEX IF EXISTS api_customer_{field}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_customer_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=30),
+        ),
+        migrations.RunPython(fill_phone_digits, migrations.RunPython.noop),
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
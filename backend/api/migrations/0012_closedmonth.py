@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClosedMonthActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('teacher_id', models.PositiveBigIntegerField()),
+                ('salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('payment_count', models.PositiveIntegerField()),
+                ('closed_month', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='api.closedmonth')),
+            ],
+            options={
+                'unique_together': {('month', 'teacher_id')},
+            },
+        ),
+    ]
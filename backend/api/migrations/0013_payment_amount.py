@@ -0,0 +1,45 @@
+from django.db import migrations, models, transaction
+from django.db.models import Max, Min, OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def fill_amounts(apps, schema_editor):
+    """
+    Copies the current course price into the amount of existing payments.
+
+    Payments are updated in ranges of BATCH_SIZE primary keys, each in its
+    own transaction, so the table is never locked for the whole backfill.
+    """
+    Course = apps.get_model('api', 'Course')
+    Payment = apps.get_model('api', 'Payment')
+
+    bounds = Payment.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return
+
+    price = Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('price')[:1])
+    for start in range(bounds['first'], bounds['last'] + 1, BATCH_SIZE):
+        with transaction.atomic():
+            Payment.objects.filter(
+                pk__range=[start, start + BATCH_SIZE - 1], amount__isnull=True
+            ).update(amount=price)
+
+
+class Migration(migrations.Migration):
+
+    # Каждая пачка платежей фиксируется в своей транзакции
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_closedmonth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(fill_amounts, migrations.RunPython.noop),
+    ]
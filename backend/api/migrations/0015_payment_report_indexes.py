@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_alter_payment_amount'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.course'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'payment_date', 'course', 'amount'], name='api_payment_status_9a31d6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['course', 'payment_date', 'status', 'amount'], name='api_payment_course__b38f46_idx'),
+        ),
+    ]
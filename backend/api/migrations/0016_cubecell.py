@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_payment_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CubeCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('sex', models.BooleanField()),
+                ('age_band', models.CharField(max_length=5)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('grade_total', models.PositiveIntegerField(default=0)),
+                ('graded', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.course')),
+                ('language', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.language')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.teacher')),
+            ],
+            options={
+                'unique_together': {('month', 'course', 'sex', 'age_band')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# Нижние границы возрастных групп, как в api.cube.AGE_BANDS на момент миграции
+AGE_BANDS = (18, 25, 35, 45, 55, 65)
+
+
+def age_band(birth_date, day):
+    age = day.year - birth_date.year - ((day.month, day.day) < (birth_date.month, birth_date.day))
+    lower = 0
+    for upper in AGE_BANDS:
+        if age < upper:
+            return f'{lower}-{upper - 1}'
+        lower = upper
+    return f'{lower}+'
+
+
+def fill_cube_cells(apps, schema_editor):
+    """
+    Builds the cells of the analytics cube from the existing payments.
+
+    Without it the cube of an existing database stays empty until the
+    rebuild_analytics_cube command is run, and the analytics endpoint
+    answers with zeros.
+    """
+    Payment = apps.get_model('api', 'Payment')
+    CubeCell = apps.get_model('api', 'CubeCell')
+
+    rows = Payment.objects.values_list(
+        'payment_date', 'course_id', 'course__language_id', 'course__teacher_id',
+        'customer__sex', 'customer__birth_date', 'status', 'amount', 'grade'
+    )
+
+    cells = {}
+    for payment_date, course_id, language_id, teacher_id, sex, birth_date, status, amount, grade in rows.iterator():
+        key = (payment_date.replace(day=1), course_id, sex, age_band(birth_date, payment_date))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = CubeCell(
+                month=key[0], course_id=course_id, language_id=language_id,
+                teacher_id=teacher_id, sex=sex, age_band=key[3],
+            )
+        cell.enrollments += 1
+        if status == 'paid':
+            cell.payments += 1
+            cell.revenue += amount
+        if grade is not None:
+            cell.grade_total += grade
+            cell.graded += 1
+
+    CubeCell.objects.bulk_create((cells[key] for key in sorted(cells)), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_cubecell'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_cube_cells, migrations.RunPython.noop),
+    ]
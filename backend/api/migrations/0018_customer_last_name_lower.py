@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+def fill_last_name_lower(apps, schema_editor):
+    Customer = apps.get_model('api', 'Customer')
+
+    # LOWER() в SQLite не переводит в нижний регистр кириллицу, поэтому значения считаются в Python
+    batch = []
+    for customer in Customer.objects.only('id', 'last_name').iterator(chunk_size=2000):
+        customer.last_name_lower = (customer.last_name or '').lower()
+        batch.append(customer)
+        if len(batch) >= 2000:
+            Customer.objects.bulk_update(batch, ['last_name_lower'])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, ['last_name_lower'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_fill_cubecell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_name_lower',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(fill_last_name_lower, migrations.RunPython.noop),
+    ]
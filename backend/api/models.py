@@ -1,14 +1,54 @@
+import re
+import uuid
+
 from django.db import models
 
+
+def normalize_phone(phone_number):
+    """Returns only the digits of a phone number."""
+    return re.sub(r'\D', '', phone_number or '')
+
+
+def normalize_name(name):
+    """Returns a name in lower case for the case-insensitive prefix filter."""
+    return (name or '').lower()
+
+
 # Create your models here.
 class Customer(models.Model):
     last_name = models.CharField(max_length=50)
+    # Фамилия в нижнем регистре, для фильтра по префиксу без учета регистра
+    last_name_lower = models.CharField(max_length=50, blank=True, editable=False, db_index=True)
     first_name = models.CharField(max_length=50)
     middle_name = models.CharField(max_length=50, blank=True, null=True)
     phone_number = models.CharField(max_length=30, unique=True)
+    # Только цифры номера телефона, для поиска по префиксу
+    phone_digits = models.CharField(max_length=30, blank=True, editable=False, db_index=True)
     sex = models.BooleanField()
     birth_date = models.DateField()
 
+    class Meta:
+        indexes = [
+            # Постраничная выборка и поиск по префиксу фамилии
+            models.Index(fields=['last_name', 'id']),
+            # Фильтр по полу с тем же порядком
+            models.Index(fields=['sex', 'last_name', 'id']),
+            # Фильтр по диапазону дат рождения
+            models.Index(fields=['birth_date']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.phone_digits = normalize_phone(self.phone_number)
+        self.last_name_lower = normalize_name(self.last_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if 'phone_number' in update_fields:
+                update_fields = {*update_fields, 'phone_digits'}
+            if 'last_name' in update_fields:
+                update_fields = {*update_fields, 'last_name_lower'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
 
@@ -56,21 +96,184 @@ class Payment(models.Model):
     ]
 
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    # Отдельный индекс не нужен: course_id - первый столбец составного индекса ниже
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, db_index=False)
     payment_date = models.DateField()
+    # Цена курса на момент оплаты; заполняется автоматически, если не задана
+    amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
     status = models.CharField(max_length=10, choices=PAYMENT_STATUS_CHOICES)
     grade = models.PositiveIntegerField(blank=True, null=True)
 
     class Meta:
         unique_together = ['customer', 'course', 'payment_date']
+        indexes = [
+            # Порядок детальной таблицы отчета и ключ постраничной выборки
+            models.Index(fields=['payment_date', 'id']),
+            # Оплаты неполных месяцев отчета: status='paid' и диапазон дат,
+            # курс и сумма читаются из индекса без обращения к таблице
+            models.Index(fields=['status', 'payment_date', 'course', 'amount']),
+            # Пересчет строки сводки (курс, месяц) и месяцы оплат курса
+            models.Index(fields=['course', 'payment_date', 'status', 'amount']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.amount is None:
+            self.amount = self.course.price
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.customer} - {self.course} ({self.payment_date})"
 
 
+class MonthlyRevenue(models.Model):
+    """
+    Rollup of payments by (month, course, teacher).
+
+    Maintained incrementally by the signal handlers in api.signals and
+    rebuilt from scratch by the rebuild_revenue_rollup management command.
+    """
+    month = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    teacher_salary = models.DecimalField(max_digits=10, decimal_places=2)
+    teacher_active = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ['month', 'course', 'teacher']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.course} ({self.payment_count})"
+
+
+class CubeCell(models.Model):
+    """
+    Payments aggregated by (month, course, customer sex, customer age band).
+
+    The course determines the language and the teacher, which are stored
+    in the cell so the cube can be grouped by them without joins. Maintained
+    incrementally by the signal handlers in api.signals and rebuilt from
+    scratch by the rebuild_analytics_cube management command.
+    """
+    month = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    language = models.ForeignKey(Language, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
+    sex = models.BooleanField()
+    # Возраст покупателя на дату оплаты, см. api.cube.AGE_BANDS
+    age_band = models.CharField(max_length=5)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Оплаченные платежи и все записи на курс, включая неоплаченные
+    payments = models.PositiveIntegerField(default=0)
+    enrollments = models.PositiveIntegerField(default=0)
+    grade_total = models.PositiveIntegerField(default=0)
+    graded = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['month', 'course', 'sex', 'age_band']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.course} {self.age_band} ({self.enrollments})"
+
+
+class ClosedMonth(models.Model):
+    """
+    Month whose report figures are frozen.
+
+    Created by api.snapshots together with the ClosedMonthActivity rows of
+    the month and never changed afterwards.
+    """
+    month = models.DateField(unique=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}"
+
+
+class ClosedMonthActivity(models.Model):
+    """
+    Frozen (month, teacher) activity of a closed month.
+
+    The rows have the format of the report activity, so the monthly
+    figures, the teacher statistics and the totals of a closed month are
+    derived from them the same way as from the live data.
+    """
+    closed_month = models.ForeignKey(ClosedMonth, on_delete=models.CASCADE, related_name='activity')
+    month = models.DateField()
+    # Не внешний ключ: снимок не должен меняться при удалении преподавателя
+    teacher_id = models.PositiveBigIntegerField()
+    salary = models.DecimalField(max_digits=10, decimal_places=2)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    payment_count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['month', 'teacher_id']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} teacher={self.teacher_id}"
+
+
 class TeacherLanguage(models.Model):
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
     language = models.ForeignKey(Language, on_delete=models.CASCADE)
 
     def __str__(self):
         return f"{self.teacher} - {self.language}"
+
+
+class DataVersion(models.Model):
+    """
+    Write version counter of a data scope, optionally narrowed to a month.
+
+    Maintained by api.versions and used to validate cached results.
+    """
+    scope = models.CharField(max_length=30)
+    period = models.CharField(max_length=7, blank=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['scope', 'period']
+
+    def __str__(self):
+        return f"{self.scope}:{self.period or 'all'} v{self.version}"
+
+
+class ReportJob(models.Model):
+    """
+    Financial report computed in the background.
+
+    Created and run by api.report_jobs. The result is stored as
+    gzip-compressed JSON and removed after the retention period.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Случайный идентификатор, чтобы чужие задания нельзя было перебрать
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    start_date = models.DateField(blank=True, null=True)
+    end_date = models.DateField(blank=True, null=True)
+    # Разделы отчета через '+', как в ключе ReportCache
+    sections = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    result = models.BinaryField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Поиск незавершенного задания с теми же параметрами
+            models.Index(fields=['start_date', 'end_date', 'sections', 'status']),
+            # Удаление устаревших заданий
+            models.Index(fields=['finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
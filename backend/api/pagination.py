@@ -0,0 +1,132 @@
+import base64
+import binascii
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .periods import to_date
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """
+    Encodes the key values of the last row of a page into an opaque cursor.
+
+    """
+    data = json.dumps(list(values), cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def cursor_string(value):
+    """Returns a string key value of a cursor."""
+    if not isinstance(value, str):
+        raise TypeError('Ожидается строка')
+    return value
+
+
+def cursor_integer(value):
+    """Returns an integer key value of a cursor."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError('Ожидается целое число')
+    return value
+
+
+def cursor_date(value):
+    """Returns a date key value of a cursor, stored as 'YYYY-MM-DD'."""
+    return to_date(cursor_string(value))
+
+
+def decode_cursor(cursor, size, converters=None):
+    """
+    Decodes a cursor created by encode_cursor.
+
+    Args:
+        cursor: The cursor string or None.
+        size: The expected number of key values.
+        converters: Optional callables converting every key value, e.g.
+            cursor_string, cursor_integer or cursor_date. They raise TypeError or
+            ValueError for a value of a wrong type.
+
+    Returns:
+        A list of key values, or None if no cursor was given.
+
+    Raises:
+        CursorError: If the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError('Некорректный курсор')
+    if not isinstance(values, list) or len(values) != size:
+        raise CursorError('Некорректный курсор')
+    if converters is not None:
+        try:
+            values = [convert(value) for convert, value in zip(converters, values)]
+        except (TypeError, ValueError):
+            raise CursorError('Некорректный курсор')
+    return values
+
+
+def get_limit(request, default=100, maximum=1000):
+    """
+    Returns the page size from the 'limit' query parameter.
+
+    Raises:
+        ValueError: If the limit is not a positive integer.
+    """
+    limit = request.query_params.get('limit')
+    if limit is None:
+        return default
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('Параметр limit должен быть целым числом')
+    if limit < 1:
+        raise ValueError('Параметр limit должен быть положительным')
+    return min(limit, maximum)
+
+
+def keyset_filter(ordering, values):
+    """
+    Builds a filter selecting the rows that follow the given key values.
+
+    For ordering ('a', 'b') and values (x, y) it is equivalent to
+    (a, b) > (x, y), expressed so that an index on (a, b) can be used.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        step = Q(**{f'{field}__gt': values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return condition
+
+
+def paginate_keyset(queryset, ordering, after, limit, key):
+    """
+    Returns one page of a queryset using keyset pagination.
+
+    Args:
+        queryset: The queryset to paginate.
+        ordering: Field names forming a unique ordering.
+        after: Key values of the last row of the previous page, or None.
+        limit: The page size.
+        key: A callable returning the key values of a row.
+
+    Returns:
+        A tuple (rows, next_cursor), where next_cursor is None on the last page.
+    """
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(ordering, after))
+
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(key(rows[limit - 1]))
+    return rows, None
@@ -0,0 +1,55 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def read_csv(stream, encoding='utf-8'):
+    """
+    Reads CSV rows with a header line into a list of dictionaries.
+
+    Raises:
+        ParseError: If the data cannot be decoded as CSV.
+    """
+    if codecs.lookup(encoding).name == 'utf-8':
+        # Пропускаем BOM, который добавляет Excel
+        encoding = 'utf-8-sig'
+    try:
+        reader = csv.DictReader(codecs.iterdecode(stream, encoding))
+        return [dict(row) for row in reader]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ParseError(f"Некорректный CSV: {e}")
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body with a header line into a list of dictionaries.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return read_csv(stream, encoding)
+
+
+class StreamingJSONParser(BaseParser):
+    """
+    Parses a JSON body read directly from the request stream.
+
+    DRF reads the body for its JSONParser through request.body, which is
+    limited by DATA_UPLOAD_MAX_MEMORY_SIZE. Views with large bodies use this
+    parser and check their own limit instead.
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return json.load(codecs.getreader(encoding)(stream))
+        except ValueError as e:
+            raise ParseError(f"Некорректный JSON: {e}")
@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+
+from django.utils.dateparse import parse_date
+
+
+def to_date(value):
+    """
+    Converts a 'YYYY-MM-DD' string (or a date) to a date object.
+
+    Raises:
+        ValueError: If the value is not a valid date.
+    """
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        # Дата в верном формате, но несуществующая, например 2024-13-01
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"Некорректная дата: {value}")
+    return parsed
+
+
+def parse_month(value):
+    """
+    Converts a 'YYYY-MM' string (or a date) to the first day of the month.
+
+    Raises:
+        ValueError: If the value is not a valid month.
+    """
+    if isinstance(value, date):
+        return month_start(value)
+    try:
+        year, month = (int(part) for part in str(value).split('-'))
+        return date(year, month, 1)
+    except ValueError:
+        raise ValueError(f"Некорректный месяц: {value}")
+
+
+def month_start(day):
+    """Returns the first day of the month of the given date."""
+    return day.replace(day=1)
+
+
+def next_month(day):
+    """Returns the first day of the month following the given date."""
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+def month_end(day):
+    """Returns the last day of the month of the given date."""
+    return next_month(day) - timedelta(days=1)
+
+
+def iter_months(first, last):
+    """Yields the first day of every month between two dates, inclusive."""
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def split_range(start_date, end_date):
+    """
+    Splits a date range into whole months and partial edge ranges.
+
+    Args:
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+
+    Returns:
+        A tuple (full_months, partial_ranges), where full_months is a
+        (first_month, last_month) pair of month starts or None, and
+        partial_ranges is a list of (start, end) date pairs that cover the
+        incomplete months at the edges of the range.
+    """
+    if start_date > end_date:
+        return None, []
+
+    first_full = start_date if start_date.day == 1 else next_month(start_date)
+    if end_date == month_end(end_date):
+        last_full = month_start(end_date)
+    else:
+        last_full = month_start(month_start(end_date) - timedelta(days=1))
+
+    if first_full > last_full:
+        # Диапазон не содержит ни одного полного месяца
+        if month_start(start_date) == month_start(end_date):
+            return None, [(start_date, end_date)]
+        return None, [(start_date, month_end(start_date)), (month_start(end_date), end_date)]
+
+    partial_ranges = []
+    if start_date < first_full:
+        partial_ranges.append((start_date, first_full - timedelta(days=1)))
+    if end_date > month_end(last_full):
+        partial_ranges.append((next_month(last_full), end_date))
+    return (first_full, last_full), partial_ranges
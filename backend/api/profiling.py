@@ -0,0 +1,119 @@
+import cProfile
+import json
+import os
+import re
+import threading
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from .instrumentation import observing
+
+DEFAULTS = {
+    # Каталог для файлов профилей
+    'DIRECTORY': 'profiles',
+    # 'auto' выбирает pyinstrument, если он установлен, иначе cProfile
+    'PROFILER': 'auto',
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+class QueryRecorder:
+    """Query observer that records the SQL queries of a profiled request."""
+
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def record(self, sql, params, many, elapsed):
+        with self.lock:
+            self.queries.append({
+                'sql': sql,
+                # Для executemany сохраняется только число наборов параметров
+                'params': len(params) if many else params,
+                'many': many,
+                'duration_ms': round(elapsed * 1000, 3),
+            })
+
+
+def pyinstrument_available():
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def profile_path(directory, request):
+    name = re.sub(r'[^\w-]+', '_', request.path.strip('/')) or 'root'
+    filename = f"{timezone.now():%Y%m%dT%H%M%S}-{name}-{uuid.uuid4().hex[:8]}.prof"
+    return os.path.join(directory, filename)
+
+
+def run_cprofile(get_response, request, path):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(get_response, request)
+    finally:
+        profiler.dump_stats(path)
+
+
+def run_pyinstrument(get_response, request, path):
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import PstatsRenderer
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        return get_response(request)
+    finally:
+        profiler.stop()
+        # PstatsRenderer возвращает данные marshal, декодированные с surrogateescape
+        with open(path, 'wb') as output:
+            output.write(profiler.output(PstatsRenderer()).encode('utf-8', errors='surrogateescape'))
+
+
+def profile_request(get_response, request, config=None):
+    """
+    Runs a request under a profiler and saves the profile and its SQL queries.
+
+    The profile is written in the pstats format to a '.prof' file, which
+    can be opened with pstats, snakeviz or similar tools. The queries are
+    written next to it to a '.sql.json' file.
+
+    Args:
+        get_response: The next middleware or view.
+        request: The request to profile.
+        config: The profiling settings, see get_config.
+
+    Returns:
+        A tuple (response, name of the '.prof' file relative to the directory).
+    """
+    config = config or get_config()
+    directory = str(config['DIRECTORY'])
+    os.makedirs(directory, exist_ok=True)
+    path = profile_path(directory, request)
+
+    profiler = config['PROFILER']
+    if profiler == 'auto':
+        profiler = 'pyinstrument' if pyinstrument_available() else 'cprofile'
+    run = run_pyinstrument if profiler == 'pyinstrument' else run_cprofile
+
+    recorder = QueryRecorder()
+    with observing(recorder):
+        response = run(get_response, request, path)
+
+    with open(path[:-len('.prof')] + '.sql.json', 'w', encoding='utf-8') as output:
+        json.dump({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'profiler': profiler,
+            'queries': recorder.queries,
+        }, output, ensure_ascii=False, indent=2, default=str)
+
+    # Абсолютный путь на сервере клиенту не сообщается
+    return response, os.path.relpath(path, directory)
@@ -0,0 +1,114 @@
+import re
+import threading
+
+from django.db import connection, transaction
+
+from .instrumentation import observing
+from .models import Course, Payment
+from .periods import month_end, month_start
+from .rollup import compute_rollup_rows
+from .views.financial_detail import DETAIL_ORDERING
+from .views.financial_report import DETAIL_FIELDS, FinancialReport, get_filtered_payments
+
+# Имена индексов в планах SQLite, PostgreSQL и MySQL
+INDEX_RE = re.compile(
+    r'USING (?:COVERING |PRIMARY KEY )?INDEX (\w+)'
+    r'|Index (?:Only )?Scan (?:Backward )?using (\w+)'
+    r'|Bitmap Index Scan on (\w+)'
+)
+FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$|Seq Scan on (\w+)')
+
+
+class QueryCollector:
+    """Collects the SELECT statements passed to instrumentation.observing."""
+
+    def __init__(self):
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def record(self, sql, params, many, elapsed):
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            with self._lock:
+                self.queries.append((sql, params))
+
+
+def get_cases(start_date, end_date):
+    """
+    Returns the report workloads whose queries are explained.
+
+    Every workload is cheap to run: the aggregated report sections, the
+    first page of the detail rows and the refresh of one rollup row.
+
+    Returns:
+        A list of (label, callable) pairs.
+    """
+    course_id = Course.objects.values_list('pk', flat=True).order_by('pk').first()
+    month = month_start(end_date)
+    return [
+        ('report-aggregates', lambda: FinancialReport(start_date, end_date).build(('totals', 'monthly', 'teachers'))),
+        ('report-detail-page', lambda: list(
+            get_filtered_payments(start_date, end_date).values_list('id', *DETAIL_FIELDS).order_by(*DETAIL_ORDERING)[:100]
+        )),
+        ('rollup-refresh', lambda: list(compute_rollup_rows(
+            Payment.objects.filter(course_id=course_id, payment_date__range=[month, month_end(month)])
+        ))),
+        ('course-months', lambda: list(
+            Payment.objects.filter(course_id=course_id).dates('payment_date', 'month')
+        )),
+    ]
+
+
+def explain(sql, params):
+    """
+    Returns the lines of the query plan of a statement.
+
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        return [row[3] for row in rows]
+    return [' '.join(str(value) for value in row) for row in rows]
+
+
+def summarize(plan):
+    """
+    Returns the indexes used by a plan and the tables read with a full scan.
+
+    """
+    indexes, scans = [], []
+    for line in plan:
+        line = line.strip()
+        for match in INDEX_RE.finditer(line):
+            indexes.append(next(name for name in match.groups() if name))
+        match = FULL_SCAN_RE.search(line)
+        if match:
+            scans.append(next(name for name in match.groups() if name))
+    return indexes, scans
+
+
+def explain_report_queries(start_date, end_date):
+    """
+    Runs the report workloads and explains every SELECT they execute.
+
+    The workloads run in a transaction that is rolled back, so the data is
+    never changed.
+
+    Returns:
+        A list of dictionaries with 'case', 'sql', 'plan', 'indexes' and
+        'full_scans' keys.
+    """
+    results = []
+    with transaction.atomic():
+        for label, run in get_cases(start_date, end_date):
+            collector = QueryCollector()
+            with observing(collector):
+                run()
+            for sql, params in collector.queries:
+                plan = explain(sql, params)
+                indexes, scans = summarize(plan)
+                results.append({
+                    'case': label, 'sql': sql, 'plan': plan, 'indexes': indexes, 'full_scans': scans,
+                })
+        transaction.set_rollback(True)
+    return results
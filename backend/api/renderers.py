@@ -0,0 +1,132 @@
+import importlib.util
+from datetime import date
+from decimal import Decimal
+from itertools import chain
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+# Ключи ответов, под которыми лежат таблицы - списки однотипных словарей
+TABULAR_KEYS = ('detailed_data', 'monthly_stats', 'teacher_stats', 'results')
+
+
+def encode_strings(values):
+    """
+    Dictionary-encodes a column of repeated strings.
+
+    Returns:
+        A tuple (dictionary, codes), where codes are the positions of the
+        values in the dictionary, or None if the column is not worth
+        encoding: it has other values than strings or mostly unique ones.
+    """
+    distinct = {}
+    for value in values:
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return None
+        distinct.setdefault(value, len(distinct))
+    if not distinct or len(distinct) * 2 > len(values):
+        return None
+    return list(distinct), [None if value is None else distinct[value] for value in values]
+
+
+def to_columns(rows):
+    """
+    Converts a list of dictionaries into a columnar table.
+
+    String columns with repeated values, such as dates, course names and
+    statuses, are dictionary-encoded: the column holds positions in the
+    list of its distinct values.
+
+    Returns:
+        A dictionary with 'columns', the key names in the order of their
+        first appearance, 'dictionaries', the distinct values of the encoded
+        columns by name, and 'rows', the values of every row as a list.
+    """
+    columns = list(dict.fromkeys(chain.from_iterable(rows)))
+    values = [[row.get(column) for row in rows] for column in columns]
+
+    dictionaries = {}
+    for position, column in enumerate(columns):
+        encoded = encode_strings(values[position])
+        if encoded:
+            dictionaries[column], values[position] = encoded
+    return {
+        'columns': columns,
+        'dictionaries': dictionaries,
+        'rows': [list(row) for row in zip(*values)],
+    }
+
+
+def columnar(data):
+    """
+    Returns the response data with its tables in the columnar layout.
+
+    A top level list and the lists under TABULAR_KEYS are converted with
+    to_columns; other values, such as totals, cursors and errors, are kept.
+    The data itself is not modified, so cached reports can be rendered.
+    """
+    if isinstance(data, list):
+        return to_columns(data)
+    if isinstance(data, dict):
+        return {
+            key: to_columns(value) if key in TABULAR_KEYS and isinstance(value, list) else value
+            for key, value in data.items()
+        }
+    return data
+
+
+def msgpack_available():
+    return importlib.util.find_spec('msgpack') is not None
+
+
+def encode_value(value):
+    # Деньги передаются числом, даты - строкой ISO 8601, как в JSON
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Renders tables as {"columns": [...], "rows": [[...], ...]}.
+
+    Selected with 'Accept: application/vnd.columnar+json' or '?format=columnar'.
+    Key names are sent once per table instead of once per row.
+    """
+    media_type = 'application/vnd.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders the columnar layout in MessagePack.
+
+    Selected with 'Accept: application/msgpack' or '?format=msgpack' and
+    available only when the msgpack package is installed.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(columnar(data), default=encode_value, use_bin_type=True)
+
+
+# Рендереры ответов с большими таблицами: JSON по умолчанию и компактные форматы по запросу клиента
+TABULAR_RENDERERS = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    ColumnarJSONRenderer,
+    *([MessagePackRenderer] if msgpack_available() else []),
+]
@@ -0,0 +1,147 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .periods import to_date
+from .versions import get_versions
+
+
+REPORT_SCOPES = ('payment', 'course', 'teacher', 'customer')
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'MAX_ENTRIES': 32,
+    'TIMEOUT': 60 * 60,
+    'KEY_PREFIX': 'financial-report',
+}
+
+_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FINANCIAL_REPORT_CACHE', {})}
+
+
+def normalize_period(start_date=None, end_date=None):
+    """
+    Normalizes the report period to a pair of dates.
+
+    A period with a missing bound covers all payments, the same way
+    get_filtered_payments treats it.
+    """
+    if not (start_date and end_date):
+        return None, None
+    return to_date(start_date), to_date(end_date)
+
+
+class ReportCache:
+    """
+    LRU cache of financial reports on top of a Django cache backend.
+
+    Every entry stores the write versions of the data it was built from.
+    An entry is served only while the versions of the months it covers
+    are unchanged, so writes to other months keep it valid. The LRU order
+    is kept in a separate cache key, which makes the cache bounded on
+    backends without their own eviction policy, such as the file cache.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.cache = caches[self.config['ALIAS']]
+        self.prefix = self.config['KEY_PREFIX']
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def entry_key(self, start_date, end_date, *extra):
+        if start_date is None:
+            return self._key('all', *extra)
+        return self._key(start_date.isoformat(), end_date.isoformat(), *extra)
+
+    def _count(self, name, delta=1):
+        key = self._key('stats', name)
+        if not self.cache.add(key, delta, timeout=None):
+            try:
+                self.cache.incr(key, delta)
+            except ValueError:
+                self.cache.set(key, delta, timeout=None)
+
+    def _touch(self, key):
+        lru_key = self._key('lru')
+        with _lock:
+            order = [k for k in self.cache.get(lru_key, []) if k != key]
+            order.append(key)
+            evicted = order[:max(0, len(order) - self.config['MAX_ENTRIES'])]
+            order = order[len(evicted):]
+            self.cache.set(lru_key, order, timeout=None)
+        if evicted:
+            self.cache.delete_many(evicted)
+            self._count('evictions', len(evicted))
+
+    def lookup(self, start_date, end_date, *extra, versions=None):
+        """
+        Looks up the cached report for a period.
+
+        The versions of the period are read unless the caller has already
+        read them, for example to answer a conditional request.
+
+        Returns:
+            A tuple (report, key, versions); report is None on a miss. The
+            key and the versions are passed to store with the built report.
+        """
+        key = self.entry_key(start_date, end_date, *extra)
+        if versions is None:
+            versions = get_versions(REPORT_SCOPES, start_date, end_date)
+
+        entry = self.cache.get(key)
+        if entry is not None and entry['versions'] == versions:
+            self._count('hits')
+            self._touch(key)
+            return entry['report'], key, versions
+
+        self._count('misses')
+        return None, key, versions
+
+    def store(self, key, versions, report):
+        self.cache.set(key, {'versions': versions, 'report': report}, timeout=self.config['TIMEOUT'])
+        self._touch(key)
+
+    def get_or_build(self, start_date, end_date, build, *extra, versions=None):
+        """
+        Returns the cached report for a period or builds and caches it.
+
+        Args:
+            start_date: The normalized start date of the period or None.
+            end_date: The normalized end date of the period or None.
+            build: A callable that builds the report.
+            extra: Additional key parts, such as the requested sections.
+            versions: The versions of REPORT_SCOPES for the period, if already read.
+
+        Returns:
+            A tuple (report, hit).
+        """
+        report, key, versions = self.lookup(start_date, end_date, *extra, versions=versions)
+        if report is not None:
+            return report, True
+
+        report = build()
+        self.store(key, versions, report)
+        return report, False
+
+    def stats(self):
+        values = self.cache.get_many([self._key('stats', name) for name in ('hits', 'misses', 'evictions')])
+        hits = values.get(self._key('stats', 'hits'), 0)
+        misses = values.get(self._key('stats', 'misses'), 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': values.get(self._key('stats', 'evictions'), 0),
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0,
+            'entries': len(self.cache.get(self._key('lru'), [])),
+            'max_entries': self.config['MAX_ENTRIES'],
+        }
+
+    def clear(self):
+        keys = self.cache.get(self._key('lru'), [])
+        self.cache.delete_many(keys + [self._key('lru')])
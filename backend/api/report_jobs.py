@@ -0,0 +1,200 @@
+import datetime
+import gzip
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ReportJob
+from .report_cache import ReportCache
+from .views.financial_report import build_financial_report
+
+logger = logging.getLogger('api.report_jobs')
+
+DEFAULTS = {
+    'MAX_WORKERS': 2,
+    'RETENTION': 24 * 60 * 60,
+    'TIMEOUT': 60 * 60,
+    'PENDING_TIMEOUT': 60,
+    'COMPRESS_LEVEL': 6,
+}
+
+IN_FLIGHT = ('pending', 'running')
+
+_executors = {}
+_lock = threading.Lock()
+# Задания, которые стоят в очереди пула этого процесса и еще не начаты
+_queued = set()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REPORT_JOBS', {})}
+
+
+def get_executor(max_workers):
+    with _lock:
+        if max_workers not in _executors:
+            _executors[max_workers] = ThreadPoolExecutor(max_workers, thread_name_prefix='report-job')
+        return _executors[max_workers]
+
+
+def compress_report(report, level=DEFAULTS['COMPRESS_LEVEL']):
+    data = json.dumps(report, ensure_ascii=False, separators=(',', ':')).encode()
+    return gzip.compress(data, compresslevel=level)
+
+
+def decompress_report(data):
+    return json.loads(gzip.decompress(data))
+
+
+def cleanup_jobs(config=None):
+    """
+    Deletes the jobs finished before the retention period.
+
+    Jobs that have been pending or running for longer than TIMEOUT, for
+    example because the process running them was restarted, are marked
+    as failed, so they are no longer merged with new requests. Pending
+    jobs are queued again well before that, see resume_orphaned_job.
+
+    Returns:
+        The number of deleted jobs.
+    """
+    config = config or get_config()
+    now = timezone.now()
+    ReportJob.objects.filter(
+        status__in=IN_FLIGHT,
+        created_at__lt=now - datetime.timedelta(seconds=config['TIMEOUT'])
+    ).update(status='failed', error='Задание прервано', finished_at=now)
+    deleted, _ = ReportJob.objects.filter(
+        finished_at__lt=now - datetime.timedelta(seconds=config['RETENTION'])
+    ).delete()
+    return deleted
+
+
+def run_job(job_id, config=None):
+    """
+    Computes the report of a pending job and stores the compressed result.
+
+    The report is taken from ReportCache when possible, so a job for a
+    period that was just requested synchronously costs one cache lookup.
+    A job that is already claimed by another worker is skipped.
+    """
+    config = config or get_config()
+    claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = ReportJob.objects.defer('result').get(pk=job_id)
+
+    sections = tuple(job.sections.split('+'))
+    try:
+        report, _ = ReportCache().get_or_build(
+            job.start_date, job.end_date,
+            lambda: build_financial_report(job.start_date, job.end_date, sections),
+            job.sections
+        )
+        result = compress_report(report, config['COMPRESS_LEVEL'])
+    except Exception as e:
+        logger.exception('Report job %s failed', job_id)
+        ReportJob.objects.filter(pk=job_id).update(status='failed', error=str(e), finished_at=timezone.now())
+        return
+    ReportJob.objects.filter(pk=job_id).update(status='done', result=result, finished_at=timezone.now())
+
+
+def run_job_in_worker(job_id, config):
+    # Поток пула держит свое соединение с базой; закрываем его так же, как в конце запроса
+    close_old_connections()
+    try:
+        run_job(job_id, config)
+    finally:
+        with _lock:
+            _queued.discard(job_id)
+        close_old_connections()
+
+
+def dispatch_job(job, config):
+    """
+    Queues a pending job in the thread pool of this process.
+
+    The job is queued after the transaction commits; with zero workers it
+    is computed before the function returns and the job is refreshed.
+    """
+    if not config['MAX_WORKERS']:
+        run_job(job.pk, config)
+        job.refresh_from_db(fields=['status', 'error', 'started_at', 'finished_at'])
+        return
+
+    with _lock:
+        _queued.add(job.pk)
+    executor = get_executor(config['MAX_WORKERS'])
+    transaction.on_commit(lambda: executor.submit(run_job_in_worker, job.pk, config))
+
+
+def resume_orphaned_job(job, config=None):
+    """
+    Queues a pending job again if it is not queued in this process.
+
+    A pending job lives only in the queue of the process that created it,
+    so it is never started if that process is restarted. Once a job has
+    been pending for PENDING_TIMEOUT seconds, the next request that merges
+    into it or polls it queues it in its own process. If the original
+    worker is alive after all, the claim in run_job lets only one of them
+    compute the report.
+
+    Returns:
+        True if the job was queued again.
+    """
+    config = config or get_config()
+    if job.status != 'pending':
+        return False
+    if job.created_at > timezone.now() - datetime.timedelta(seconds=config['PENDING_TIMEOUT']):
+        return False
+    with _lock:
+        if job.pk in _queued:
+            return False
+    logger.warning('Report job %s was not started, queueing it again', job.pk)
+    dispatch_job(job, config)
+    return True
+
+
+def submit_job(start_date, end_date, sections):
+    """
+    Creates a background job computing the financial report for a period.
+
+    A request identical to a pending or running job is merged into it, so
+    the same report is never computed twice at the same time within one
+    process; a merged job that was left pending by another process is
+    queued again (see resume_orphaned_job). The job is started in a
+    bounded thread pool (REPORT_JOBS['MAX_WORKERS']) after the transaction
+    commits; with zero workers it is computed before the function returns.
+
+    Args:
+        start_date: The normalized start date of the period or None.
+        end_date: The normalized end date of the period or None.
+        sections: Names of the report sections.
+
+    Returns:
+        A tuple (job, created), where created is False for a merged request.
+    """
+    config = get_config()
+    cleanup_jobs(config)
+
+    key = '+'.join(sections)
+    with _lock:
+        job = ReportJob.objects.filter(
+            start_date=start_date, end_date=end_date, sections=key, status__in=IN_FLIGHT
+        ).defer('result').order_by('created_at').first()
+        created = job is None
+        if created:
+            job = ReportJob.objects.create(start_date=start_date, end_date=end_date, sections=key)
+
+    if created:
+        dispatch_job(job, config)
+    else:
+        resume_orphaned_job(job, config)
+    return job, created
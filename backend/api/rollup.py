@@ -0,0 +1,199 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import MonthlyRevenue, Payment
+from .periods import month_end, month_start
+
+
+ROLLUP_FIELDS = ('teacher_id', 'revenue', 'payment_count', 'teacher_salary', 'teacher_active')
+
+# Число ключей (месяц, курс), пересчитываемых одним набором запросов
+KEY_BATCH_SIZE = 500
+
+
+def group_keys(keys):
+    """Groups (month, course_id) keys into {month start: course ids}."""
+    courses = defaultdict(set)
+    for month, course_id in keys:
+        courses[month_start(month)].add(course_id)
+    return courses
+
+
+def payment_key_filter(keys):
+    """Returns a filter selecting the payments of the given (month, course_id) keys."""
+    condition = Q()
+    for month, course_ids in group_keys(keys).items():
+        condition |= Q(payment_date__range=[month, month_end(month)], course_id__in=course_ids)
+    return condition
+
+
+def month_key_filter(keys):
+    """Returns a filter selecting the rollup rows or cube cells of the given (month, course_id) keys."""
+    condition = Q()
+    for month, course_ids in group_keys(keys).items():
+        condition |= Q(month=month, course_id__in=course_ids)
+    return condition
+
+
+def key_batches(keys):
+    keys = sorted({(month_start(month), course_id) for month, course_id in keys})
+    for start in range(0, len(keys), KEY_BATCH_SIZE):
+        yield keys[start:start + KEY_BATCH_SIZE]
+
+
+def compute_rollup_rows(payments=None):
+    """
+    Aggregates payments into unsaved MonthlyRevenue rows.
+
+    Args:
+        payments: A queryset of payment objects, all payments by default.
+
+    Yields:
+        MonthlyRevenue instances, one per (month, course) with any payment.
+    """
+    if payments is None:
+        payments = Payment.objects.all()
+
+    rows = payments.annotate(
+        month=TruncMonth('payment_date')
+    ).values(
+        'month', 'course_id', 'course__teacher_id', 'course__teacher__salary'
+    ).annotate(
+        paid=Count('id', filter=Q(status='paid')),
+        paid_amount=Sum('amount', filter=Q(status='paid'))
+    ).order_by('month', 'course_id')
+
+    for row in rows.iterator():
+        yield MonthlyRevenue(
+            month=row['month'],
+            course_id=row['course_id'],
+            teacher_id=row['course__teacher_id'],
+            revenue=row['paid_amount'] or 0,
+            payment_count=row['paid'],
+            teacher_salary=row['course__teacher__salary'],
+            teacher_active=row['paid'] > 0,
+        )
+
+
+def refresh_rollup(month, course_id):
+    """
+    Recomputes a single (month, course) rollup row from its payments.
+
+    Args:
+        month: Any date within the month to refresh.
+        course_id: The course whose row should be refreshed.
+    """
+    refresh_rollups([(month, course_id)])
+
+
+def refresh_rollups(keys):
+    """
+    Recomputes the rollup rows of several (month, course) keys.
+
+    The keys are refreshed in batches of KEY_BATCH_SIZE with three queries
+    per batch, however many keys and payments it has.
+
+    Args:
+        keys: (month, course_id) pairs; a month may be any date within it.
+    """
+    for batch in key_batches(keys):
+        rows = list(compute_rollup_rows(Payment.objects.filter(payment_key_filter(batch))))
+        # Без точки сохранения: пересчет обычно выполняется внутри транзакции записи
+        with transaction.atomic(savepoint=False):
+            MonthlyRevenue.objects.filter(month_key_filter(batch)).delete()
+            MonthlyRevenue.objects.bulk_create(rows)
+
+
+@transaction.atomic
+def rebuild_rollup(batch_size=1000):
+    """
+    Rebuilds the whole rollup table from the payments.
+
+    Returns:
+        The number of rollup rows created.
+    """
+    MonthlyRevenue.objects.all().delete()
+
+    created = 0
+    batch = []
+    for row in compute_rollup_rows():
+        batch.append(row)
+        if len(batch) >= batch_size:
+            MonthlyRevenue.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        MonthlyRevenue.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def check_rollup():
+    """
+    Compares the stored rollup with the rollup computed from the payments.
+
+    Returns:
+        A list of human readable differences, empty if the rollup is consistent.
+    """
+    expected = {(row.month, row.course_id): row for row in compute_rollup_rows()}
+    stored = {(row.month, row.course_id): row for row in MonthlyRevenue.objects.iterator()}
+
+    problems = []
+    for key in sorted(expected.keys() | stored.keys()):
+        month, course_id = key
+        label = f"{month:%Y-%m} course={course_id}"
+        if key not in stored:
+            problems.append(f"{label}: missing")
+        elif key not in expected:
+            problems.append(f"{label}: unexpected")
+        else:
+            for field in ROLLUP_FIELDS:
+                if getattr(expected[key], field) != getattr(stored[key], field):
+                    problems.append(
+                        f"{label}: {field} is {getattr(stored[key], field)}, "
+                        f"expected {getattr(expected[key], field)}"
+                    )
+    return problems
+
+
+def rollup_activity_rows(first_month=None, last_month=None, exclude_months=None):
+    """
+    Returns the unevaluated, unordered queryset of rollup_activity.
+
+    Args:
+        first_month: The first month to include, all months if omitted.
+        last_month: The last month to include.
+        exclude_months: Months to skip, for example a queryset of the
+            closed months; it is used as a subquery.
+    """
+    rows = MonthlyRevenue.objects.filter(teacher_active=True)
+    if first_month and last_month:
+        rows = rows.filter(month__range=[first_month, last_month])
+    if exclude_months is not None:
+        rows = rows.exclude(month__in=exclude_months)
+
+    return rows.values(
+        'month', 'teacher_id'
+    ).annotate(
+        salary=Max('teacher_salary'),
+        revenue=Sum('revenue'),
+        count=Sum('payment_count')
+    )
+
+
+def rollup_activity(first_month=None, last_month=None):
+    """
+    Aggregates the rollup by (month, teacher) for active teachers.
+
+    Args:
+        first_month: The first month to include, all months if omitted.
+        last_month: The last month to include.
+
+    Returns:
+        A list of dictionaries with 'month', 'teacher_id', 'salary', 'revenue'
+        and 'count' keys, ordered by month and teacher.
+    """
+    return list(rollup_activity_rows(first_month, last_month).order_by('month', 'teacher_id'))
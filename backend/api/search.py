@@ -0,0 +1,182 @@
+import re
+
+from django.db import connection
+from django.db.models import F, Lookup, Q
+
+from .filters import prefix_range
+from .models import Customer, normalize_phone
+
+FTS_TABLE = 'api_customer_fts'
+
+# Символы, которые допускаются в запросе по номеру телефона
+PHONE_QUERY_RE = re.compile(r'^[\d\s()+-]+$')
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fts_enabled():
+    """Returns True if customer names are indexed in the SQLite FTS5 table."""
+    return connection.vendor == 'sqlite'
+
+
+def index_customers(customers):
+    """
+    Writes the names of customers to the full-text index.
+
+    Used directly after bulk operations, which do not send model signals.
+    """
+    customers = list(customers)
+    if not fts_enabled() or not customers:
+        return
+    remove_customers(customer.pk for customer in customers)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, last_name, first_name, middle_name) VALUES (%s, %s, %s, %s)",
+            [
+                [customer.pk, customer.last_name, customer.first_name, customer.middle_name or '']
+                for customer in customers
+            ]
+        )
+
+
+def index_customer(customer):
+    """
+    Writes the names of a customer to the full-text index.
+
+    """
+    index_customers([customer])
+
+
+def remove_customers(ids):
+    """
+    Removes customers from the full-text index.
+
+    """
+    ids = list(ids)
+    if not fts_enabled() or not ids:
+        return
+    with connection.cursor() as cursor:
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", ids)
+
+
+def clear_index():
+    """
+    Removes all customers from the full-text index.
+
+    """
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+
+def is_phone_query(query):
+    return bool(PHONE_QUERY_RE.match(query)) and bool(normalize_phone(query))
+
+
+def search_by_phone(query, limit, offset):
+    return list(
+        Customer.objects.filter(
+            **prefix_range('phone_digits', normalize_phone(query))
+        ).order_by('phone_digits')[offset:offset + limit]
+    )
+
+
+def fts_match_expression(tokens):
+    # Каждое слово ищется как префикс: "Ива"* "Пет"*
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def search_by_name_fts(tokens, limit, offset):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY rank LIMIT %s OFFSET %s",
+            [fts_match_expression(tokens), limit, offset]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    customers = Customer.objects.in_bulk(ids)
+    return [customers[pk] for pk in ids if pk in customers]
+
+
+class ILike(Lookup):
+    """
+    Matches a column against a LIKE pattern ignoring case.
+
+    Unlike icontains, which compiles to UPPER(column) LIKE UPPER(pattern) on
+    PostgreSQL, the column is compared as is, so the gin_trgm_ops indexes
+    created in migration 0010 can serve the filter.
+    """
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', [*lhs_params, *rhs_params]
+
+
+def search_by_name_trigram(tokens, limit, offset):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    condition = Q()
+    for token in tokens:
+        # Подстрока в любом месте имени, символы % и _ экранируются
+        pattern = '%{}%'.format(connection.ops.prep_for_like_query(token))
+        condition &= (
+            ILike(F('last_name'), pattern)
+            | ILike(F('first_name'), pattern)
+            | ILike(F('middle_name'), pattern)
+        )
+    query = ' '.join(tokens)
+    return list(
+        Customer.objects.filter(condition).annotate(
+            similarity=TrigramSimilarity('last_name', query) + TrigramSimilarity('first_name', query)
+        ).order_by('-similarity', 'last_name', 'id')[offset:offset + limit]
+    )
+
+
+def search_by_name_prefix(tokens, limit, offset):
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(last_name__istartswith=token)
+            | Q(first_name__istartswith=token)
+            | Q(middle_name__istartswith=token)
+        )
+    return list(Customer.objects.filter(condition).order_by('last_name', 'id')[offset:offset + limit])
+
+
+def search_customers(query, limit=20, offset=0):
+    """
+    Searches customers by a part of the name or by the beginning of the phone number.
+
+    A query made of digits and phone punctuation is matched against the
+    normalized phone number. Any other query is split into words, and
+    every word has to match the last, first or middle name: as a prefix
+    with the FTS5 index on SQLite, as a substring anywhere in the name with
+    the trigram indexes on PostgreSQL and as a prefix with a plain filter
+    elsewhere. Name matches are ordered by relevance.
+
+    Args:
+        query: The search string.
+        limit: The maximum number of customers to return.
+        offset: The number of best matches to skip.
+
+    Returns:
+        A list of Customer objects.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if is_phone_query(query):
+        return search_by_phone(query, limit, offset)
+
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return []
+    if fts_enabled():
+        return search_by_name_fts(tokens, limit, offset)
+    if connection.vendor == 'postgresql':
+        return search_by_name_trigram(tokens, limit, offset)
+    return search_by_name_prefix(tokens, limit, offset)
@@ -1,7 +1,47 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Customer
+from .models import Customer, ReportJob
 
 class CustomerSerializer(serializers.ModelSerializer):
+    """
+    Customer serializer that accepts an optional 'fields' argument
+    limiting the serialized fields.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Customer
-        fields = '__all__'
+        exclude = ['phone_digits', 'last_name_lower']
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """
+    Status of a background report job with the links to poll it.
+
+    """
+    sections = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
+    result_url = serializers.SerializerMethodField()
+
+    def get_sections(self, job):
+        return job.sections.split('+')
+
+    def get_url(self, job):
+        return reverse('financial-report-job', args=[job.pk])
+
+    def get_result_url(self, job):
+        if job.status != 'done':
+            return None
+        return reverse('financial-report-job-result', args=[job.pk])
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'status', 'start_date', 'end_date', 'sections', 'error',
+            'created_at', 'started_at', 'finished_at', 'url', 'result_url',
+        ]
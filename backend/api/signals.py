@@ -0,0 +1,276 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens, invalidate_user
+from .cube import payment_keys, refresh_cube, refresh_cubes
+from .models import Course, Customer, CubeCell, MonthlyRevenue, Payment, Teacher
+from .periods import month_start, to_date
+from .rollup import refresh_rollup
+from .search import index_customer, remove_customers
+from .versions import bump
+
+_state = threading.local()
+
+
+@contextmanager
+def suspended():
+    """
+    Disables the handlers of this module in the current thread.
+
+    Used by bulk operations, which update the rollup, the version counters
+    and the search index once for all affected rows instead of once per row.
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def unless_suspended(handler):
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not getattr(_state, 'suspended', False):
+            handler(*args, **kwargs)
+    return wrapper
+
+
+@receiver(pre_save, sender=Payment)
+@unless_suspended
+def remember_payment_month(sender, instance, raw=False, **kwargs):
+    # Запоминаем прежний месяц и курс, чтобы обновить и старую строку сводки
+    instance._rollup_old_key = None
+    if raw or instance.pk is None:
+        return
+    old = Payment.objects.filter(pk=instance.pk).values_list('payment_date', 'course_id').first()
+    if old:
+        instance._rollup_old_key = (month_start(old[0]), old[1])
+
+
+@receiver(post_save, sender=Payment)
+@unless_suspended
+def update_rollup_on_payment_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {(month_start(to_date(instance.payment_date)), instance.course_id)}
+    old_key = getattr(instance, '_rollup_old_key', None)
+    if old_key:
+        keys.add(old_key)
+    for month, course_id in keys:
+        refresh_rollup(month, course_id)
+
+
+@receiver(post_delete, sender=Payment)
+@unless_suspended
+def update_rollup_on_payment_delete(sender, instance, **kwargs):
+    refresh_rollup(to_date(instance.payment_date), instance.course_id)
+
+
+@receiver(pre_save, sender=Course)
+@unless_suspended
+def remember_course_teacher(sender, instance, raw=False, **kwargs):
+    instance._rollup_old = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_old = Course.objects.filter(pk=instance.pk).values('teacher_id', 'language_id').first()
+
+
+@receiver(post_save, sender=Course)
+@unless_suspended
+def update_rollup_on_course_save(sender, instance, created=False, raw=False, **kwargs):
+    # Новая цена не меняет выручку: в сводке суммы, сохраненные в платежах
+    old = getattr(instance, '_rollup_old', None)
+    if raw or created or not old:
+        return
+
+    if old['teacher_id'] != instance.teacher_id:
+        MonthlyRevenue.objects.filter(course=instance).update(
+            teacher_id=instance.teacher_id,
+            teacher_salary=Teacher.objects.values_list('salary', flat=True).get(pk=instance.teacher_id)
+        )
+
+
+@receiver(pre_save, sender=Teacher)
+@unless_suspended
+def remember_teacher_salary(sender, instance, raw=False, **kwargs):
+    instance._rollup_old_salary = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_old_salary = Teacher.objects.filter(pk=instance.pk).values_list('salary', flat=True).first()
+
+
+@receiver(post_save, sender=Teacher)
+@unless_suspended
+def update_rollup_on_teacher_save(sender, instance, created=False, raw=False, **kwargs):
+    old_salary = getattr(instance, '_rollup_old_salary', None)
+    if raw or created or old_salary is None:
+        return
+
+    salary = Decimal(str(instance.salary))
+    if old_salary != salary:
+        MonthlyRevenue.objects.filter(teacher=instance).update(teacher_salary=salary)
+
+
+# Куб аналитики: ячейки пересчитываются по тем же ключам (месяц, курс), что и сводка
+
+@receiver(post_save, sender=Payment)
+@unless_suspended
+def update_cube_on_payment_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {(month_start(to_date(instance.payment_date)), instance.course_id)}
+    old_key = getattr(instance, '_rollup_old_key', None)
+    if old_key:
+        keys.add(old_key)
+    for month, course_id in keys:
+        refresh_cube(month, course_id)
+
+
+@receiver(post_delete, sender=Payment)
+@unless_suspended
+def update_cube_on_payment_delete(sender, instance, **kwargs):
+    refresh_cube(to_date(instance.payment_date), instance.course_id)
+
+
+@receiver(post_save, sender=Course)
+@unless_suspended
+def update_cube_on_course_save(sender, instance, created=False, raw=False, **kwargs):
+    old = getattr(instance, '_rollup_old', None)
+    if raw or created or not old:
+        return
+
+    changes = {
+        field: getattr(instance, field)
+        for field in ('teacher_id', 'language_id')
+        if old[field] != getattr(instance, field)
+    }
+    if changes:
+        CubeCell.objects.filter(course=instance).update(**changes)
+
+
+@receiver(pre_save, sender=Customer)
+@unless_suspended
+def remember_customer_profile(sender, instance, raw=False, **kwargs):
+    # Пол и дата рождения определяют ячейки куба, в которые попадают платежи покупателя
+    instance._cube_old_profile = None
+    if raw or instance.pk is None:
+        return
+    instance._cube_old_profile = Customer.objects.filter(pk=instance.pk).values_list('sex', 'birth_date').first()
+
+
+@receiver(post_save, sender=Customer)
+@unless_suspended
+def update_cube_on_customer_save(sender, instance, created=False, raw=False, **kwargs):
+    old = getattr(instance, '_cube_old_profile', None)
+    if raw or created or not old or old == (instance.sex, to_date(instance.birth_date)):
+        return
+    refresh_cubes(payment_keys(Payment.objects.filter(customer=instance)))
+
+
+def course_months(course_id):
+    return list(Payment.objects.filter(course_id=course_id).dates('payment_date', 'month'))
+
+
+def teacher_months(*teacher_ids):
+    return list(
+        MonthlyRevenue.objects.filter(
+            teacher_id__in=teacher_ids, teacher_active=True
+        ).dates('month', 'month')
+    )
+
+
+# Счетчики версий: запись увеличивает счетчики только тех месяцев, которые она затрагивает
+
+@receiver(post_save, sender=Payment)
+@unless_suspended
+def bump_payment_version(sender, instance, raw=False, **kwargs):
+    months = {month_start(to_date(instance.payment_date))}
+    old_key = getattr(instance, '_rollup_old_key', None)
+    if old_key:
+        months.add(old_key[0])
+    bump('payment', months)
+
+
+@receiver(post_delete, sender=Payment)
+@unless_suspended
+def bump_payment_version_on_delete(sender, instance, **kwargs):
+    bump('payment', [to_date(instance.payment_date)])
+
+
+@receiver(post_save, sender=Course)
+@unless_suspended
+def bump_course_version(sender, instance, **kwargs):
+    # Количество курсов входит в статистику преподавателя за все месяцы его работы
+    teacher_ids = {instance.teacher_id}
+    old = getattr(instance, '_rollup_old', None)
+    if old:
+        teacher_ids.add(old['teacher_id'])
+    bump('course', set(course_months(instance.pk)) | set(teacher_months(*teacher_ids)))
+
+
+@receiver(post_delete, sender=Course)
+@unless_suspended
+def bump_course_version_on_delete(sender, instance, **kwargs):
+    bump('course', teacher_months(instance.teacher_id))
+
+
+@receiver(post_save, sender=Teacher)
+@unless_suspended
+def bump_teacher_version(sender, instance, created=False, **kwargs):
+    bump('teacher', [] if created else teacher_months(instance.pk))
+
+
+@receiver(post_delete, sender=Teacher)
+@unless_suspended
+def bump_teacher_version_on_delete(sender, instance, **kwargs):
+    bump('teacher', [])
+
+
+@receiver(post_save, sender=Customer)
+@unless_suspended
+def bump_customer_version(sender, instance, created=False, **kwargs):
+    months = [] if created else Payment.objects.filter(customer=instance).dates('payment_date', 'month')
+    bump('customer', months)
+
+
+@receiver(post_delete, sender=Customer)
+@unless_suspended
+def bump_customer_version_on_delete(sender, instance, **kwargs):
+    bump('customer', [])
+
+
+# Полнотекстовый индекс имен покупателей
+
+@receiver(post_save, sender=Customer)
+@unless_suspended
+def update_customer_search_index(sender, instance, **kwargs):
+    index_customer(instance)
+
+
+@receiver(post_delete, sender=Customer)
+@unless_suspended
+def remove_customer_from_search_index(sender, instance, **kwargs):
+    remove_customers([instance.pk])
+
+
+# Кэш токенов аутентификации: выход, деактивация и смена пароля действуют сразу
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Вход через сессию обновляет только last_login, это не влияет на токены
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_user(instance.pk)
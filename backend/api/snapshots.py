@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .models import ClosedMonth, ClosedMonthActivity, MonthlyRevenue
+from .periods import iter_months, month_start, parse_month
+from .rollup import rollup_activity, rollup_activity_rows
+
+
+def closed_months():
+    """
+    Returns a lazy queryset of the closed months.
+
+    Used as a subquery, so excluding the closed months costs no extra query.
+    """
+    return ClosedMonth.objects.values('month')
+
+
+def closed_activity_rows(first_month=None, last_month=None):
+    """
+    Returns an unordered queryset of the frozen activity of the closed months.
+
+    The columns match rollup_activity_rows, so the two can be combined.
+    """
+    rows = ClosedMonthActivity.objects.all()
+    if first_month and last_month:
+        rows = rows.filter(month__range=[first_month, last_month])
+    return rows.values('month', 'teacher_id', 'salary', 'revenue', count=F('payment_count'))
+
+
+def month_activity(first_month=None, last_month=None):
+    """
+    Returns the (month, teacher) activity of whole months in one query.
+
+    Open months are aggregated from the MonthlyRevenue rollup and closed
+    months are read from their snapshots; the two parts are combined with
+    UNION ALL, so closing months adds no queries to the report.
+
+    Args:
+        first_month: The first month to include, all months if omitted.
+        last_month: The last month to include.
+
+    Returns:
+        Rows in the format of rollup_activity, ordered by month and teacher.
+    """
+    live = rollup_activity_rows(first_month, last_month, exclude_months=closed_months())
+    frozen = closed_activity_rows(first_month, last_month)
+    return list(live.union(frozen, all=True).order_by('month', 'teacher_id'))
+
+
+def check_closable(month):
+    """
+    Raises ValueError if the month cannot be closed.
+
+    Only past months are closed: payments of the current month can still change.
+    """
+    if month >= month_start(timezone.localdate()):
+        raise ValueError(f"Нельзя закрыть текущий или будущий месяц: {month:%Y-%m}")
+
+
+def compute_month_activity(month):
+    # Поток пула держит свое соединение с базой; закрываем его так же, как в конце запроса
+    close_old_connections()
+    try:
+        return rollup_activity(month, month)
+    finally:
+        close_old_connections()
+
+
+def save_snapshot(month, activity):
+    closed = ClosedMonth.objects.create(month=month)
+    ClosedMonthActivity.objects.bulk_create([
+        ClosedMonthActivity(
+            closed_month=closed,
+            month=month,
+            teacher_id=row['teacher_id'],
+            salary=row['salary'],
+            revenue=row['revenue'],
+            payment_count=row['count'],
+        )
+        for row in activity
+    ])
+    return closed
+
+
+def close_month(month):
+    """
+    Freezes the report figures of a past month.
+
+    The (month, teacher) activity of the month is copied from the rollup
+    into ClosedMonthActivity. From then on reports read the month from the
+    snapshot, and later changes to its payments no longer affect the
+    monthly figures, the teacher statistics or the totals.
+
+    Args:
+        month: A date within the month or a 'YYYY-MM' string.
+
+    Returns:
+        The created ClosedMonth.
+
+    Raises:
+        ValueError: If the month is not in the past or is already closed.
+    """
+    month = parse_month(month)
+    check_closable(month)
+    try:
+        with transaction.atomic():
+            return save_snapshot(month, rollup_activity(month, month))
+    except IntegrityError:
+        raise ValueError(f"Месяц {month:%Y-%m} уже закрыт")
+
+
+def open_past_months():
+    """
+    Returns the past months that are not closed yet.
+
+    The months start at the first month with payments, so months without
+    payments in between are closed too and never queried again.
+    """
+    first = MonthlyRevenue.objects.aggregate(first=Min('month'))['first']
+    if first is None:
+        return []
+    last = month_start(month_start(timezone.localdate()) - timedelta(days=1))
+    closed = set(ClosedMonth.objects.filter(month__gte=first).values_list('month', flat=True))
+    return [month for month in iter_months(first, last) if month not in closed]
+
+
+def close_months(months, workers=4):
+    """
+    Freezes the report figures of several past months.
+
+    The activity of the months is read in parallel in a thread pool, and
+    all snapshots are written in one transaction from the calling thread,
+    so the writers do not compete for database locks.
+
+    Args:
+        months: Dates of the months to close.
+        workers: The number of threads reading the activity; with 0 the
+            months are read in the calling thread.
+
+    Returns:
+        The list of closed months.
+
+    Raises:
+        ValueError: If a month is not in the past or is already closed.
+    """
+    months = sorted({parse_month(month) for month in months})
+    for month in months:
+        check_closable(month)
+
+    if workers:
+        with ThreadPoolExecutor(workers, thread_name_prefix='close-months') as executor:
+            activity = list(executor.map(compute_month_activity, months))
+    else:
+        activity = [rollup_activity(month, month) for month in months]
+
+    try:
+        with transaction.atomic():
+            for month, rows in zip(months, activity):
+                save_snapshot(month, rows)
+    except IntegrityError:
+        raise ValueError('Некоторые месяцы уже закрыты')
+    return months
@@ -0,0 +1,258 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .models import (
+    ClosedMonth,
+    ClosedMonthActivity,
+    Course,
+    CubeCell,
+    Customer,
+    Language,
+    MonthlyRevenue,
+    Payment,
+    Teacher,
+    TeacherLanguage,
+    normalize_name,
+    normalize_phone,
+)
+from .cube import rebuild_cube
+from .report_cache import REPORT_SCOPES
+from .rollup import rebuild_rollup
+from .search import clear_index, index_customers
+from .versions import bump
+
+# Размеры наборов данных для генерации и замеров производительности
+SIZES = {
+    'small': {'customers': 200, 'teachers': 10, 'languages': 5, 'courses': 20, 'payments': 2000},
+    'medium': {'customers': 5000, 'teachers': 50, 'languages': 8, 'courses': 150, 'payments': 100000},
+    'large': {'customers': 50000, 'teachers': 200, 'languages': 10, 'courses': 600, 'payments': 1000000},
+    'xlarge': {'customers': 200000, 'teachers': 500, 'languages': 10, 'courses': 1500, 'payments': 5000000},
+}
+
+LANGUAGES = [
+    'Английский', 'Немецкий', 'Французский', 'Испанский', 'Итальянский',
+    'Китайский', 'Японский', 'Корейский', 'Португальский', 'Турецкий',
+]
+
+# Фамилии и отчества в мужской форме; женская образуется окончанием
+LAST_NAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+    'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров',
+    'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин',
+]
+MALE_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артем', 'Илья', 'Кирилл', 'Михаил']
+FEMALE_NAMES = ['Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Екатерина', 'Татьяна', 'Ирина', 'Дарья', 'Юлия']
+PATRONYMICS = ['Александров', 'Дмитриев', 'Сергеев', 'Андреев', 'Алексеев', 'Михайлов', 'Иванов', 'Петров']
+
+COURSE_LEVELS = ['для начинающих', 'базовый', 'средний уровень', 'продвинутый', 'разговорный', 'деловой']
+COURSE_PRICES = [Decimal(price) for price in ('2500.00', '3500.00', '4200.00', '4990.00', '6000.00', '7500.00')]
+
+PAYMENT_STATUSES = ['paid', 'pending', 'failed', 'refunded']
+PAYMENT_STATUS_WEIGHTS = [70, 15, 10, 5]
+
+# Шаги по дням, взаимно простые с длиной периода, дают каждому платежу покупателя свой день
+DAY_STEPS = [37, 41, 43, 47, 53]
+
+
+def person(rnd, sex):
+    """Returns a random (last_name, first_name, middle_name) triple."""
+    last_name = rnd.choice(LAST_NAMES)
+    patronymic = rnd.choice(PATRONYMICS)
+    if sex:
+        return last_name, rnd.choice(MALE_NAMES), patronymic + 'ич'
+    return last_name + 'а', rnd.choice(FEMALE_NAMES), patronymic + 'на'
+
+
+def random_birth_date(rnd, first_year, last_year):
+    return datetime.date(first_year, 1, 1) + datetime.timedelta(
+        days=rnd.randrange((datetime.date(last_year, 12, 31) - datetime.date(first_year, 1, 1)).days)
+    )
+
+
+def clear_dataset():
+    """
+    Deletes all customers, teachers, languages, courses and payments,
+    together with the rollup, the analytics cube and the closed month
+    snapshots built from them.
+
+    Tables are emptied with plain DELETE statements in dependency order,
+    without loading the rows and sending per-row signals.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (
+            ClosedMonthActivity, ClosedMonth, Payment, MonthlyRevenue, CubeCell,
+            TeacherLanguage, Course, Customer, Teacher, Language,
+        ):
+            cursor.execute(f"DELETE FROM {model._meta.db_table}")
+        clear_index()
+        for scope in REPORT_SCOPES:
+            bump(scope)
+
+
+def payment_day_step(span):
+    for step in DAY_STEPS:
+        if span % step:
+            return step
+    return 1
+
+
+def generate_dataset(customers, teachers, languages, courses, payments,
+                     start_date=None, years=3, seed=0, batch_size=10000, log=None):
+    """
+    Generates a reproducible synthetic dataset.
+
+    The same arguments always produce the same rows. Payments are spread
+    over the given number of years with a realistic mix of statuses;
+    every payment of a customer falls on its own day, so the
+    (customer, course, payment_date) constraint always holds. Rows are
+    inserted with bulk_create, after which the revenue rollup, the
+    analytics cube, the search index and the version counters are rebuilt.
+
+    Args:
+        customers: The number of customers.
+        teachers: The number of teachers.
+        languages: The number of languages.
+        courses: The number of courses.
+        payments: The number of payments.
+        start_date: The first day of the payment period, January 1st
+            'years' years ago by default.
+        years: The length of the payment period in years.
+        seed: The seed of the random generator.
+        batch_size: The number of rows inserted per query.
+        log: An optional callable receiving progress messages.
+
+    Returns:
+        A dictionary with the number of created rows per model.
+
+    Raises:
+        ValueError: If the sizes are inconsistent or the database already
+            contains customers, teachers, languages, courses or payments.
+    """
+    # Телефоны и названия языков уникальны, поэтому второй набор поверх первого нарушил бы ограничения
+    if any(model.objects.exists() for model in (Customer, Teacher, Language, Course, Payment)):
+        raise ValueError('База уже содержит данные; удалите их перед генерацией (--clear)')
+    if min(customers, teachers, languages, courses) < 1 and payments:
+        raise ValueError('Для платежей нужны покупатели, преподаватели, языки и курсы')
+    if start_date is None:
+        start_date = datetime.date(datetime.date.today().year - years, 1, 1)
+    span = (start_date.replace(year=start_date.year + years) - start_date).days
+    if payments > customers * span:
+        raise ValueError('Слишком много платежей для заданного числа покупателей и длины периода')
+
+    log = log or (lambda message: None)
+    rnd = random.Random(seed)
+
+    with transaction.atomic():
+        names = LANGUAGES + [f'Язык {i}' for i in range(len(LANGUAGES), languages)]
+        language_objects = Language.objects.bulk_create(
+            [Language(name=name) for name in names[:languages]]
+        )
+
+        teacher_objects = []
+        for i in range(teachers):
+            sex = rnd.random() < 0.4
+            last_name, first_name, middle_name = person(rnd, sex)
+            teacher_objects.append(Teacher(
+                last_name=last_name,
+                first_name=first_name,
+                middle_name=middle_name,
+                phone_number=f'+7 (900) {i:07d}',
+                sex=sex,
+                birth_date=random_birth_date(rnd, 1960, 1998),
+                salary=Decimal(rnd.randrange(60, 181) * 500),
+            ))
+        teacher_objects = Teacher.objects.bulk_create(teacher_objects, batch_size=batch_size)
+
+        teacher_languages = {}
+        links = []
+        for teacher in teacher_objects:
+            known = rnd.sample(language_objects, min(len(language_objects), rnd.choice([1, 1, 2, 3])))
+            for language in known:
+                teacher_languages.setdefault(language.pk, []).append(teacher)
+                links.append(TeacherLanguage(teacher=teacher, language=language))
+        TeacherLanguage.objects.bulk_create(links, batch_size=batch_size)
+
+        course_objects = []
+        end_date = start_date + datetime.timedelta(days=span - 1)
+        for i in range(courses):
+            language = rnd.choice(language_objects)
+            course_start = start_date + datetime.timedelta(days=rnd.randrange(span))
+            course_objects.append(Course(
+                name=f'{language.name} {rnd.choice(COURSE_LEVELS)} #{i + 1}',
+                start_date=course_start,
+                end_date=min(course_start + datetime.timedelta(days=rnd.choice([90, 180, 270, 365])), end_date),
+                price=rnd.choice(COURSE_PRICES),
+                additional_info='',
+                language=language,
+                teacher=rnd.choice(teacher_languages.get(language.pk) or teacher_objects),
+            ))
+        course_prices = {
+            course.pk: course.price for course in Course.objects.bulk_create(course_objects, batch_size=batch_size)
+        }
+        course_ids = list(course_prices)
+        log(f'Languages: {languages}, teachers: {teachers}, courses: {courses}')
+
+    customer_ids = []
+    for first in range(0, customers, batch_size):
+        batch = []
+        for i in range(first, min(first + batch_size, customers)):
+            sex = rnd.random() < 0.45
+            last_name, first_name, middle_name = person(rnd, sex)
+            phone_number = f'+7 (9{i // 10 ** 7 % 100:02d}) {i % 10 ** 7:07d}'
+            batch.append(Customer(
+                last_name=last_name,
+                last_name_lower=normalize_name(last_name),
+                first_name=first_name,
+                middle_name=middle_name if rnd.random() < 0.9 else None,
+                phone_number=phone_number,
+                phone_digits=normalize_phone(phone_number),
+                sex=sex,
+                birth_date=random_birth_date(rnd, 1960, 2008),
+            ))
+        with transaction.atomic():
+            created = Customer.objects.bulk_create(batch)
+            index_customers(created)
+        customer_ids.extend(customer.pk for customer in created)
+        log(f'Customers: {len(customer_ids)}')
+
+    offsets = [rnd.randrange(span) for _ in customer_ids]
+    step = payment_day_step(span)
+    created = 0
+    for first in range(0, payments, batch_size):
+        batch = []
+        for i in range(first, min(first + batch_size, payments)):
+            # k-й платеж покупателя приходится на свой, отличный от других день
+            customer, k = i % customers, i // customers
+            status = rnd.choices(PAYMENT_STATUSES, PAYMENT_STATUS_WEIGHTS)[0]
+            course_id = rnd.choice(course_ids)
+            batch.append(Payment(
+                customer_id=customer_ids[customer],
+                course_id=course_id,
+                amount=course_prices[course_id],
+                payment_date=start_date + datetime.timedelta(days=(offsets[customer] + k * step) % span),
+                status=status,
+                grade=rnd.randint(2, 5) if status == 'paid' and rnd.random() < 0.6 else None,
+            ))
+        with transaction.atomic():
+            Payment.objects.bulk_create(batch)
+        created += len(batch)
+        log(f'Payments: {created}')
+
+    # bulk_create не отправляет сигналы, поэтому сводка, куб и версии обновляются явно
+    rebuild_rollup(batch_size=batch_size)
+    rebuild_cube(batch_size=batch_size)
+    for scope in REPORT_SCOPES:
+        bump(scope)
+
+    return {
+        'languages': languages,
+        'teachers': teachers,
+        'courses': courses,
+        'customers': customers,
+        'payments': payments,
+        'monthly_revenue': MonthlyRevenue.objects.count(),
+        'cube_cells': CubeCell.objects.count(),
+    }
@@ -0,0 +1,72 @@
+import datetime
+from decimal import Decimal
+
+from api.models import Course, Customer, Language, Payment, Teacher
+from api.periods import to_date
+from api.synthetic import generate_dataset
+
+# Первый день платежей синтетических наборов
+START_DATE = datetime.date(2022, 1, 1)
+
+# Размеры синтетических наборов и длина периода платежей в годах
+DATASETS = {
+    'small': {'customers': 30, 'teachers': 4, 'languages': 2, 'courses': 6, 'payments': 400, 'years': 1},
+    'medium': {'customers': 40, 'teachers': 5, 'languages': 3, 'courses': 8, 'payments': 600, 'years': 2},
+    'large': {'customers': 60, 'teachers': 12, 'languages': 3, 'courses': 20, 'payments': 1500, 'years': 2},
+    'huge': {'customers': 500, 'teachers': 25, 'languages': 6, 'courses': 60, 'payments': 10000, 'years': 3},
+}
+
+
+def load_dataset(name, seed=0):
+    """
+    Generates one of the shared synthetic datasets, starting on START_DATE.
+
+    Synthetic data is meant for comparing two ways of computing the same
+    result; tests of exact values use the handmade create_payments.
+
+    Returns:
+        The numbers of created rows, see generate_dataset.
+    """
+    return generate_dataset(**DATASETS[name], start_date=START_DATE, seed=seed)
+
+
+def create_payments():
+    """Creates two teachers with three courses, three customers and their payments in early 2024."""
+    ivanov = Teacher.objects.create(
+        last_name='Ivanov', first_name='Ivan', phone_number='+7 900 000-00-01',
+        sex=True, birth_date=datetime.date(1980, 1, 1), salary=Decimal('1000.00')
+    )
+    petrova = Teacher.objects.create(
+        last_name='Petrova', first_name='Maria', phone_number='+7 900 000-00-02',
+        sex=False, birth_date=datetime.date(1985, 1, 1), salary=Decimal('1500.00')
+    )
+    english = Language.objects.create(name='English')
+    courses = {}
+    for name, teacher, price in (('A', ivanov, '300.00'), ('B', petrova, '500.00'), ('C', ivanov, '200.00')):
+        courses[name] = Course.objects.create(
+            name=name, start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 12, 31),
+            price=Decimal(price), additional_info='', language=english, teacher=teacher
+        )
+    customers = {}
+    for position, (last_name, first_name, sex) in enumerate(
+        (('Smirnov', 'Oleg', True), ('Kuznetsova', 'Anna', False), ('Popov', 'Pavel', True)), start=1
+    ):
+        customers[last_name] = Customer.objects.create(
+            last_name=last_name, first_name=first_name, phone_number=f'+7 911 000-00-0{position}',
+            sex=sex, birth_date=datetime.date(2000, position, 1)
+        )
+
+    # Ожидание, возврат и явно заданная сумма оплаты
+    for last_name, course, payment_date, status, amount in (
+        ('Smirnov', 'A', '2024-01-10', 'paid', None),
+        ('Kuznetsova', 'A', '2024-01-20', 'paid', None),
+        ('Popov', 'B', '2024-01-15', 'pending', None),
+        ('Smirnov', 'B', '2024-02-05', 'paid', None),
+        ('Kuznetsova', 'C', '2024-02-25', 'paid', Decimal('150.00')),
+        ('Popov', 'A', '2024-03-03', 'refunded', None),
+        ('Popov', 'B', '2024-03-20', 'paid', None),
+    ):
+        Payment.objects.create(
+            customer=customers[last_name], course=courses[course],
+            payment_date=to_date(payment_date), status=status, amount=amount
+        )
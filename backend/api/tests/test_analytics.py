@@ -0,0 +1,74 @@
+import datetime
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from api import analytics
+from api.analytics import numpy_available, numpy_payment_activity, use_numpy
+from api.tests.fixtures import load_dataset
+from api.views.financial_report import build_financial_report, get_filtered_payments, get_payment_activity
+
+
+# Периоды с неполными месяцами, которые считаются по платежам
+PERIODS = [
+    (datetime.date(2022, 2, 10), datetime.date(2022, 2, 20)),
+    (datetime.date(2022, 3, 15), datetime.date(2023, 6, 10)),
+    (datetime.date(2022, 1, 2), datetime.date(2023, 12, 30)),
+]
+
+
+class EngineSelectionTests(TestCase):
+    def test_configured_engine(self):
+        payments = get_filtered_payments()
+        with override_settings(FINANCIAL_REPORT_ENGINE={'ENGINE': 'sql'}), self.assertNumQueries(0):
+            self.assertFalse(use_numpy(None, payments))
+        with override_settings(FINANCIAL_REPORT_ENGINE={'ENGINE': 'pandas'}):
+            with self.assertRaises(ImproperlyConfigured):
+                use_numpy(None, payments)
+
+    def test_numpy_engine_requires_numpy(self):
+        with mock.patch('api.analytics.numpy_available', return_value=False):
+            with self.assertRaises(ImproperlyConfigured):
+                use_numpy('numpy', get_filtered_payments())
+
+    def test_auto_engine_without_numpy_uses_sql(self):
+        with mock.patch('api.analytics.numpy_available', return_value=False), self.assertNumQueries(0):
+            self.assertFalse(use_numpy('auto', get_filtered_payments()))
+
+
+@skipUnless(numpy_available(), 'NumPy is not installed')
+class NumpyEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('large', seed=21)
+
+    def test_activity_matches_sql(self):
+        # Все платежи за два года, без сводки
+        for start_date, end_date in [(None, None)] + PERIODS:
+            payments = get_filtered_payments(start_date, end_date)
+            for chunk_size in (None, 97):
+                with self.subTest(period=(start_date, end_date), chunk_size=chunk_size):
+                    self.assertEqual(numpy_payment_activity(payments, chunk_size), get_payment_activity(payments))
+
+    def test_report_matches_sql(self):
+        for start_date, end_date in PERIODS:
+            with self.subTest(period=(start_date, end_date)):
+                with mock.patch.object(analytics, 'payment_columns', wraps=analytics.payment_columns) as columns:
+                    report = build_financial_report(start_date, end_date, engine='numpy')
+                # Неполные месяцы на краях периода посчитаны через NumPy
+                self.assertEqual(columns.call_count, 1 if start_date.month == end_date.month else 2)
+                self.assertEqual(report, build_financial_report(start_date, end_date, engine='sql'))
+
+    def test_configured_engine_is_the_default(self):
+        with override_settings(FINANCIAL_REPORT_ENGINE={'ENGINE': 'numpy'}):
+            with mock.patch.object(analytics, 'payment_columns', wraps=analytics.payment_columns) as columns:
+                build_financial_report(*PERIODS[1], ('totals',))
+        self.assertEqual(columns.call_count, 2)
+
+    def test_auto_engine_uses_threshold(self):
+        payments = get_filtered_payments(*PERIODS[2])
+        with override_settings(FINANCIAL_REPORT_ENGINE={'NUMPY_THRESHOLD': 1}):
+            self.assertTrue(use_numpy('auto', payments))
+        with override_settings(FINANCIAL_REPORT_ENGINE={'NUMPY_THRESHOLD': 10 ** 9}):
+            self.assertFalse(use_numpy('auto', payments))
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import Client, RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.tests.fixtures import load_dataset
+from api.views.financial_report import build_financial_report, get_detailed_data, get_filtered_payments
+from api.views.financial_report_async import financial_report_async
+from api.periods import to_date
+
+
+
+@override_settings(FINANCIAL_REPORT_ASYNC={'MAX_WORKERS': 4})
+class AsyncFinancialReportTests(TransactionTestCase):
+    """
+    The sections are computed in worker threads with their own database
+    connections, so the data must be committed: TransactionTestCase.
+    """
+
+    def setUp(self):
+        # Счетчики версий сбрасываются вместе с базой, поэтому отчеты других тестов нужно удалить
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        load_dataset('medium', seed=3)
+        self.user = User.objects.create_user('async', password='async')
+        self.token = Token.objects.create(user=self.user)
+        self.client = Client(headers={'Authorization': f'Token {self.token.key}'})
+        self.url = reverse('financial-report-async')
+
+    def assertSameReport(self, params, start_date=None, end_date=None, sections=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        expected = build_financial_report(start_date, end_date, *([sections] if sections else []))
+        self.assertEqual(response.json(), expected)
+        return response
+
+    def test_whole_period_matches_sync_report(self):
+        response = self.assertSameReport({})
+        self.assertEqual(response['X-Report-Cache'], 'MISS')
+        self.assertIn('detail;dur=', response['Server-Timing'])
+
+    def test_partial_months_match_sync_report(self):
+        params = {'start_date': '2022-03-15', 'end_date': '2023-02-10'}
+        self.assertSameReport(params, to_date(params['start_date']), to_date(params['end_date']))
+        self.assertEqual(self.client.get(self.url, params)['X-Report-Cache'], 'HIT')
+
+    def test_sections(self):
+        params = {'start_date': '2022-03-15', 'end_date': '2023-02-10', 'sections': 'teachers,totals'}
+        self.assertSameReport(
+            params, to_date(params['start_date']), to_date(params['end_date']), ['totals', 'teachers']
+        )
+
+    def test_requires_authentication(self):
+        self.assertEqual(Client().get(self.url).status_code, 401)
+        self.assertEqual(Client(headers={'Authorization': 'Token invalid'}).get(self.url).status_code, 401)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'sections': 'unknown'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start_date': 'x', 'end_date': 'y'}).status_code, 400)
+
+    def test_errors_match_the_sync_report(self):
+        params = {'sections': 'totals'}
+        with mock.patch('api.views.financial_report.build_financial_report', side_effect=RuntimeError('сбой')), \
+                self.assertLogs('api.financial_report', 'ERROR'):
+            expected = self.client.get(reverse('financial-report'), params)
+        with mock.patch('api.views.financial_report_async.get_activity_queries', side_effect=RuntimeError('сбой')), \
+                self.assertLogs('api.financial_report', 'ERROR') as logs:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        self.assertIn('RuntimeError: сбой', logs.output[0])
+
+    def test_detail_stops_when_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        self.assertEqual(get_detailed_data(get_filtered_payments(), cancelled), [])
+
+    def test_disconnect_cancels_the_report(self):
+        started = threading.Event()
+        stopped = threading.Event()
+
+        def slow_detail(payments, cancelled):
+            started.set()
+            # Поток пула ждет, пока отмена запроса не будет передана ему
+            if cancelled.wait(5):
+                stopped.set()
+            return []
+
+        request = RequestFactory().get(self.url, headers={'Authorization': f'Token {self.token.key}'})
+
+        async def disconnect():
+            task = asyncio.ensure_future(financial_report_async(request))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch('api.views.financial_report_async.get_detailed_data', slow_detail):
+            async_to_sync(disconnect)()
+        self.assertTrue(stopped.wait(5))
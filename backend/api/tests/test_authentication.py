@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api import authentication
+from api.versions import bump
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', password='cached', is_staff=True)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        authentication.stats.reset()
+        authentication.cache_version.reset()
+        self.client = Client(headers={'Authorization': f'Token {self.token.key}'})
+        self.url = reverse('customers-list')
+
+    def get(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'limit': 10})
+        return response, len(context)
+
+    @override_settings(TOKEN_AUTH_CACHE={'ALIAS': 'auth', 'VERSION_CHECK_INTERVAL': 60})
+    def test_cached_token_skips_the_token_query(self):
+        # Первый запрос процесса сверяет версию, следующие в течение минуты - нет
+        response, cold = self.get()
+        self.assertEqual(response.status_code, 200)
+        response, warm = self.get()
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(warm, cold - 2)
+        self.assertEqual(authentication.stats.snapshot(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_cache_holds_only_the_user_flags(self):
+        self.get()
+        cached = caches['auth'].get(authentication.token_cache_key(self.token.key))
+        self.assertEqual(cached, (self.user.pk, True, True))
+
+        request = self.client.get(reverse('metrics')).wsgi_request
+        self.assertIsInstance(request.user, authentication.CachedUser)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.user.username, 'cached')
+
+    def test_invalid_token_is_rejected(self):
+        client = Client(headers={'Authorization': 'Token invalid'})
+        self.assertEqual(client.get(self.url).status_code, 401)
+        self.assertEqual(client.get(self.url).status_code, 401)
+
+    def test_logout_invalidates_token(self):
+        self.get()
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, 200)
+
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivation_invalidates_token(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(TOKEN_AUTH_CACHE={'ALIAS': 'auth', 'VERSION_CHECK_INTERVAL': 0})
+    def test_revocation_in_another_process(self):
+        self.get()
+        # Другой процесс удалил токен: локальный кэш этого процесса об этом не знает
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM authtoken_token WHERE user_id = %s', [self.user.pk])
+        self.assertEqual(self.get()[0].status_code, 200)
+
+        bump(authentication.AUTH_SCOPE)
+        self.assertEqual(self.get()[0].status_code, 401)
+
+    def test_password_change_invalidates_token(self):
+        self.get()
+        self.user.set_password('changed')
+        self.user.save()
+
+        key = authentication.token_cache_key(self.token.key)
+        self.assertIsNone(caches[authentication.get_config()['ALIAS']].get(key))
+
+    def test_login_returns_the_same_token(self):
+        response = Client().post(reverse('login'), {'username': 'cached', 'password': 'cached'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], self.token.key)
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from api.benchmarks import get_endpoints, percentile, run_benchmarks
+from api.models import Customer, Language, Payment
+from api.synthetic import SIZES
+
+TINY = {'customers': 10, 'teachers': 2, 'languages': 2, 'courses': 3, 'payments': 40}
+SMALLER = {'customers': 5, 'teachers': 1, 'languages': 1, 'courses': 1, 'payments': 10}
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3, 10, 9, 8, 7, 6]
+        self.assertEqual(percentile(values, 50), 5)
+        self.assertEqual(percentile(values, 95), 10)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([42], 95), 42)
+
+    @mock.patch.dict(SIZES, {'tiny': TINY, 'smaller': SMALLER})
+    def test_run_benchmarks(self):
+        messages = []
+        report = run_benchmarks(['tiny', 'smaller'], iterations=2, warmup=1, log=messages.append)
+
+        # Перед каждым размером база очищается, поэтому второй набор не конфликтует с первым
+        self.assertEqual(report['datasets']['tiny']['customers'], 10)
+        self.assertEqual(report['datasets']['smaller']['payments'], 10)
+        self.assertEqual(Customer.objects.count(), 5)
+        self.assertEqual(Payment.objects.count(), 10)
+
+        names = [endpoint['name'] for endpoint in get_endpoints()]
+        self.assertEqual(
+            [(result['size'], result['endpoint']) for result in report['results']],
+            [(size, name) for size in ('tiny', 'smaller') for name in names]
+        )
+        for result in report['results']:
+            with self.subTest(size=result['size'], endpoint=result['endpoint']):
+                self.assertEqual(result['status'], [200])
+                self.assertIsInstance(result['queries'], int)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+                self.assertGreater(result['peak_memory_kb'], 0)
+        self.assertEqual(report['iterations'], 2)
+        self.assertEqual(report['database'], 'sqlite')
+        self.assertEqual(len([message for message in messages if message.startswith('Generating')]), 2)
+
+    def test_command_validates_options(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown dataset sizes: huge'):
+            call_command('run_benchmarks', sizes='small,huge')
+        with self.assertRaisesMessage(CommandError, '--iterations must be positive'):
+            call_command('run_benchmarks', sizes='small', iterations=0)
+
+
+class GenerateSyntheticDataTests(TestCase):
+    def generate(self, **options):
+        call_command('generate_synthetic_data', **SMALLER, start_date=None, seed=1, stdout=mock.Mock(), **options)
+
+    def test_existing_data_requires_clear(self):
+        self.generate()
+        with self.assertRaisesMessage(CommandError, '--clear'):
+            self.generate()
+        self.assertEqual(Customer.objects.count(), 5)
+
+        self.generate(clear=True)
+        self.assertEqual(Customer.objects.count(), 5)
+        self.assertEqual(Language.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 10)
@@ -0,0 +1,135 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.bulk import MAX_BULK_IDS
+from api.cube import check_cube
+from api.models import Customer, Payment
+from api.rollup import check_rollup
+from api.search import search_customers
+from api.tests.fixtures import DATASETS, load_dataset
+from api.versions import get_versions
+
+
+
+class BulkCustomerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('small', seed=13)
+        cls.user = User.objects.create_user('bulk', password='bulk')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def send(self, method, data):
+        return getattr(self.client, method)(
+            reverse('customers-list'), data, content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def ids(self, count):
+        return list(Customer.objects.order_by('id').values_list('id', flat=True)[:count])
+
+    def test_update_by_ids(self):
+        ids = self.ids(3)
+        versions = get_versions(('customer',))
+
+        response = self.send('patch', {'ids': ids, 'data': {'last_name': 'Балашов', 'sex': False}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'updated': 3, 'dry_run': False})
+        self.assertEqual(set(Customer.objects.filter(last_name='Балашов').values_list('id', flat=True)), set(ids))
+        self.assertFalse(Customer.objects.filter(pk__in=ids, sex=True).exists())
+
+        self.assertEqual({customer.pk for customer in search_customers('Балаш')}, set(ids))
+        self.assertNotEqual(get_versions(('customer',)), versions)
+        self.assertEqual(check_cube(), [])
+
+    def test_update_by_filter(self):
+        expected = Customer.objects.filter(sex=True).count()
+        response = self.send('patch', {'filter': {'sex': 'true'}, 'data': {'birth_date': '1970-01-01'}})
+        self.assertEqual(response.json()['updated'], expected)
+        self.assertEqual(Customer.objects.filter(birth_date=datetime.date(1970, 1, 1)).count(), expected)
+        self.assertEqual(check_cube(), [])
+
+    def test_dry_run_changes_nothing(self):
+        ids = self.ids(5)
+        payments = Payment.objects.filter(customer_id__in=ids).count()
+        versions = get_versions(('customer', 'payment'))
+
+        response = self.send('patch', {'ids': ids, 'data': {'first_name': 'Ян'}, 'dry_run': True})
+        self.assertEqual(response.json(), {'updated': 5, 'dry_run': True})
+        response = self.send('delete', {'ids': ids, 'dry_run': True})
+        self.assertEqual(response.json(), {'deleted': {'customers': 5, 'payments': payments}, 'dry_run': True})
+
+        self.assertEqual(Customer.objects.filter(pk__in=ids).exclude(first_name='Ян').count(), 5)
+        self.assertEqual(get_versions(('customer', 'payment')), versions)
+
+    def test_delete_refreshes_rollup_index_and_versions(self):
+        ids = self.ids(4)
+        customer = Customer.objects.get(pk=ids[0])
+        payments = Payment.objects.filter(customer_id__in=ids).count()
+        versions = get_versions(('customer', 'payment'))
+
+        response = self.send('delete', {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deleted'], {'customers': 4, 'payments': payments})
+        self.assertFalse(Customer.objects.filter(pk__in=ids).exists())
+
+        self.assertEqual(check_rollup(), [])
+        self.assertEqual(check_cube(), [])
+        self.assertNotIn(customer.pk, [found.pk for found in search_customers(customer.last_name, limit=100)])
+        self.assertNotEqual(get_versions(('customer', 'payment')), versions)
+
+    @mock.patch('api.rollup.KEY_BATCH_SIZE', 2)
+    def test_single_customer_writes_refresh_once(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        first, second, third = (Customer.objects.get(pk=pk) for pk in self.ids(3))
+
+        # Смена пола пересчитывает ячейки куба всех платежей покупателя
+        response = self.client.put(
+            reverse('customer-detail', args=[first.pk]),
+            {'last_name': first.last_name, 'first_name': first.first_name, 'phone_number': first.phone_number,
+             'sex': not first.sex, 'birth_date': first.birth_date.isoformat()},
+            content_type='application/json', headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(check_cube(), [])
+
+        response = self.client.delete(reverse('customer-detail', args=[first.pk]), headers=headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.send('delete', {'id': second.pk}).status_code, 204)
+        self.assertFalse(Payment.objects.filter(customer_id__in=[first.pk, second.pk]).exists())
+        self.assertEqual(check_rollup(), [])
+        self.assertEqual(check_cube(), [])
+
+        self.assertEqual(self.send('delete', {'id': second.pk}).status_code, 404)
+        self.assertEqual(self.send('delete', {'id': 'third'}).status_code, 404)
+        self.assertTrue(Customer.objects.filter(pk=third.pk).exists())
+
+    def test_invalid_requests(self):
+        ids = self.ids(2)
+        cases = [
+            ('patch', {'data': {'first_name': 'Ян'}}),
+            ('patch', {'ids': ids, 'filter': {'sex': 'true'}, 'data': {'first_name': 'Ян'}}),
+            ('patch', {'ids': [], 'data': {'first_name': 'Ян'}}),
+            ('patch', {'ids': ['1'], 'data': {'first_name': 'Ян'}}),
+            ('patch', {'ids': list(range(1, MAX_BULK_IDS + 2)), 'data': {'first_name': 'Ян'}}),
+            ('patch', {'filter': {}, 'data': {'first_name': 'Ян'}}),
+            ('patch', {'filter': {'city': 'Москва'}, 'data': {'first_name': 'Ян'}}),
+            ('patch', {'ids': ids, 'data': {'phone_number': '+7 900 000-00-00'}}),
+            ('patch', {'ids': ids, 'data': {}}),
+            ('patch', {'ids': ids, 'data': {'first_name': 'Ян'}, 'dry_run': 'maybe'}),
+            ('patch', ids),
+            ('patch', 5),
+            ('delete', ['ids']),
+            ('delete', 5),
+            ('delete', {'ids': list(range(1, MAX_BULK_IDS + 2))}),
+        ]
+        for method, data in cases:
+            with self.subTest(method=method, data=str(data)[:60]):
+                self.assertEqual(self.send(method, data).status_code, 400)
+
+        self.assertEqual(Customer.objects.filter(first_name='Ян').count(), 0)
+        self.assertEqual(Customer.objects.count(), DATASETS['small']['customers'])
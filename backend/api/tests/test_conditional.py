@@ -0,0 +1,81 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Course, Customer, Payment
+from api.tests.fixtures import load_dataset
+
+PERIOD = {'start_date': '2022-03-01', 'end_date': '2022-04-30'}
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('small', seed=9)
+        cls.user = User.objects.create_user('etag', password='etag')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, url, params=None, **headers):
+        headers = {name.replace('_', '-'): value for name, value in headers.items()}
+        return self.client.get(url, params or {}, headers={'Authorization': f'Token {self.token.key}', **headers})
+
+    def assertNotModified(self, url, params=None, **headers):
+        response = self.get(url, params, **headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        not_modified = self.get(url, params, If_None_Match=etag, **headers)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(not_modified.content, b'')
+        return etag
+
+    def test_customers(self):
+        customers = reverse('customers-list')
+        customer = Customer.objects.order_by('id').first()
+        detail = reverse('customer-detail', args=[customer.pk])
+
+        list_etag = self.assertNotModified(customers, {'limit': 10})
+        detail_etag = self.assertNotModified(detail)
+        # Другое представление - другой тег
+        columnar_etag = self.assertNotModified(customers, {'limit': 10}, Accept='application/vnd.columnar+json')
+        self.assertNotEqual(columnar_etag, list_etag)
+
+        customer.first_name = 'Петр'
+        customer.save()
+        self.assertEqual(self.get(customers, {'limit': 10}, If_None_Match=list_etag).status_code, 200)
+        self.assertEqual(self.get(detail, If_None_Match=detail_etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = reverse('customers-list')
+        last_modified = self.get(url)['Last-Modified']
+        self.assertEqual(self.get(url, If_Modified_Since=last_modified).status_code, 304)
+
+    def test_report_depends_on_the_months_of_the_period(self):
+        url = reverse('financial-report')
+        etag = self.assertNotModified(url, PERIOD)
+
+        # Запись в месяц вне периода не меняет тег
+        course = Course.objects.order_by('id').first()
+        customer = Customer.objects.order_by('id').first()
+        Payment.objects.create(
+            customer=customer, course=course, payment_date=datetime.date(2022, 9, 5), status='paid'
+        )
+        self.assertEqual(self.get(url, PERIOD, If_None_Match=etag).status_code, 304)
+
+        Payment.objects.create(
+            customer=customer, course=course, payment_date=datetime.date(2022, 3, 5), status='paid'
+        )
+        response = self.get(url, PERIOD, If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_errors_have_no_etag(self):
+        response = self.get(reverse('financial-report'), {**PERIOD, 'sections': 'salaries'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,150 @@
+import datetime
+from collections import defaultdict
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.bulk import delete_customers, update_customers
+from api.cube import age_band, check_cube, query_cube
+from api.models import Course, Customer, CubeCell, Language, Payment, Teacher
+from api.tests.fixtures import load_dataset
+
+
+
+class CubeTests(TestCase):
+    def setUp(self):
+        load_dataset('medium', seed=5)
+
+    def test_age_band(self):
+        birth_date = datetime.date(2000, 6, 15)
+        self.assertEqual(age_band(birth_date, datetime.date(2018, 6, 14)), '0-17')
+        self.assertEqual(age_band(birth_date, datetime.date(2018, 6, 15)), '18-24')
+        self.assertEqual(age_band(birth_date, datetime.date(2070, 1, 1)), '65+')
+
+    def test_revenue_by_language_matches_payments(self):
+        expected = defaultdict(float)
+        for language_id, amount in Payment.objects.filter(status='paid').values_list('course__language_id', 'amount'):
+            expected[language_id] += float(amount)
+
+        rows = query_cube(['language'], ['revenue'])
+        self.assertEqual([row['language_id'] for row in rows], sorted(expected))
+        for row in rows:
+            self.assertAlmostEqual(row['revenue'], expected[row['language_id']], places=2)
+            self.assertEqual(row['language_name'], Language.objects.get(pk=row['language_id']).name)
+
+    def test_roll_up_matches_totals(self):
+        total, = query_cube()
+        self.assertEqual(total['enrollments'], Payment.objects.count())
+        self.assertEqual(total['payments'], Payment.objects.filter(status='paid').count())
+
+        rows = query_cube(['year', 'sex', 'age_band'], ['revenue', 'enrollments'])
+        self.assertEqual(sum(row['enrollments'] for row in rows), total['enrollments'])
+        self.assertAlmostEqual(sum(row['revenue'] for row in rows), total['revenue'], places=2)
+
+    def test_average_grade_and_fill_rate(self):
+        teacher = Teacher.objects.order_by('id').first()
+        payments = Payment.objects.filter(course__teacher=teacher)
+        grades = list(payments.exclude(grade=None).values_list('grade', flat=True))
+
+        row, = query_cube(['teacher'], ['avg_grade', 'fill_rate'], {'teacher_id__in': [teacher.pk]})
+        self.assertEqual(row['avg_grade'], round(sum(grades) / len(grades), 2))
+        self.assertEqual(row['fill_rate'], round(payments.filter(status='paid').count() / payments.count(), 4))
+
+    def test_payment_changes_refresh_the_cube(self):
+        course = Course.objects.order_by('id').first()
+        customer = Customer.objects.order_by('id').first()
+        payment = Payment.objects.create(
+            customer=customer, course=course, payment_date=datetime.date(2022, 6, 30), status='paid', grade=5
+        )
+        self.assertEqual(check_cube(), [])
+
+        payment.payment_date = datetime.date(2023, 2, 1)
+        payment.course = Course.objects.order_by('id').last()
+        payment.save()
+        self.assertEqual(check_cube(), [])
+
+        payment.delete()
+        self.assertEqual(check_cube(), [])
+
+    def test_course_and_customer_changes_refresh_the_cube(self):
+        course = Course.objects.order_by('id').first()
+        course.teacher = Teacher.objects.exclude(pk=course.teacher_id).first()
+        course.language = Language.objects.exclude(pk=course.language_id).first()
+        course.save()
+        self.assertEqual(check_cube(), [])
+
+        customer = Customer.objects.filter(payment__isnull=False).first()
+        customer.birth_date = datetime.date(1950, 1, 1)
+        customer.sex = not customer.sex
+        customer.save()
+        self.assertEqual(check_cube(), [])
+
+        customers = Customer.objects.order_by('id')[:5]
+        update_customers(
+            Customer.objects.filter(pk__in=customers), {'sex': True, 'birth_date': datetime.date(2005, 1, 1)}
+        )
+        self.assertEqual(check_cube(), [])
+
+        delete_customers(Customer.objects.filter(pk__in=customers))
+        self.assertEqual(check_cube(), [])
+
+    def test_command_rebuilds_the_cube(self):
+        CubeCell.objects.filter(month=datetime.date(2022, 3, 1)).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_analytics_cube', '--check-only', stdout=StringIO(), stderr=StringIO())
+
+        output = StringIO()
+        call_command('rebuild_analytics_cube', stdout=output)
+        self.assertIn('Cube is consistent', output.getvalue())
+
+    def test_migration_fills_the_cube(self):
+        CubeCell.objects.all().delete()
+        import_module('api.migrations.0017_fill_cubecell').fill_cube_cells(apps, None)
+        self.assertEqual(check_cube(), [])
+
+
+class CubeApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('medium', seed=5)
+        cls.user = User.objects.create_user('cube', password='cube')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse('analytics-cube'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def test_slice_and_dice(self):
+        response = self.get(
+            dimensions='month,course', measures='revenue,payments',
+            start_month='2022-03', end_month='2022-05', sex='true', age_band='18-24,25-34'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['measures'], ['revenue', 'payments'])
+        self.assertTrue(data['rows'])
+        for row in data['rows']:
+            self.assertTrue('2022-03' <= row['month'] <= '2022-05')
+            self.assertEqual(set(row), {'month', 'course_id', 'course_name', 'revenue', 'payments'})
+
+        payments = Payment.objects.filter(
+            status='paid', payment_date__range=['2022-03-01', '2022-05-31'], customer__sex=True
+        )
+        self.assertLessEqual(sum(row['payments'] for row in data['rows']), payments.count())
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get(dimensions='city').status_code, 400)
+        self.assertEqual(self.get(measures='margin').status_code, 400)
+        self.assertEqual(self.get(teacher='one').status_code, 400)
+        self.assertEqual(self.get(start_month='март').status_code, 400)
+        self.assertEqual(self.get(age_band='30-40').status_code, 400)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get(reverse('analytics-cube')).status_code, 401)
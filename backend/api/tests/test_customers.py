@@ -0,0 +1,117 @@
+import datetime
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Customer
+from api.pagination import encode_cursor
+
+CUSTOMERS = [
+    ('Иванов', True, '1980-03-15'),
+    ('Иванова', False, '1985-07-01'),
+    ('Ивашкин', True, '1999-12-31'),
+    ('Петров', True, '1990-01-01'),
+    ('Петрова', False, '2001-05-20'),
+    ('Сидоров', True, '1975-11-11'),
+    ('ivanov', True, '1992-02-29'),
+]
+
+
+class CustomerListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number, (last_name, sex, birth_date) in enumerate(CUSTOMERS):
+            Customer.objects.create(
+                last_name=last_name, first_name='Тест', phone_number=f'+7 900 100-{number:04d}',
+                sex=sex, birth_date=birth_date,
+            )
+        cls.user = User.objects.create_user('customers', password='customers')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse('customers-list'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def names(self, **params):
+        response = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        return [customer['last_name'] for customer in response.json()['results']]
+
+    def test_name_prefix_ignores_case(self):
+        self.assertEqual(self.names(name='ив'), ['Иванов', 'Иванова', 'Ивашкин'])
+        self.assertEqual(self.names(name='ИВАН'), ['Иванов', 'Иванова'])
+        self.assertEqual(self.names(name='Iv'), ['ivanov'])
+        self.assertEqual(self.names(name='ё'), [])
+
+    def test_filters(self):
+        self.assertEqual(self.names(sex='false'), ['Иванова', 'Петрова'])
+        self.assertEqual(self.names(sex='true', name='пет'), ['Петров'])
+        self.assertEqual(
+            self.names(birth_date_from='1985-07-01', birth_date_to='1999-12-31'),
+            ['ivanov', 'Иванова', 'Ивашкин', 'Петров']
+        )
+        for params in ({'sex': 'yes'}, {'birth_date_from': '1990-02-30'}, {'birth_date_to': 'вчера'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+    def test_fields(self):
+        data = self.get(fields='id,last_name', name='сид').json()
+        customer = Customer.objects.get(last_name='Сидоров')
+        self.assertEqual(data['results'], [{'id': customer.pk, 'last_name': 'Сидоров'}])
+
+        response = self.get(fields='id,last_name_lower')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'detail': 'Неизвестные поля: last_name_lower'})
+
+    def test_cursor_pages_cover_the_list(self):
+        names, cursor = [], None
+        while True:
+            data = self.get(limit=2, **({'cursor': cursor} if cursor else {})).json()
+            self.assertLessEqual(len(data['results']), 2)
+            names.extend(customer['last_name'] for customer in data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(names, sorted(last_name for last_name, _, _ in CUSTOMERS))
+
+    def test_list_is_always_paginated(self):
+        Customer.objects.bulk_create(
+            Customer(
+                last_name=f'Массов{number:02d}', first_name='Тест', phone_number=f'+7 900 200-{number:04d}',
+                sex=True, birth_date=datetime.date(1990, 1, 1),
+            )
+            for number in range(60)
+        )
+        data = self.get().json()
+        self.assertEqual(len(data['results']), 50)
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_invalid_cursors(self):
+        customer = Customer.objects.order_by('last_name', 'id').first()
+        self.assertEqual(self.get(cursor=encode_cursor([customer.last_name, customer.pk])).status_code, 200)
+        for values in (['Иванов', 'first'], ['Иванов', None], ['Иванов', True], [None, 1], [17, 1], ['Иванов']):
+            with self.subTest(values=values):
+                response = self.get(cursor=encode_cursor(values))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'detail': 'Некорректный курсор'})
+        self.assertEqual(self.get(cursor='not a cursor').json(), {'detail': 'Некорректный курсор'})
+
+    def test_renamed_customers_are_found(self):
+        customer = Customer.objects.get(last_name='Сидоров')
+        customer.last_name = 'Ивлев'
+        customer.save(update_fields=['last_name'])
+        self.assertEqual(self.names(name='ивл'), ['Ивлев'])
+
+        response = self.client.patch(
+            reverse('customers-list'),
+            json.dumps({'ids': [customer.pk], 'data': {'last_name': 'Яковлев'}}),
+            content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(self.names(name='як'), ['Яковлев'])
+        self.assertEqual(self.names(name='ивл'), [])
@@ -0,0 +1,69 @@
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.tests.fixtures import load_dataset
+
+PERIOD = {'start_date': '2022-02-01', 'end_date': '2022-05-31'}
+
+
+class ExportLinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('small', seed=31)
+        cls.user = User.objects.create_user('export', password='export')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def link(self, **params):
+        response = self.client.get(
+            reverse('financial-report-export-link'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['url']
+
+    def follow(self, url):
+        # Браузер переходит по ссылке без заголовка с токеном
+        parts = urlsplit(url)
+        return Client().get(parts.path, {key: values[0] for key, values in parse_qs(parts.query).items()})
+
+    def test_link_downloads_the_export(self):
+        url = self.link(**PERIOD, type='csv')
+        self.assertTrue(url.startswith('http://testserver/'))
+
+        response = self.follow(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename="financial_report_2022-02-01_2022-05-31.csv"'
+        )
+        self.assertIn('Плательщик', response.getvalue().decode('utf-8-sig'))
+
+        response = self.follow(self.link(**PERIOD, type='xlsx'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.getvalue().startswith(b'PK'))
+
+    def test_link_is_bound_to_its_parameters(self):
+        url = self.link(**PERIOD, type='csv')
+        self.assertEqual(self.follow(url.replace('2022-05-31', '2022-12-31')).status_code, 401)
+        self.assertEqual(self.follow(url.replace('type=csv', 'type=xlsx')).status_code, 401)
+        self.assertEqual(self.follow(url + 'x').status_code, 401)
+
+    def test_link_expires_and_follows_the_user(self):
+        with override_settings(DOWNLOAD_LINKS={'MAX_AGE': -1}):
+            self.assertEqual(self.follow(self.link(**PERIOD)).status_code, 401)
+
+        url = self.link(**PERIOD)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.follow(url).status_code, 401)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse('financial-report-export-link')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('financial-report-export'), PERIOD).status_code, 401)
+        headers = {'Authorization': f'Token {self.token.key}'}
+        for params in ({**PERIOD, 'type': 'pdf'}, {'start_date': '2022-13-01', 'end_date': '2022-12-31'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('financial-report-export-link'), params, headers=headers)
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Payment
+from api.pagination import encode_cursor
+from api.periods import to_date
+from api.tests.fixtures import load_dataset
+from api.views.financial_report import get_detailed_data, get_filtered_payments
+
+PERIOD = {'start_date': '2022-02-10', 'end_date': '2022-07-20'}
+
+
+class FinancialDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('small', seed=29)
+        cls.user = User.objects.create_user('detail', password='detail')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse('financial-report-detail'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def test_pages_cover_the_period(self):
+        payments = get_filtered_payments(to_date(PERIOD['start_date']), to_date(PERIOD['end_date']))
+        expected = get_detailed_data(payments.order_by('payment_date', 'id'))
+
+        rows, cursor = [], None
+        while True:
+            data = self.get(**PERIOD, limit=40, **({'cursor': cursor} if cursor else {})).json()
+            rows.extend(data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(rows, expected)
+
+    def test_invalid_cursors(self):
+        payment = Payment.objects.order_by('id').first()
+        self.assertEqual(self.get(cursor=encode_cursor([payment.payment_date, payment.pk])).status_code, 200)
+        for values in ([None, 1], [17, 1], ['2022-13-01', 1], ['2022-01-01', 'first'], ['2022-01-01', None], [1]):
+            with self.subTest(values=values):
+                self.assertEqual(self.get(cursor=encode_cursor(values)).status_code, 400)
+        self.assertEqual(self.get(cursor='not a cursor').status_code, 400)
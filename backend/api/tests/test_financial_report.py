@@ -0,0 +1,233 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Course, Teacher
+from api.periods import to_date
+from api.snapshots import close_month
+from api.tests.fixtures import create_payments
+from api.views import financial_report
+from api.views.financial_report import build_financial_report, get_filtered_payments
+
+
+def detail_key(row):
+    return row['date'], row['customer'], row['course']
+
+
+def legacy_report(start_date=None, end_date=None):
+    """Builds the report row by row, the way the view did before the grouped queries."""
+    payments = list(get_filtered_payments(start_date, end_date).select_related('customer', 'course__teacher'))
+    paid = [payment for payment in payments if payment.status == 'paid']
+
+    # Зарплата начисляется за каждый месяц, в котором у преподавателя были оплаты
+    months = {}
+    for payment in paid:
+        month = months.setdefault(payment.payment_date.strftime('%Y-%m'), {'payments': [], 'teachers': set()})
+        month['payments'].append(payment)
+        month['teachers'].add(payment.course.teacher)
+    monthly_stats = []
+    for month, data in sorted(months.items()):
+        revenue = float(sum(payment.amount for payment in data['payments']))
+        expenses = sum(float(teacher.salary) for teacher in data['teachers'])
+        monthly_stats.append({
+            'month': month, 'revenue': revenue, 'expenses': expenses,
+            'profit': revenue - expenses, 'count': len(data['payments'])
+        })
+
+    teacher_stats = []
+    for teacher in Teacher.objects.all():
+        teacher_payments = [payment for payment in paid if payment.course.teacher_id == teacher.pk]
+        if not teacher_payments:
+            continue
+        active_months = {payment.payment_date.strftime('%Y-%m') for payment in teacher_payments}
+        total_salary = float(teacher.salary) * len(active_months)
+        total_revenue = float(sum(payment.amount for payment in teacher_payments))
+        teacher_stats.append({
+            'name': f'{teacher.last_name} {teacher.first_name}',
+            'total_salary': total_salary,
+            'total_revenue': total_revenue,
+            'total_students': len(teacher_payments),
+            'courses_count': Course.objects.filter(teacher=teacher).count(),
+            'efficiency': round(total_salary / total_revenue * 100 if total_revenue > 0 else 0, 2)
+        })
+
+    total_payments = sum(month['revenue'] for month in monthly_stats)
+    total_salaries = sum(month['expenses'] for month in monthly_stats)
+    return {
+        'total_payments': total_payments,
+        'total_teacher_salaries': total_salaries,
+        'total_profit': total_payments - total_salaries,
+        'monthly_stats': monthly_stats,
+        'teacher_stats': sorted(teacher_stats, key=lambda x: x['total_revenue'], reverse=True),
+        'detailed_data': [
+            {
+                'date': payment.payment_date.strftime('%Y-%m-%d'),
+                'course': payment.course.name,
+                'customer': f'{payment.customer.last_name} {payment.customer.first_name}',
+                'amount': float(payment.amount),
+                'status': payment.status
+            }
+            for payment in payments
+        ],
+    }
+
+
+class FinancialReportTests(TestCase):
+    """Checks the report against values computed by hand for a small dataset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_payments()
+
+    def assertReport(self, report, expected):
+        self.assertEqual(
+            sorted(report.pop('detailed_data'), key=detail_key),
+            sorted(expected.pop('detailed_data'), key=detail_key)
+        )
+        self.assertEqual(report, expected)
+
+    def test_whole_period(self):
+        expected = {
+            'total_payments': 1750.0,
+            'total_teacher_salaries': 5000.0,
+            'total_profit': -3250.0,
+            'monthly_stats': [
+                {'month': '2024-01', 'revenue': 600.0, 'expenses': 1000.0, 'profit': -400.0, 'count': 2},
+                {'month': '2024-02', 'revenue': 650.0, 'expenses': 2500.0, 'profit': -1850.0, 'count': 2},
+                {'month': '2024-03', 'revenue': 500.0, 'expenses': 1500.0, 'profit': -1000.0, 'count': 1},
+            ],
+            'teacher_stats': [
+                {'name': 'Petrova Maria', 'total_salary': 3000.0, 'total_revenue': 1000.0,
+                 'total_students': 2, 'courses_count': 1, 'efficiency': 300.0},
+                {'name': 'Ivanov Ivan', 'total_salary': 2000.0, 'total_revenue': 750.0,
+                 'total_students': 3, 'courses_count': 2, 'efficiency': 266.67},
+            ],
+            'detailed_data': [
+                {'date': '2024-01-10', 'course': 'A', 'customer': 'Smirnov Oleg', 'amount': 300.0, 'status': 'paid'},
+                {'date': '2024-01-20', 'course': 'A', 'customer': 'Kuznetsova Anna', 'amount': 300.0, 'status': 'paid'},
+                {'date': '2024-01-15', 'course': 'B', 'customer': 'Popov Pavel', 'amount': 500.0, 'status': 'pending'},
+                {'date': '2024-02-05', 'course': 'B', 'customer': 'Smirnov Oleg', 'amount': 500.0, 'status': 'paid'},
+                {'date': '2024-02-25', 'course': 'C', 'customer': 'Kuznetsova Anna', 'amount': 150.0, 'status': 'paid'},
+                {'date': '2024-03-03', 'course': 'A', 'customer': 'Popov Pavel', 'amount': 300.0, 'status': 'refunded'},
+                {'date': '2024-03-20', 'course': 'B', 'customer': 'Popov Pavel', 'amount': 500.0, 'status': 'paid'},
+            ],
+        }
+        self.assertReport(build_financial_report(), dict(expected))
+
+        # Закрытые месяцы читаются из снимков, но итоги остаются прежними
+        close_month('2024-01')
+        close_month('2024-02')
+        self.assertReport(build_financial_report(), expected)
+
+    def test_partial_months(self):
+        expected = {
+            'total_payments': 800.0,
+            'total_teacher_salaries': 2500.0,
+            'total_profit': -1700.0,
+            'monthly_stats': [
+                {'month': '2024-01', 'revenue': 300.0, 'expenses': 1000.0, 'profit': -700.0, 'count': 1},
+                {'month': '2024-02', 'revenue': 500.0, 'expenses': 1500.0, 'profit': -1000.0, 'count': 1},
+            ],
+            'teacher_stats': [
+                {'name': 'Petrova Maria', 'total_salary': 1500.0, 'total_revenue': 500.0,
+                 'total_students': 1, 'courses_count': 1, 'efficiency': 300.0},
+                {'name': 'Ivanov Ivan', 'total_salary': 1000.0, 'total_revenue': 300.0,
+                 'total_students': 1, 'courses_count': 2, 'efficiency': 333.33},
+            ],
+            'detailed_data': [
+                {'date': '2024-01-20', 'course': 'A', 'customer': 'Kuznetsova Anna', 'amount': 300.0, 'status': 'paid'},
+                {'date': '2024-01-15', 'course': 'B', 'customer': 'Popov Pavel', 'amount': 500.0, 'status': 'pending'},
+                {'date': '2024-02-05', 'course': 'B', 'customer': 'Smirnov Oleg', 'amount': 500.0, 'status': 'paid'},
+            ],
+        }
+        self.assertReport(build_financial_report(to_date('2024-01-15'), to_date('2024-02-10')), expected)
+
+    def test_matches_the_row_by_row_report(self):
+        for start_date, end_date in (
+            (None, None), ('2024-01-01', '2024-03-31'), ('2024-01-15', '2024-02-10'),
+            ('2024-02-01', '2024-02-29'), ('2024-03-04', '2024-12-31'), ('2023-01-01', '2023-12-31'),
+        ):
+            with self.subTest(start_date=start_date, end_date=end_date):
+                start_date, end_date = start_date and to_date(start_date), end_date and to_date(end_date)
+                self.assertReport(build_financial_report(start_date, end_date), legacy_report(start_date, end_date))
+
+
+class FinancialReportViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_payments()
+        cls.user = User.objects.create_user('report', password='report')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse('financial-report'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def test_sections(self):
+        response = self.get(sections=' monthly , totals')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'total_payments': 1750.0,
+            'total_teacher_salaries': 5000.0,
+            'total_profit': -3250.0,
+            'monthly_stats': [
+                {'month': '2024-01', 'revenue': 600.0, 'expenses': 1000.0, 'profit': -400.0, 'count': 2},
+                {'month': '2024-02', 'revenue': 650.0, 'expenses': 2500.0, 'profit': -1850.0, 'count': 2},
+                {'month': '2024-03', 'revenue': 500.0, 'expenses': 1500.0, 'profit': -1000.0, 'count': 1},
+            ],
+        })
+
+        data = self.get(start_date='2024-02-01', end_date='2024-02-29', sections='teachers').json()
+        self.assertEqual(list(data), ['teacher_stats'])
+        self.assertEqual([teacher['name'] for teacher in data['teacher_stats']], ['Petrova Maria', 'Ivanov Ivan'])
+
+        data = self.get(sections='detail').json()
+        self.assertEqual(list(data), ['detailed_data'])
+        self.assertEqual(len(data['detailed_data']), 7)
+
+    def test_sections_share_the_activity(self):
+        # Итоги, помесячная статистика и преподаватели считаются по одной выборке активности
+        activity = mock.Mock(wraps=financial_report.get_teacher_monthly_activity)
+        payments = mock.Mock(wraps=financial_report.get_filtered_payments)
+        with mock.patch.object(financial_report, 'get_teacher_monthly_activity', activity), \
+                mock.patch.object(financial_report, 'get_filtered_payments', payments):
+            data = self.get(sections='totals,monthly,teachers').json()
+            self.assertEqual(activity.call_count, 1)
+            self.assertEqual(payments.call_count, 0)
+            self.assertEqual(list(data), [
+                'total_payments', 'total_teacher_salaries', 'total_profit', 'monthly_stats', 'teacher_stats'
+            ])
+
+            self.get(start_date='2024-01-15', end_date='2024-03-10', sections='detail')
+            self.assertEqual(activity.call_count, 1)
+            self.assertEqual(payments.call_count, 1)
+
+    def test_unknown_sections(self):
+        for sections in ('salaries', 'totals,salaries,bonus'):
+            with self.subTest(sections=sections):
+                response = self.get(sections=sections)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Неизвестные разделы отчета', response.json()['detail'])
+        self.assertEqual(self.get(sections='totals,bonus').json(), {'detail': 'Неизвестные разделы отчета: bonus'})
+
+    def test_invalid_period(self):
+        for params in (
+            {'start_date': 'bad', 'end_date': '2024-01-31'},
+            {'start_date': '2024-01-01', 'end_date': '2024-13-01'},
+        ):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Некорректная дата', response.json()['detail'])
+
+    def test_errors_are_logged(self):
+        with mock.patch.object(financial_report, 'build_financial_report', side_effect=RuntimeError('сбой')):
+            with self.assertLogs('api.financial_report', 'ERROR') as logs:
+                response = self.get()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'сбой'})
+        self.assertIn('RuntimeError', logs.output[0])
@@ -0,0 +1,110 @@
+import json
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Customer
+from api.search import search_customers
+
+CSV_HEADER = 'last_name,first_name,middle_name,phone_number,sex,birth_date'
+
+
+def customer_row(number, **fields):
+    return {
+        'last_name': f'Импортов{number}', 'first_name': 'Иван', 'phone_number': f'+7 900 000-{number:04d}',
+        'sex': True, 'birth_date': '1990-01-01', **fields,
+    }
+
+
+def csv_body(rows):
+    lines = [CSV_HEADER]
+    for row in rows:
+        lines.append(','.join(str(row.get(field, '')) for field in CSV_HEADER.split(',')))
+    return '\n'.join(lines) + '\n'
+
+
+class CustomerImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('imports', password='imports')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def post(self, data, content_type='application/json', **params):
+        url = reverse('customers-import')
+        if params:
+            url = f'{url}?{urlencode(params)}'
+        headers = {'Authorization': f'Token {self.token.key}'}
+        if content_type is None:
+            return self.client.post(url, data, headers=headers)
+        return self.client.post(url, data, content_type=content_type, headers=headers)
+
+    def test_json(self):
+        response = self.post(json.dumps([customer_row(number) for number in range(5)]), batch_size=2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 5, 'errors': []})
+        self.assertEqual(Customer.objects.count(), 5)
+        # Новые покупатели сразу попадают в поисковый индекс и в фильтр по фамилии
+        self.assertEqual(len(search_customers('Импортов')), 5)
+        self.assertEqual(Customer.objects.filter(last_name_lower='импортов0').count(), 1)
+
+    def test_csv_body(self):
+        rows = [customer_row(number, sex='true') for number in range(3)]
+        response = self.post(csv_body(rows).encode('utf-8-sig'), content_type='text/csv')
+        self.assertEqual(response.json(), {'created': 3, 'errors': []})
+        self.assertEqual(Customer.objects.get(phone_number='+7 900 000-0002').last_name, 'Импортов2')
+
+    def test_multipart_file(self):
+        upload = SimpleUploadedFile(
+            'customers.csv', csv_body([customer_row(number, sex='false') for number in range(4)]).encode(),
+            content_type='text/csv'
+        )
+        response = self.post({'file': upload}, content_type=None)
+        self.assertEqual(response.json(), {'created': 4, 'errors': []})
+        self.assertFalse(Customer.objects.filter(sex=True).exists())
+
+    def test_row_errors(self):
+        Customer.objects.create(**customer_row(9))
+        rows = [
+            customer_row(0),
+            customer_row(1, birth_date='вчера'),
+            customer_row(2, last_name=''),
+            customer_row(9),
+            customer_row(3),
+            customer_row(0, last_name='Дубликат'),
+        ]
+        response = self.post(json.dumps(rows), batch_size=2)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([error['row'] for error in data['errors']], [1, 2, 3, 5])
+        self.assertIn('birth_date', data['errors'][0]['errors'])
+        self.assertIn('last_name', data['errors'][1]['errors'])
+        self.assertIn('phone_number', data['errors'][2]['errors'])
+        self.assertIn('phone_number', data['errors'][3]['errors'])
+        self.assertFalse(Customer.objects.filter(last_name='Дубликат').exists())
+
+    def test_invalid_requests(self):
+        body = json.dumps([customer_row(0)])
+        for batch_size in ('0', '-5', 'many'):
+            with self.subTest(batch_size=batch_size):
+                self.assertEqual(self.post(body, batch_size=batch_size).status_code, 400)
+        self.assertEqual(self.post(json.dumps({'rows': []})).status_code, 400)
+        self.assertEqual(self.post('[{"last_name": ').status_code, 400)
+        self.assertEqual(Customer.objects.count(), 0)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1000, CUSTOMER_IMPORT_MAX_SIZE=5000)
+    def test_size_limit(self):
+        # Лимит импорта не зависит от общего лимита Django на тело запроса
+        rows = [customer_row(number) for number in range(20)]
+        body = json.dumps(rows)
+        self.assertTrue(1000 < len(body.encode()) < 5000)
+        self.assertEqual(self.post(body).json()['created'], 20)
+
+        rows = [customer_row(number) for number in range(100, 200)]
+        self.assertEqual(self.post(json.dumps(rows)).status_code, 413)
+        self.assertEqual(self.post(csv_body(rows), content_type='text/csv').status_code, 413)
+        self.assertEqual(Customer.objects.count(), 20)
@@ -0,0 +1,133 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.leaderboard import SORT_METRICS, teacher_leaderboard
+from api.models import Course, Customer, Language, Payment, Teacher
+from api.periods import to_date
+from api.snapshots import close_months
+from api.tests.fixtures import load_dataset
+from api.views.financial_report import build_financial_report
+
+
+PERIODS = [
+    (None, None),
+    (to_date('2022-03-01'), to_date('2022-08-31')),
+    (to_date('2022-02-15'), to_date('2023-04-10')),
+    (to_date('2022-05-10'), to_date('2022-05-20')),
+]
+
+STATS = ('total_salary', 'total_revenue', 'total_students', 'courses_count', 'efficiency')
+SORT_FIELDS = {
+    'revenue': 'total_revenue',
+    'salary': 'total_salary',
+    'students': 'total_students',
+    'courses': 'courses_count',
+    'efficiency': 'efficiency',
+}
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('large', seed=23)
+        # Часть месяцев закрыта: рейтинг читает и снимки, и сводку, и платежи
+        close_months([datetime.date(2022, month, 1) for month in range(1, 7)], workers=0)
+        cls.user = User.objects.create_user('leaders', password='leaders')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse('financial-report-teachers'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def test_matches_report_teacher_statistics(self):
+        for start_date, end_date in PERIODS:
+            with self.subTest(period=(start_date, end_date)):
+                expected = build_financial_report(start_date, end_date, ('teachers',))['teacher_stats']
+                rows, total = teacher_leaderboard(start_date, end_date, limit=1000)
+                self.assertEqual(total, len(expected))
+                self.assertEqual(sorted(row['name'] for row in rows), sorted(row['name'] for row in expected))
+
+                # Совпадение точное, без допуска на ошибки округления
+                by_name = {row['name']: row for row in rows}
+                for stats in expected:
+                    self.assertEqual({field: by_name[stats['name']][field] for field in STATS}, {
+                        field: stats[field] for field in STATS
+                    })
+
+    def test_sorting_and_top_n(self):
+        self.assertEqual(set(SORT_FIELDS), set(SORT_METRICS))
+        for sort, field in SORT_FIELDS.items():
+            with self.subTest(sort=sort):
+                everyone, total = teacher_leaderboard(sort=sort, limit=1000)
+                values = [row[field] for row in everyone]
+                self.assertEqual(values, sorted(values, reverse=True))
+                self.assertEqual(everyone[0]['rank'], 1)
+
+                top, top_total = teacher_leaderboard(sort=sort, limit=3)
+                self.assertEqual(top, everyone[:3])
+                self.assertEqual(top_total, total)
+
+                worst, _ = teacher_leaderboard(sort=sort, order='asc', limit=1)
+                self.assertEqual(worst[0][field], min(values))
+
+    def test_pages_cover_the_leaderboard(self):
+        everyone, total = teacher_leaderboard(*PERIODS[2], limit=1000)
+        rows, offset = [], 0
+        while offset is not None:
+            data = self.get(
+                start_date='2022-02-15', end_date='2023-04-10', limit=5, offset=offset
+            ).json()
+            self.assertEqual(data['count'], total)
+            rows.extend(data['results'])
+            offset = data['next_offset']
+        self.assertEqual(rows, everyone)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get(sort='age').status_code, 400)
+        self.assertEqual(self.get(order='up').status_code, 400)
+        self.assertEqual(self.get(offset='-1').status_code, 400)
+        self.assertEqual(self.get(limit='0').status_code, 400)
+        self.assertEqual(self.get(start_date='2022-13-01', end_date='2022-12-31').status_code, 400)
+
+
+class LeaderboardCentsTests(TestCase):
+    """Sums of amounts with kopecks, which are not exact in floating point."""
+
+    @classmethod
+    def setUpTestData(cls):
+        language = Language.objects.create(name='English')
+        for number, salary in enumerate(('1000.10', '1500.20')):
+            teacher = Teacher.objects.create(
+                last_name=f'Teacher{number}', first_name='Test', phone_number=f'+7 900 000-00-0{number}',
+                sex=True, birth_date=datetime.date(1980, 1, 1), salary=Decimal(salary)
+            )
+            course = Course.objects.create(
+                name=f'Course{number}', start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 12, 31),
+                price=Decimal('0.10'), additional_info='', language=language, teacher=teacher
+            )
+            for day, amount in enumerate(('0.10', '0.20'), start=1):
+                customer = Customer.objects.create(
+                    last_name=f'Customer{number}{day}', first_name='Test', phone_number=f'+7 911 000-{number}{day:03d}',
+                    sex=False, birth_date=datetime.date(2000, 1, 1)
+                )
+                for month in (1, 2, 3):
+                    Payment.objects.create(
+                        customer=customer, course=course, payment_date=datetime.date(2024, month, day * 5),
+                        status='paid', amount=Decimal(amount)
+                    )
+
+    def test_matches_report_exactly(self):
+        for start_date, end_date in ((None, None), ('2024-01-01', '2024-03-31'), ('2024-01-12', '2024-03-14')):
+            with self.subTest(period=(start_date, end_date)):
+                start_date, end_date = start_date and to_date(start_date), end_date and to_date(end_date)
+                expected = build_financial_report(start_date, end_date, ('teachers',))['teacher_stats']
+                rows, _ = teacher_leaderboard(start_date, end_date, limit=10)
+                self.assertEqual(
+                    [{'name': row['name'], **{field: row[field] for field in STATS}} for row in rows], expected
+                )
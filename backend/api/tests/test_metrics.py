@@ -0,0 +1,105 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.metrics import MetricsRegistry, registry
+
+SERVER_TIMING_RE = re.compile(
+    r'^total;dur=(?P<total>\d+\.\d), db;dur=(?P<db>\d+\.\d);desc="(?P<queries>\d+) queries", '
+    r'app;dur=(?P<app>\d+\.\d), size;desc="(?P<size>\d+) bytes"$'
+)
+
+
+class RegistryRenderTests(TestCase):
+    def test_prometheus_text_format(self):
+        metrics = MetricsRegistry(buckets=(0.1, 1))
+        metrics.observe('GET', 'api/customers/', 0.05, 0.01, 2, 100, 200)
+        metrics.observe('GET', 'api/customers/', 0.5, 0.25, 3, 50, 404)
+        metrics.observe('POST', 'api/say "hi"/', 2, 0, 0, 0, 201)
+
+        lines = metrics.render().splitlines()
+        labels = 'method="GET",route="api/customers/"'
+        for line in (
+            '# HELP api_request_duration_seconds Wall time of API requests.',
+            '# TYPE api_request_duration_seconds histogram',
+            f'api_request_duration_seconds_bucket{{{labels},le="0.1"}} 1',
+            f'api_request_duration_seconds_bucket{{{labels},le="1"}} 2',
+            f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f'api_request_duration_seconds_sum{{{labels}}} 0.550000',
+            f'api_request_duration_seconds_count{{{labels}}} 2',
+            '# TYPE api_request_db_duration_seconds_total counter',
+            f'api_request_db_duration_seconds_total{{{labels}}} 0.260000',
+            f'api_request_queries_total{{{labels}}} 5',
+            f'api_response_bytes_total{{{labels}}} 150',
+            f'api_responses_total{{{labels},status="200"}} 1',
+            f'api_responses_total{{{labels},status="404"}} 1',
+            'api_request_duration_seconds_bucket{method="POST",route="api/say \\"hi\\"/",le="1"} 0',
+            '# TYPE financial_report_cache_entries gauge',
+            '# TYPE token_auth_cache_hits_total counter',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, lines)
+
+        # Каждая строка - комментарий или метрика со значением
+        for line in lines:
+            self.assertRegex(line, r'^(# (HELP|TYPE) \w+ .+|\w+(\{.*\})? -?\d+(\.\d+)?)$')
+
+
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Token.objects.create(user=User.objects.create_user('staff', password='staff', is_staff=True))
+        cls.user = Token.objects.create(user=User.objects.create_user('user', password='user'))
+
+    def client_for(self, token):
+        return Client(headers={'Authorization': f'Token {token.key}'})
+
+    def test_server_timing(self):
+        client = self.client_for(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('customers-list'), {'limit': 5})
+        match = SERVER_TIMING_RE.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(int(match['queries']), len(queries))
+        self.assertEqual(int(match['size']), len(response.content))
+        self.assertGreaterEqual(float(match['total']), float(match['db']))
+
+    def test_view_timings_are_appended(self):
+        # Асинхронный отчет добавляет время своих разделов после общих измерений
+        response = self.client_for(self.user).get(reverse('financial-report-async'), {'sections': 'totals'})
+        self.assertEqual(response.status_code, 200)
+        parts = response['Server-Timing'].split(', ')
+        self.assertRegex(', '.join(parts[:4]), SERVER_TIMING_RE)
+        self.assertTrue(parts[4:])
+
+    def test_metrics_endpoint(self):
+        registry.reset()
+        self.client_for(self.user).get(reverse('customers-list'), {'limit': 5})
+        self.client_for(self.user).get(reverse('customer-detail', args=[0]))
+
+        response = self.client_for(self.staff).get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('api_request_duration_seconds_count{method="GET",route="api/customers/"} 1', body)
+        self.assertIn('api_responses_total{method="GET",route="api/customers/<int:pk>/",status="404"} 1', body)
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client_for(self.user).get(reverse('metrics')).status_code, 403)
+        self.assertEqual(Client().get(reverse('metrics')).status_code, 401)
+
+    @override_settings(PERFORMANCE_METRICS={'SLOW_QUERY_MS': 0})
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            self.client_for(self.user).get(reverse('customers-list'), {'limit': 5})
+        self.assertRegex(logs.output[0], r'Slow query \d+\.\d ms in customers-list: SELECT ')
+
+    @override_settings(PERFORMANCE_METRICS={'SLOW_QUERY_MS': None})
+    def test_slow_query_log_can_be_disabled(self):
+        with self.assertNoLogs('api.performance', 'WARNING'):
+            self.client_for(self.user).get(reverse('customers-list'), {'limit': 5})
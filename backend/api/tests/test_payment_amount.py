@@ -0,0 +1,46 @@
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.models import Course, Customer, Payment
+from api.rollup import check_rollup
+from api.tests.fixtures import create_payments
+from api.views.financial_report import build_financial_report
+
+AGGREGATED = ('totals', 'monthly', 'teachers')
+
+
+class PaymentAmountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_payments()
+        cls.course = Course.objects.get(name='A')
+        cls.customer = Customer.objects.get(last_name='Smirnov')
+
+    def create_payment(self, **fields):
+        return Payment.objects.create(
+            customer=self.customer, course=self.course,
+            payment_date=datetime.date(2022, 6, 30), status='paid', **fields
+        )
+
+    def test_amount_defaults_to_course_price(self):
+        self.assertEqual(self.create_payment().amount, self.course.price)
+        payment = Payment.objects.create(
+            customer=self.customer, course=self.course,
+            payment_date=datetime.date(2022, 7, 31), status='paid', amount=Decimal('100.00')
+        )
+        payment.refresh_from_db()
+        self.assertEqual(payment.amount, Decimal('100.00'))
+
+    def test_price_change_keeps_paid_amounts(self):
+        periods = [(None, None), (datetime.date(2024, 1, 15), datetime.date(2024, 3, 10))]
+        before = [build_financial_report(start, end, AGGREGATED) for start, end in periods]
+
+        self.course.price += Decimal('1000.00')
+        self.course.save()
+
+        self.assertEqual([build_financial_report(start, end, AGGREGATED) for start, end in periods], before)
+        self.assertEqual(check_rollup(), [])
+        self.assertEqual(self.create_payment().amount, self.course.price)
+        self.assertEqual(check_rollup(), [])
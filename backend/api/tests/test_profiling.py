@@ -0,0 +1,62 @@
+import json
+import os
+import pstats
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api import middleware
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Token.objects.create(user=User.objects.create_user('staff', password='staff', is_staff=True))
+        cls.user = Token.objects.create(user=User.objects.create_user('user', password='user'))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def get(self, token=None, **params):
+        headers = {'Authorization': f'Token {token.key}'} if token else {}
+        with self.settings(PROFILING={'DIRECTORY': self.directory, 'PROFILER': 'cprofile'}):
+            return Client(headers=headers).get(reverse('customers-list'), {'limit': 5, **params})
+
+    def test_staff_request_is_profiled(self):
+        response = self.get(self.staff, profile='1')
+        self.assertEqual(response.status_code, 200)
+
+        name = response['X-Profile']
+        self.assertEqual(os.path.dirname(name), '')
+        self.assertTrue(name.endswith('.prof'))
+        self.assertEqual(sorted(os.listdir(self.directory)), [name, name[:-len('.prof')] + '.sql.json'])
+
+        stats = pstats.Stats(os.path.join(self.directory, name))
+        self.assertTrue(stats.total_calls)
+        with open(os.path.join(self.directory, name[:-len('.prof')] + '.sql.json'), encoding='utf-8') as sql:
+            queries = json.load(sql)
+        self.assertEqual(queries['profiler'], 'cprofile')
+        self.assertTrue(queries['path'].startswith(reverse('customers-list')))
+        self.assertTrue(any('api_customer' in query['sql'] for query in queries['queries']))
+
+    def test_other_requests_are_not_profiled(self):
+        with mock.patch.object(middleware, 'profile_request') as profile_request:
+            # Без параметра пользователь даже не проверяется
+            with mock.patch.object(middleware, 'is_staff') as is_staff:
+                response = self.get(self.staff)
+            is_staff.assert_not_called()
+            self.assertFalse(response.has_header('X-Profile'))
+
+            for token in (self.user, Token(key='invalid')):
+                with self.subTest(token=token.key):
+                    response = self.get(token, profile='1')
+                    self.assertFalse(response.has_header('X-Profile'))
+            self.assertEqual(self.get(profile='1').status_code, 401)
+        profile_request.assert_not_called()
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,348 @@
+import datetime
+import re
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api import urls
+from api.authentication import sign_download
+from api.models import Course, Customer, Payment
+from api.query_plans import explain_report_queries
+from api.report_cache import normalize_period
+from api.report_jobs import submit_job
+from api.snapshots import close_months
+from api.synthetic import clear_dataset
+from api.tests.fixtures import START_DATE, load_dataset
+
+# Период с неполными первым и последним месяцами: отчет читает и сводку, и платежи
+PERIOD = {'start_date': '2023-01-15', 'end_date': '2023-12-20'}
+
+# Максимальное число SQL-запросов на один запрос к API, включая аутентификацию
+QUERY_BUDGETS = {
+    'login': 3,
+    'logout': 2,
+    'customers-list': 3,
+    'customers-list-page': 3,
+    'customers-list-filter': 3,
+    'customers-list-fields': 3,
+    'customers-list-not-modified': 2,
+    'customers-create': 6,
+    'customers-update': 19,
+    'customers-bulk-update': 20,
+    'customers-delete': 18,
+    'customers-bulk-delete': 18,
+    'customers-import': 8,
+    'customers-search': 3,
+    'customers-search-phone': 2,
+    'customer-detail': 3,
+    'customer-detail-not-modified': 2,
+    'customer-detail-update': 19,
+    'customer-detail-delete': 19,
+    'financial-report': 5,
+    'financial-report-period': 7,
+    'financial-report-cached': 2,
+    'financial-report-not-modified': 2,
+    'financial-report-sections': 6,
+    'financial-report-async': 7,
+    'financial-report-detail': 2,
+    'financial-report-detail-ndjson': 2,
+    'financial-report-export': 6,
+    'financial-report-export-xlsx': 6,
+    'financial-report-export-signed': 6,
+    'financial-report-export-link': 1,
+    'financial-report-cache': 1,
+    'financial-report-periods': 2,
+    'financial-report-periods-close': 6,
+    'financial-report-teachers': 2,
+    'financial-report-teachers-page': 2,
+    'financial-report-jobs': 15,
+    'financial-report-job': 2,
+    'financial-report-job-result': 2,
+    'analytics-cube': 2,
+    'analytics-cube-filter': 2,
+    'metrics': 1,
+}
+
+# Строки плана SQLite, означающие полный просмотр таблицы
+FULL_SCAN_RE = re.compile(r'^SCAN (?!CONSTANT ROW)\S+$')
+
+
+def customer_data(phone_number, **fields):
+    return {
+        'last_name': 'Проверкин',
+        'first_name': 'Тест',
+        'middle_name': 'Тестович',
+        'phone_number': phone_number,
+        'sex': True,
+        'birth_date': '1990-05-01',
+        **fields,
+    }
+
+
+# Асинхронный отчет и фоновые задания выполняют запросы в потоке запроса, чтобы их можно было посчитать;
+# способ расчета задан явно, чтобы число запросов не зависело от того, установлен ли NumPy.
+# Сверка версии кэша токенов выполняется не чаще раза в секунду и здесь не считается
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    TOKEN_AUTH_CACHE={'ALIAS': 'auth'},
+    FINANCIAL_REPORT_ASYNC={'MAX_WORKERS': 0},
+    FINANCIAL_REPORT_ENGINE={'ENGINE': 'sql'},
+    REPORT_JOBS={'MAX_WORKERS': 0},
+)
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class that loads a synthetic dataset and sends API requests.
+
+    Every dataset gets an extra customer with three payments in different
+    months, so the write requests touch the same number of rows whatever
+    the size of the dataset. A second customer pays for the same courses
+    in the same months, so deleting the first one always updates the
+    rollup rows instead of removing them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', password='budget', is_staff=True)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def clear_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def setUp(self):
+        self.clear_caches()
+        self.client = Client(headers={'Authorization': f'Token {self.token.key}'})
+
+    def load(self, name):
+        clear_dataset()
+        load_dataset(name)
+        self.customer, companion = [
+            Customer.objects.create(**customer_data(phone_number, birth_date=datetime.date(1990, 5, 1)))
+            for phone_number in ('+7 (999) 000-00-01', '+7 (999) 000-00-09')
+        ]
+        for month, course in zip((2, 5, 9), Course.objects.order_by('id')[:3]):
+            for payer in (self.customer, companion):
+                Payment.objects.create(
+                    customer=payer, course=course,
+                    payment_date=datetime.date(2023, month, 10), status='paid'
+                )
+        # Первый год закрыт: отчеты читают и снимки, и сводку
+        close_months([datetime.date(START_DATE.year, month, 1) for month in range(1, 13)], workers=0)
+        self.job, _ = submit_job(*normalize_period(**PERIOD), ('totals', 'monthly'))
+
+    def cases(self):
+        """
+        Returns the measured requests as (label, method, url, data, options).
+        """
+        customer = self.customer.pk
+        customers = reverse('customers-list')
+        detail = reverse('customer-detail', args=[customer])
+        report = reverse('financial-report')
+        return [
+            ('login', 'post', reverse('login'), {'username': 'budget', 'password': 'budget'}, {}),
+            ('logout', 'post', reverse('logout'), {}, {}),
+            ('customers-list', 'get', customers, {}, {}),
+            ('customers-list-page', 'get', customers, {'limit': 20}, {}),
+            ('customers-list-filter', 'get', customers, {'sex': 'true', 'name': 'Ив', 'limit': 20}, {}),
+            ('customers-list-fields', 'get', customers, {'fields': 'id,last_name', 'limit': 20}, {}),
+            ('customers-list-not-modified', 'get', customers, {'limit': 20}, {'conditional': True}),
+            ('customers-create', 'post', customers, customer_data('+7 (999) 000-00-02'), {'json': True}),
+            ('customers-update', 'put', customers,
+             customer_data('+7 (999) 000-00-03', id=customer), {'json': True}),
+            ('customers-bulk-update', 'patch', customers,
+             {'ids': [customer], 'data': {'first_name': 'Петр'}}, {'json': True}),
+            ('customers-delete', 'delete', customers, {'id': customer}, {'json': True}),
+            ('customers-bulk-delete', 'delete', customers, {'ids': [customer]}, {'json': True}),
+            ('customers-import', 'post', reverse('customers-import'), [
+                customer_data(f'+7 (999) 100-00-0{i}') for i in range(3)
+            ], {'json': True}),
+            ('customers-search', 'get', reverse('customers-search'), {'q': 'Иван'}, {}),
+            ('customers-search-phone', 'get', reverse('customers-search'), {'q': '+7 (900) 00'}, {}),
+            ('customer-detail', 'get', detail, {}, {}),
+            ('customer-detail-not-modified', 'get', detail, {}, {'conditional': True}),
+            ('customer-detail-update', 'put', detail, customer_data('+7 (999) 000-00-04'), {'json': True}),
+            ('customer-detail-delete', 'delete', detail, {}, {}),
+            ('financial-report', 'get', report, {}, {}),
+            ('financial-report-period', 'get', report, PERIOD, {}),
+            ('financial-report-cached', 'get', report, PERIOD, {'warm': True}),
+            ('financial-report-not-modified', 'get', report, PERIOD, {'conditional': True}),
+            ('financial-report-sections', 'get', report, {**PERIOD, 'sections': 'totals,teachers'}, {}),
+            ('financial-report-async', 'get', reverse('financial-report-async'), PERIOD, {}),
+            ('financial-report-detail', 'get', reverse('financial-report-detail'), {**PERIOD, 'limit': 50}, {}),
+            ('financial-report-detail-ndjson', 'get', reverse('financial-report-detail'),
+             {**PERIOD, 'stream': 'ndjson'}, {}),
+            ('financial-report-export', 'get', reverse('financial-report-export'), {**PERIOD, 'type': 'csv'}, {}),
+            ('financial-report-export-xlsx', 'get', reverse('financial-report-export'),
+             {**PERIOD, 'type': 'xlsx'}, {}),
+            ('financial-report-export-signed', 'get', reverse('financial-report-export'),
+             {**PERIOD, 'type': 'csv'}, {'signed': True}),
+            ('financial-report-export-link', 'get', reverse('financial-report-export-link'),
+             {**PERIOD, 'type': 'csv'}, {}),
+            ('financial-report-cache', 'get', reverse('financial-report-cache'), {}, {}),
+            ('financial-report-periods', 'get', reverse('financial-report-periods'), {}, {}),
+            ('financial-report-periods-close', 'post', reverse('financial-report-periods'),
+             {'month': '2023-05'}, {'json': True}),
+            ('financial-report-teachers', 'get', reverse('financial-report-teachers'), {'limit': 3}, {}),
+            ('financial-report-teachers-page', 'get', reverse('financial-report-teachers'),
+             {**PERIOD, 'sort': 'efficiency', 'order': 'asc', 'limit': 2, 'offset': 2}, {}),
+            ('financial-report-jobs', 'post', reverse('financial-report-jobs'), PERIOD, {'json': True}),
+            ('financial-report-job', 'get', reverse('financial-report-job', args=[self.job.pk]), {}, {}),
+            ('financial-report-job-result', 'get', reverse('financial-report-job-result', args=[self.job.pk]),
+             {}, {}),
+            ('analytics-cube', 'get', reverse('analytics-cube'), {'dimensions': 'language,month'}, {}),
+            ('analytics-cube-filter', 'get', reverse('analytics-cube'), {
+                'dimensions': 'teacher,age_band', 'measures': 'fill_rate,avg_grade',
+                'start_month': '2023-01', 'end_month': '2023-12', 'sex': 'false',
+            }, {}),
+            ('metrics', 'get', reverse('metrics'), {}, {}),
+        ]
+
+    def send(self, method, url, data, options, headers=None):
+        if options.get('json'):
+            response = getattr(self.client, method)(url, data, content_type='application/json', headers=headers)
+        else:
+            response = getattr(self.client, method)(url, data, headers=headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    def measure(self, method, url, data, options):
+        """
+        Sends a request and rolls back its writes.
+
+        All caches, including the token cache, are cleared first, so every
+        request is measured cold. A conditional request repeats the ETag of
+        a first, unmeasured response; a signed request is sent without the
+        token, as a download link.
+
+        Returns:
+            A tuple (response, captured queries).
+        """
+        self.clear_caches()
+        headers = None
+        if options.get('warm'):
+            self.send(method, url, data, options)
+        if options.get('conditional'):
+            headers = {'If-None-Match': self.send(method, url, data, options)['ETag']}
+            self.clear_caches()
+        if options.get('signed'):
+            # Ссылка для скачивания: без токена, с подписью в параметрах
+            data = {**data, 'signature': sign_download(self.user, url, {key: [value] for key, value in data.items()})}
+            headers = {'Authorization': ''}
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                response = self.send(method, url, data, options, headers)
+            transaction.set_rollback(True)
+        return response, context.captured_queries
+
+    def measure_all(self):
+        counts = {}
+        for label, method, url, data, options in self.cases():
+            response, queries = self.measure(method, url, data, options)
+            if options.get('conditional'):
+                self.assertEqual(response.status_code, 304, label)
+            else:
+                self.assertLess(response.status_code, 300, f'{label}: {response.status_code}')
+            counts[label] = len(queries)
+        return counts
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    def assertWithinBudget(self, counts):
+        for label, count in counts.items():
+            with self.subTest(request=label):
+                self.assertLessEqual(count, QUERY_BUDGETS[label])
+
+    def test_small_dataset_within_budget(self):
+        self.load('medium')
+        self.assertWithinBudget(self.measure_all())
+
+    def test_large_dataset_within_budget(self):
+        self.load('huge')
+        self.assertWithinBudget(self.measure_all())
+
+    def test_query_count_does_not_grow_with_row_count(self):
+        self.load('medium')
+        small = self.measure_all()
+        self.load('huge')
+        large = self.measure_all()
+        for label in small:
+            with self.subTest(request=label):
+                self.assertEqual(large[label], small[label])
+
+    def test_every_route_is_measured(self):
+        self.load('medium')
+        measured = {
+            url for _, _, url, _, _ in self.cases()
+        }
+        values = {'pk': self.customer.pk, 'job_id': self.job.pk}
+        for pattern in urls.urlpatterns:
+            kwargs = {name: values[name] for name in pattern.pattern.converters}
+            with self.subTest(route=pattern.name):
+                self.assertIn(reverse(pattern.name, kwargs=kwargs), measured)
+
+    def test_every_request_has_a_budget(self):
+        self.load('medium')
+        self.assertEqual({label for label, *_ in self.cases()}, set(QUERY_BUDGETS))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is specific to SQLite')
+class QueryPlanTests(QueryBudgetTestCase):
+    """Checks that the main report and customer queries use indexes."""
+
+    PLANNED = (
+        'customers-list-page',
+        'customers-list-filter',
+        'customers-search',
+        'customers-search-phone',
+        'customer-detail',
+        'financial-report-period',
+        'financial-report-detail',
+        'financial-report-export',
+    )
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+
+    def test_no_full_table_scans(self):
+        self.load('huge')
+
+        for label, method, url, data, options in self.cases():
+            if label not in self.PLANNED:
+                continue
+            _, queries = self.measure(method, url, data, options)
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                plan = self.explain(query['sql'])
+                with self.subTest(request=label, sql=query['sql'][:120]):
+                    self.assertFalse(
+                        [step for step in plan if FULL_SCAN_RE.match(step)],
+                        f'Full table scan: {plan}'
+                    )
+
+    def test_report_queries_use_payment_indexes(self):
+        self.load('huge')
+        output = StringIO()
+        call_command(
+            'explain_report_queries', '--start-date', PERIOD['start_date'], '--end-date', PERIOD['end_date'],
+            '--fail-on-scan', 'api_payment', stdout=output
+        )
+
+        results = explain_report_queries(*normalize_period(**PERIOD))
+        used = {index for result in results for index in result['indexes']}
+        # Неполные месяцы читаются по (status, payment_date, ...), пересчет сводки - по (course, payment_date, ...)
+        self.assertTrue(any(index.startswith('api_payment_status') for index in used), used)
+        self.assertTrue(any(index.startswith('api_payment_course_') for index in used), used)
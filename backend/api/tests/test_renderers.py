@@ -0,0 +1,105 @@
+import datetime
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.renderers import columnar, msgpack_available
+from api.tests.fixtures import load_dataset
+
+COLUMNAR = 'application/vnd.columnar+json'
+
+
+def from_columns(table):
+    rows = []
+    for row in table['rows']:
+        values = dict(zip(table['columns'], row))
+        for column, dictionary in table['dictionaries'].items():
+            if values[column] is not None:
+                values[column] = dictionary[values[column]]
+        rows.append(values)
+    return rows
+
+
+class ColumnarFormatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('large', seed=3)
+        cls.user = User.objects.create_user('columns', password='columns')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, name, accept=None, **params):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        if accept:
+            headers['Accept'] = accept
+        return self.client.get(reverse(name), params, headers=headers)
+
+    def test_columnar_keeps_other_values(self):
+        data = {
+            'total_payments': 10.0,
+            'detailed_data': [
+                {'date': '2022-01-10', 'status': 'paid'},
+                {'date': '2022-01-11', 'status': 'paid'},
+                {'date': '2022-01-12', 'status': None},
+            ],
+            'next_cursor': None,
+        }
+        self.assertEqual(columnar(data), {
+            'total_payments': 10.0,
+            'detailed_data': {
+                'columns': ['date', 'status'],
+                'dictionaries': {'status': ['paid']},
+                'rows': [['2022-01-10', 0], ['2022-01-11', 0], ['2022-01-12', None]],
+            },
+            'next_cursor': None,
+        })
+        self.assertEqual(columnar([]), {'columns': [], 'dictionaries': {}, 'rows': []})
+        self.assertEqual(columnar({'detail': 'Ошибка'}), {'detail': 'Ошибка'})
+
+    def test_report_tables_are_columnar(self):
+        plain_response = self.get('financial-report')
+        plain = plain_response.json()
+        response = self.get('financial-report', accept=COLUMNAR)
+        self.assertEqual(response['Content-Type'], COLUMNAR)
+
+        data = response.json()
+        self.assertEqual(data['total_payments'], plain['total_payments'])
+        for key in ('monthly_stats', 'detailed_data', 'teacher_stats'):
+            self.assertEqual(from_columns(data[key]), plain[key])
+        # Имена ключей передаются один раз на таблицу, повторяющиеся строки - один раз на столбец
+        self.assertLess(len(response.content) * 3, len(plain_response.content))
+
+    def test_format_parameter(self):
+        for name, params in (('customers-list', {}), ('financial-report-detail', {'limit': 100})):
+            with self.subTest(route=name):
+                plain = self.get(name, **params).json()
+                data = self.get(name, format='columnar', **params).json()
+                if 'results' in plain:
+                    data, plain = data['results'], plain['results']
+                self.assertEqual(from_columns(data), plain)
+
+    def test_json_stays_the_default(self):
+        response = self.get('customers-list', limit=5)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIsInstance(response.json()['results'], list)
+
+
+@skipUnless(msgpack_available(), 'msgpack is not installed')
+class MessagePackFormatTests(ColumnarFormatTests):
+    def test_report_in_messagepack(self):
+        import msgpack
+
+        plain = self.get('financial-report').json()
+        response = self.get('financial-report', accept='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(from_columns(data['detailed_data']), plain['detailed_data'])
+
+    def test_dates_and_decimals(self):
+        from api.renderers import encode_value
+
+        self.assertEqual(encode_value(Decimal('12.50')), 12.5)
+        self.assertEqual(encode_value(datetime.date(2022, 1, 31)), '2022-01-31')
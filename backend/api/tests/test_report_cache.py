@@ -0,0 +1,136 @@
+import calendar
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Course, Customer, Language, Payment, Teacher
+from api.tests.fixtures import load_dataset
+
+
+
+def month(number):
+    return f'2022-{number:02d}-01', f'2022-{number:02d}-{calendar.monthrange(2022, number)[1]}'
+
+
+# Январь, февраль, март, первый квартал и весь период
+PERIODS = {
+    'january': month(1),
+    'february': month(2),
+    'march': month(3),
+    'quarter': (month(1)[0], month(3)[1]),
+    'all': (None, None),
+}
+
+
+class ReportCacheInvalidationTests(TestCase):
+    """A write to a month evicts exactly the cached reports covering that month."""
+
+    @classmethod
+    def setUpTestData(cls):
+        load_dataset('small', seed=19)
+        # Преподаватель, курс и покупатель с единственной оплатой в феврале
+        cls.teacher = Teacher.objects.create(
+            last_name='Зимний', first_name='Захар', phone_number='+7 900 111-11-11',
+            sex=True, birth_date=datetime.date(1980, 1, 1), salary=Decimal('1000.00')
+        )
+        cls.course = Course.objects.create(
+            name='Зимний интенсив', start_date=datetime.date(2022, 2, 1), end_date=datetime.date(2022, 2, 28),
+            price=Decimal('700.00'), additional_info='', language=Language.objects.first(), teacher=cls.teacher
+        )
+        cls.customer = Customer.objects.create(
+            last_name='Февральский', first_name='Федор', phone_number='+7 900 222-22-22',
+            sex=True, birth_date=datetime.date(1990, 2, 2)
+        )
+        Payment.objects.create(
+            customer=cls.customer, course=cls.course, payment_date=datetime.date(2022, 2, 14), status='paid'
+        )
+        cls.user = User.objects.create_user('cache', password='cache')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        # Счетчики версий сбрасываются вместе с базой, поэтому отчеты других тестов нужно удалить
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    def get(self, period):
+        start_date, end_date = PERIODS[period]
+        params = {'start_date': start_date, 'end_date': end_date} if start_date else {}
+        response = self.client.get(reverse('financial-report'), params, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def cache_states(self):
+        return {period: self.get(period)['X-Report-Cache'] for period in PERIODS}
+
+    def assertEvicted(self, evicted):
+        """Checks which reports were rebuilt after a write, and that they are cached again."""
+        self.assertEqual(self.cache_states(), {
+            period: 'MISS' if period in evicted else 'HIT' for period in PERIODS
+        })
+        self.assertEqual(set(self.cache_states().values()), {'HIT'})
+
+    def test_reports_are_cached(self):
+        self.assertEqual(set(self.cache_states().values()), {'MISS'})
+        self.assertEqual(set(self.cache_states().values()), {'HIT'})
+
+    def test_payment_writes(self):
+        self.cache_states()
+        payment = Payment.objects.create(
+            customer=self.customer, course=self.course, payment_date=datetime.date(2022, 3, 8), status='paid'
+        )
+        self.assertEvicted({'march', 'quarter', 'all'})
+
+        # Перенос платежа затрагивает оба месяца
+        payment.payment_date = datetime.date(2022, 1, 8)
+        payment.save()
+        self.assertEvicted({'january', 'march', 'quarter', 'all'})
+
+        payment.delete()
+        self.assertEvicted({'january', 'quarter', 'all'})
+
+        # Платеж вне закэшированных периодов вытесняет только отчет за все время
+        Payment.objects.create(
+            customer=self.customer, course=self.course, payment_date=datetime.date(2022, 10, 8), status='paid'
+        )
+        self.assertEvicted({'all'})
+
+    def test_course_and_teacher_writes(self):
+        # Курсы и зарплата входят в статистику преподавателя за месяцы его работы
+        self.cache_states()
+        self.course.price = Decimal('750.00')
+        self.course.save()
+        self.assertEvicted({'february', 'quarter', 'all'})
+
+        Course.objects.create(
+            name='Весенний интенсив', start_date=datetime.date(2022, 3, 1), end_date=datetime.date(2022, 3, 31),
+            price=Decimal('900.00'), additional_info='', language=self.course.language, teacher=self.teacher
+        )
+        self.assertEvicted({'february', 'quarter', 'all'})
+
+        self.teacher.salary += Decimal('100.00')
+        self.teacher.save()
+        self.assertEvicted({'february', 'quarter', 'all'})
+
+    def test_customer_writes_through_the_api(self):
+        self.cache_states()
+        response = self.client.put(
+            reverse('customer-detail', args=[self.customer.pk]),
+            {
+                'last_name': 'Мартовский', 'first_name': 'Федор', 'phone_number': self.customer.phone_number,
+                'sex': True, 'birth_date': '1990-02-02',
+            },
+            content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEvicted({'february', 'quarter', 'all'})
+
+        response = self.client.delete(reverse('customer-detail', args=[self.customer.pk]), headers=self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEvicted({'february', 'quarter', 'all'})
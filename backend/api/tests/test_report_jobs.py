@@ -0,0 +1,162 @@
+import datetime
+import gzip
+import json
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import ReportJob
+from api.periods import to_date
+from api.report_jobs import cleanup_jobs
+from api.tests.fixtures import load_dataset
+from api.views.financial_report import build_financial_report
+
+PERIOD = {'start_date': '2022-03-15', 'end_date': '2023-02-10'}
+
+
+class ReportJobTestMixin:
+    def setUp(self):
+        # Счетчики версий сбрасываются вместе с базой, поэтому отчеты других тестов нужно удалить
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        load_dataset('medium', seed=5)
+        self.user = User.objects.create_user('jobs', password='jobs')
+        self.token = Token.objects.create(user=self.user)
+        self.client = Client(headers={'Authorization': f'Token {self.token.key}'})
+        self.url = reverse('financial-report-jobs')
+
+    def submit(self, data):
+        return self.client.post(self.url, data, content_type='application/json')
+
+    def expected(self, sections=None):
+        return build_financial_report(
+            to_date(PERIOD['start_date']), to_date(PERIOD['end_date']), *([sections] if sections else [])
+        )
+
+
+# Задания выполняются в потоке запроса
+@override_settings(REPORT_JOBS={'MAX_WORKERS': 0})
+class ReportJobTests(ReportJobTestMixin, TestCase):
+    def test_result_matches_report(self):
+        response = self.submit(PERIOD)
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(response['Location'], job['url'])
+
+        status = self.client.get(job['url']).json()
+        self.assertEqual(status['result_url'], job['result_url'])
+
+        result = self.client.get(job['result_url'])
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json(), self.expected())
+
+    def test_result_is_sent_compressed(self):
+        job = self.submit({**PERIOD, 'sections': ['monthly', 'totals']}).json()
+        response = self.client.get(job['result_url'], headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.expected(['totals', 'monthly']))
+
+        for accept_encoding, compressed in (
+            ('gzip;q=0, deflate', False),
+            ('deflate, GZIP; q=0.5', True),
+            ('*;q=0.1', True),
+            ('*, gzip;q=0', False),
+            ('identity', False),
+        ):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.client.get(job['result_url'], headers={'Accept-Encoding': accept_encoding})
+                self.assertEqual(response.has_header('Content-Encoding'), compressed)
+
+    def test_identical_in_flight_request_is_merged(self):
+        pending = ReportJob.objects.create(
+            start_date=to_date(PERIOD['start_date']), end_date=to_date(PERIOD['end_date']),
+            sections='totals+monthly+teachers+detail'
+        )
+        response = self.submit(PERIOD)
+        self.assertEqual(response.json()['id'], str(pending.pk))
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+        result = self.client.get(reverse('financial-report-job-result', args=[pending.pk]))
+        self.assertEqual(result.status_code, 202)
+        self.assertEqual(result['Retry-After'], '2')
+
+        # Другой набор разделов считается отдельным заданием
+        self.assertNotEqual(self.submit({**PERIOD, 'sections': 'totals'}).json()['id'], str(pending.pk))
+
+    def test_orphaned_pending_job_is_queued_again(self):
+        # Задание осталось в очереди процесса, который был перезапущен
+        orphaned = ReportJob.objects.create(
+            start_date=to_date(PERIOD['start_date']), end_date=to_date(PERIOD['end_date']), sections='totals'
+        )
+        ReportJob.objects.filter(pk=orphaned.pk).update(
+            created_at=timezone.now() - datetime.timedelta(minutes=2)
+        )
+        with self.assertLogs('api.report_jobs', 'WARNING'):
+            job = self.client.get(reverse('financial-report-job', args=[orphaned.pk])).json()
+        self.assertEqual(job['status'], 'done')
+
+        orphaned = ReportJob.objects.create(
+            start_date=to_date(PERIOD['start_date']), end_date=to_date(PERIOD['end_date']), sections='monthly'
+        )
+        ReportJob.objects.filter(pk=orphaned.pk).update(
+            created_at=timezone.now() - datetime.timedelta(minutes=2)
+        )
+        with self.assertLogs('api.report_jobs', 'WARNING'):
+            job = self.submit({**PERIOD, 'sections': 'monthly'}).json()
+        self.assertEqual((job['id'], job['status']), (str(orphaned.pk), 'done'))
+        self.assertEqual(self.client.get(job['result_url']).json(), self.expected(['monthly']))
+
+    def test_failed_job(self):
+        with mock.patch('api.report_jobs.build_financial_report', side_effect=RuntimeError('boom')), \
+                self.assertLogs('api.report_jobs', 'ERROR'):
+            job = self.submit(PERIOD).json()
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'boom')
+        self.assertEqual(self.client.get(reverse('financial-report-job-result', args=[job['id']])).status_code, 500)
+
+    def test_cleanup(self):
+        old = timezone.now() - datetime.timedelta(days=2)
+        expired = ReportJob.objects.create(sections='totals', status='done', finished_at=old)
+        lost = ReportJob.objects.create(sections='monthly')
+        ReportJob.objects.filter(pk=lost.pk).update(created_at=old)
+        fresh = ReportJob.objects.create(sections='teachers')
+
+        self.assertEqual(cleanup_jobs(), 1)
+        self.assertFalse(ReportJob.objects.filter(pk=expired.pk).exists())
+        self.assertEqual(ReportJob.objects.get(pk=lost.pk).status, 'failed')
+        self.assertEqual(ReportJob.objects.get(pk=fresh.pk).status, 'pending')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.submit({'sections': 'unknown'}).status_code, 400)
+        self.assertEqual(self.submit({'start_date': 'x', 'end_date': 'y'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('financial-report-job', args=[ReportJob().pk])).status_code, 404)
+
+    def test_requires_authentication(self):
+        self.assertEqual(Client().post(self.url, PERIOD).status_code, 401)
+
+
+@override_settings(REPORT_JOBS={'MAX_WORKERS': 2})
+class ReportJobWorkerTests(ReportJobTestMixin, TransactionTestCase):
+    """
+    Jobs run in pool threads with their own database connections, so the
+    data must be committed: TransactionTestCase.
+    """
+
+    def test_job_is_computed_in_background(self):
+        job = self.submit(PERIOD).json()
+        deadline = time.monotonic() + 10
+        while job['status'] in ('pending', 'running') and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job = self.client.get(job['url']).json()
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(self.client.get(job['result_url']).json(), self.expected())
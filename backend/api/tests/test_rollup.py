@@ -0,0 +1,107 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Course, Customer, MonthlyRevenue, Payment, Teacher
+from api.rollup import check_rollup
+from api.tests.fixtures import load_dataset
+from api.views.financial_report import build_financial_report
+
+AGGREGATED = ('totals', 'monthly', 'teachers')
+PERIODS = [(None, None), (datetime.date(2022, 2, 10), datetime.date(2022, 9, 20))]
+
+
+class RollupTests(TestCase):
+    """Every write keeps MonthlyRevenue equal to a rebuild from the payments."""
+
+    def setUp(self):
+        load_dataset('small', seed=17)
+        self.course = Course.objects.order_by('id').first()
+        self.customer = Customer.objects.order_by('id').first()
+
+    def assertConsistent(self):
+        self.assertEqual(check_rollup(), [])
+
+    def test_payment_writes(self):
+        payment = Payment.objects.create(
+            customer=self.customer, course=self.course, payment_date=datetime.date(2022, 4, 30), status='pending'
+        )
+        self.assertConsistent()
+
+        payment.status = 'paid'
+        payment.save()
+        self.assertConsistent()
+
+        # Перенос в другой месяц и на другой курс обновляет обе строки сводки
+        payment.payment_date = datetime.date(2022, 11, 1)
+        payment.course = Course.objects.exclude(teacher=self.course.teacher).order_by('id').first()
+        payment.amount = Decimal('123.45')
+        payment.save()
+        self.assertConsistent()
+
+        payment.delete()
+        self.assertConsistent()
+
+    def test_course_writes(self):
+        before = [build_financial_report(start, end, AGGREGATED) for start, end in PERIODS]
+        self.course.price += Decimal('500.00')
+        self.course.save()
+        self.assertConsistent()
+        self.assertEqual([build_financial_report(start, end, AGGREGATED) for start, end in PERIODS], before)
+
+        self.course.teacher = Teacher.objects.exclude(pk=self.course.teacher_id).order_by('id').first()
+        self.course.save()
+        self.assertConsistent()
+
+        Course.objects.order_by('id').last().delete()
+        self.assertConsistent()
+
+    def test_teacher_writes(self):
+        teacher = self.course.teacher
+        teacher.salary += Decimal('250.00')
+        teacher.save()
+        self.assertConsistent()
+        self.assertEqual(
+            set(MonthlyRevenue.objects.filter(teacher=teacher).values_list('teacher_salary', flat=True)),
+            {teacher.salary}
+        )
+
+        Teacher.objects.exclude(pk=teacher.pk).order_by('id').first().delete()
+        self.assertConsistent()
+
+    def test_customer_writes_through_the_api(self):
+        user = User.objects.create_user('rollup', password='rollup')
+        headers = {'Authorization': f'Token {Token.objects.create(user=user).key}'}
+        customers = list(Customer.objects.filter(payment__status='paid').distinct().order_by('id')[:3])
+
+        response = self.client.delete(reverse('customer-detail', args=[customers[0].pk]), headers=headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertConsistent()
+
+        response = self.client.delete(
+            reverse('customers-list'), {'id': customers[1].pk}, content_type='application/json', headers=headers
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertConsistent()
+
+        response = self.client.delete(
+            reverse('customers-list'), {'ids': [customers[2].pk]}, content_type='application/json', headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertConsistent()
+
+    def test_command_rebuilds_the_rollup(self):
+        MonthlyRevenue.objects.filter(month=datetime.date(2022, 3, 1)).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_revenue_rollup', '--check-only', stdout=StringIO(), stderr=StringIO())
+
+        output = StringIO()
+        call_command('rebuild_revenue_rollup', stdout=output)
+        self.assertIn('Rollup is consistent', output.getvalue())
+        self.assertConsistent()
@@ -0,0 +1,95 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import Customer
+from api.search import search_customers
+
+CUSTOMERS = [
+    ('Иванов', 'Иван', 'Петрович', '+7 (911) 120-00-01'),
+    ('Петров', 'Иван', None, '+7 (911) 120-00-02'),
+    ('Иванова', 'Мария', 'Ивановна', '+7 (911) 130-00-03'),
+    ('Сидоров', 'Олег', None, '+7 (921) 120-00-04'),
+    ('Смирнова', 'Ирина', 'Олеговна', '+7 (911) 125-00-05'),
+]
+
+
+def names(customers):
+    return [customer.last_name for customer in customers]
+
+
+class CustomerSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for last_name, first_name, middle_name, phone_number in CUSTOMERS:
+            Customer.objects.create(
+                last_name=last_name, first_name=first_name, middle_name=middle_name,
+                phone_number=phone_number, sex=True, birth_date=datetime.date(1990, 1, 1)
+            )
+        cls.user = User.objects.create_user('search', password='search')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, **params):
+        return self.client.get(
+            reverse('customers-search'), params, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+    def test_name_prefix_is_ranked(self):
+        # Совпадение в нескольких частях имени ранжируется выше
+        found = search_customers('Ива')
+        self.assertEqual(set(names(found)), {'Иванов', 'Петров', 'Иванова'})
+        self.assertEqual(found[-1].last_name, 'Петров')
+
+        self.assertEqual(names(search_customers('иванов пет')), ['Иванов'])
+        self.assertEqual(set(names(search_customers('Олег'))), {'Сидоров', 'Смирнова'})
+        self.assertEqual(search_customers('ванов'), [])
+        self.assertEqual(search_customers('  '), [])
+
+    def test_phone_prefix(self):
+        self.assertEqual(names(search_customers('+7 (911) 12')), ['Иванов', 'Петров', 'Смирнова'])
+        self.assertEqual(names(search_customers('7921')), ['Сидоров'])
+        self.assertEqual(search_customers('8911'), [])
+
+    def test_pages_cover_the_results(self):
+        expected = [customer.pk for customer in search_customers('Ива', limit=100)]
+        found, offset = [], 0
+        while offset is not None:
+            data = self.get(q='Ива', limit=2, offset=offset).json()
+            self.assertLessEqual(len(data['results']), 2)
+            found.extend(row['id'] for row in data['results'])
+            offset = data['next_offset']
+        self.assertEqual(found, expected)
+
+        self.assertEqual(self.get(q='Ива', offset=-1).status_code, 400)
+        self.assertEqual(self.get(q='Ива', limit='many').status_code, 400)
+
+    def test_writes_update_the_index(self):
+        customer = Customer.objects.get(last_name='Сидоров')
+        customer.last_name = 'Кузнецов'
+        customer.save()
+        self.assertEqual(search_customers('Сидор'), [])
+        self.assertEqual(names(search_customers('Кузн')), ['Кузнецов'])
+
+        response = self.client.put(
+            reverse('customer-detail', args=[customer.pk]),
+            {
+                'last_name': 'Орлов', 'first_name': 'Олег', 'phone_number': customer.phone_number,
+                'sex': True, 'birth_date': '1990-01-01',
+            },
+            content_type='application/json', headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(search_customers('Кузн'), [])
+        self.assertEqual([row['id'] for row in self.get(q='Орл').json()['results']], [customer.pk])
+
+        customer.delete()
+        self.assertEqual(search_customers('Орл'), [])
+
+        Customer.objects.create(
+            last_name='Орлова', first_name='Анна', phone_number='+7 (931) 000-00-06',
+            sex=False, birth_date=datetime.date(1995, 5, 5)
+        )
+        self.assertEqual(names(search_customers('Орл')), ['Орлова'])
@@ -0,0 +1,118 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.models import ClosedMonth, ClosedMonthActivity, Payment
+from api.periods import to_date
+from api.snapshots import close_month, close_months, open_past_months
+from api.tests.fixtures import START_DATE, load_dataset
+from api.views.financial_report import build_financial_report
+
+MARCH = datetime.date(2022, 3, 1)
+
+# Весь период, целый год и период с неполными крайними месяцами
+PERIODS = [
+    (None, None),
+    (to_date('2022-01-01'), to_date('2022-12-31')),
+    (to_date('2022-02-15'), to_date('2023-04-10')),
+]
+
+AGGREGATED = ('totals', 'monthly', 'teachers')
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        load_dataset('medium', seed=11)
+
+    def reports(self):
+        return [build_financial_report(start, end, AGGREGATED) for start, end in PERIODS]
+
+    def test_closed_months_match_live_report(self):
+        expected = self.reports()
+        closed = close_months(open_past_months(), workers=0)
+
+        self.assertEqual(closed[0], START_DATE)
+        self.assertEqual(open_past_months(), [])
+        self.assertEqual(self.reports(), expected)
+
+    def test_closed_month_is_frozen(self):
+        close_month('2022-03')
+        march = (MARCH, datetime.date(2022, 3, 31))
+        april = (datetime.date(2022, 4, 1), datetime.date(2022, 4, 30))
+        frozen = build_financial_report(*march)
+        live = build_financial_report(*april, AGGREGATED)
+
+        for month in march, april:
+            for payment in Payment.objects.filter(payment_date__range=month, status='paid')[:5]:
+                payment.delete()
+
+        report = build_financial_report(*march)
+        for section in ('total_payments', 'monthly_stats', 'teacher_stats'):
+            self.assertEqual(report[section], frozen[section])
+        # Детальные строки всегда читаются из платежей
+        self.assertEqual(len(report['detailed_data']), len(frozen['detailed_data']) - 5)
+        self.assertNotEqual(build_financial_report(*april, AGGREGATED), live)
+
+    def test_month_without_payments_is_closed(self):
+        Payment.objects.filter(payment_date__range=[MARCH, datetime.date(2022, 3, 31)]).delete()
+        close_month(MARCH)
+        self.assertFalse(ClosedMonthActivity.objects.filter(month=MARCH).exists())
+        report = build_financial_report(MARCH, datetime.date(2022, 3, 31), AGGREGATED)
+        self.assertEqual(report['monthly_stats'], [])
+
+    def test_only_past_months_can_be_closed_once(self):
+        close_month('2022-03')
+        with self.assertRaises(ValueError):
+            close_month('2022-03')
+        with self.assertRaises(ValueError):
+            close_months([datetime.date.today()], workers=0)
+        self.assertEqual(ClosedMonth.objects.count(), 1)
+
+    def test_command_closes_past_months(self):
+        output = StringIO()
+        call_command('close_periods', '--month', '2022-05', '--workers', '0', stdout=output)
+        self.assertIn('Closed 1 months', output.getvalue())
+
+        call_command('close_periods', '--workers', '0', stdout=output)
+        self.assertEqual(open_past_months(), [])
+
+        output = StringIO()
+        call_command('close_periods', '--workers', '0', stdout=output)
+        self.assertIn('No months to close', output.getvalue())
+
+
+class SnapshotApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='staff', is_staff=True)
+        cls.user = User.objects.create_user('user', password='user')
+
+    def post(self, user, month):
+        token, _ = Token.objects.get_or_create(user=user)
+        return self.client.post(
+            reverse('financial-report-periods'), {'month': month},
+            content_type='application/json', headers={'Authorization': f'Token {token.key}'}
+        )
+
+    def test_staff_closes_a_month(self):
+        response = self.post(self.staff, '2022-03')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['month'], '2022-03')
+        self.assertEqual(self.post(self.staff, '2022-03').status_code, 400)
+        self.assertEqual(self.post(self.staff, 'март').status_code, 400)
+        self.assertEqual(self.post(self.user, '2022-04').status_code, 403)
+
+
+class ParallelSnapshotTests(TransactionTestCase):
+    """Months are read in worker threads with their own connections: TransactionTestCase."""
+
+    def test_parallel_close_matches_serial_report(self):
+        load_dataset('medium', seed=11)
+        expected = build_financial_report(sections=AGGREGATED)
+        self.assertEqual(len(close_months(open_past_months(), workers=4)), ClosedMonth.objects.count())
+        self.assertEqual(build_financial_report(sections=AGGREGATED), expected)
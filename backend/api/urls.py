@@ -1,7 +1,14 @@
 from django.urls import path
-from .views.customers import CustomersView, CustomerDetailView
-from .views.financial_report import financial_report
+from .views.customers import CustomersView, CustomerDetailView, CustomerImportView, CustomerSearchView
+from .views.financial_report import financial_report, financial_report_cache_stats, financial_report_periods
+from .views.financial_report_async import financial_report_async
+from .views.financial_detail import financial_report_detail
+from .views.financial_export import financial_report_export, financial_report_export_link
+from .views.analytics import analytics_cube
 from .views.auth import login, logout
+from .views.leaderboard import financial_report_teachers
+from .views.metrics import metrics
+from .views.report_jobs import financial_report_job, financial_report_job_result, financial_report_jobs
 
 urlpatterns = [
     # Auth endpoints
@@ -10,6 +17,20 @@ urlpatterns = [
     
     # Existing endpoints
     path('customers/', CustomersView.as_view(), name='customers-list'),
+    path('customers/import/', CustomerImportView.as_view(), name='customers-import'),
+    path('customers/search/', CustomerSearchView.as_view(), name='customers-search'),
     path('customers/<int:pk>/', CustomerDetailView.as_view(), name='customer-detail'),
     path('financial-report/', financial_report, name='financial-report'),
+    path('financial-report/async/', financial_report_async, name='financial-report-async'),
+    path('financial-report/detail/', financial_report_detail, name='financial-report-detail'),
+    path('financial-report/export/', financial_report_export, name='financial-report-export'),
+    path('financial-report/export/link/', financial_report_export_link, name='financial-report-export-link'),
+    path('financial-report/cache/', financial_report_cache_stats, name='financial-report-cache'),
+    path('financial-report/periods/', financial_report_periods, name='financial-report-periods'),
+    path('financial-report/teachers/', financial_report_teachers, name='financial-report-teachers'),
+    path('financial-report/jobs/', financial_report_jobs, name='financial-report-jobs'),
+    path('financial-report/jobs/<uuid:job_id>/', financial_report_job, name='financial-report-job'),
+    path('financial-report/jobs/<uuid:job_id>/result/', financial_report_job_result, name='financial-report-job-result'),
+    path('analytics/cube/', analytics_cube, name='analytics-cube'),
+    path('metrics', metrics, name='metrics'),
 ]
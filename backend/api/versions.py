@@ -0,0 +1,94 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+from .periods import iter_months
+
+
+# Счетчик, который увеличивается при любой записи в область данных
+ALL_PERIODS = ''
+# Счетчик для записей, которые могут затронуть любой месяц
+ANY_MONTH = '*'
+
+
+def month_key(month):
+    """Returns the 'YYYY-MM' period key of a date."""
+    return month.strftime('%Y-%m')
+
+
+def bump(scope, months=None):
+    """
+    Increments the write version counters of a data scope.
+
+    Args:
+        scope: The name of the data scope, for example 'payment'.
+        months: Dates of the months affected by the write. If omitted, the
+            write is treated as affecting every month.
+    """
+    periods = {ALL_PERIODS}
+    if months is None:
+        periods.add(ANY_MONTH)
+    else:
+        periods.update(month_key(month) for month in months)
+
+    now = timezone.now()
+    counters = DataVersion.objects.filter(scope=scope, period__in=periods)
+    if counters.update(version=F('version') + 1, updated_at=now) == len(periods):
+        return
+
+    # Счетчики, которых еще нет, создаются по одному: их мог одновременно создать другой процесс
+    for period in periods - set(counters.values_list('period', flat=True)):
+        counter = DataVersion.objects.filter(scope=scope, period=period)
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(scope=scope, period=period, version=1)
+        except IntegrityError:
+            counter.update(version=F('version') + 1, updated_at=now)
+
+
+def version_counters(scopes, start_date=None, end_date=None):
+    """
+    Returns the ordered queryset of the counters relevant to a period.
+
+    For a bounded period only the counters of its months (and the
+    ANY_MONTH counters) are selected, so writes to other months do not
+    change them. Without a period the scope-wide counters are used.
+    """
+    if start_date and end_date:
+        periods = [ANY_MONTH] + [month_key(month) for month in iter_months(start_date, end_date)]
+    else:
+        periods = [ALL_PERIODS]
+
+    return DataVersion.objects.filter(
+        scope__in=scopes, period__in=periods
+    ).order_by('scope', 'period')
+
+
+def get_versions(scopes, start_date=None, end_date=None):
+    """
+    Returns a fingerprint of the write versions relevant to a period.
+
+    Args:
+        scopes: Names of the data scopes.
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+
+    Returns:
+        A tuple of (scope, period, version) triples.
+    """
+    return tuple(version_counters(scopes, start_date, end_date).values_list('scope', 'period', 'version'))
+
+
+def get_validators(scopes, start_date=None, end_date=None):
+    """
+    Returns the versions fingerprint together with the time of the last write.
+
+    Reads the same counters as get_versions in one query.
+
+    Returns:
+        A tuple (versions, last_modified); last_modified is None if none of
+        the counters exists yet.
+    """
+    rows = list(version_counters(scopes, start_date, end_date).values_list('scope', 'period', 'version', 'updated_at'))
+    return tuple(row[:3] for row in rows), max((row[3] for row in rows), default=None)
@@ -0,0 +1,33 @@
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from ..cube import parse_cube_query, query_cube
+
+
+@api_view(['GET'])
+def analytics_cube(request):
+    """
+    Returns measures of the analytics cube grouped by the requested dimensions.
+
+    The cube holds payments aggregated by month, course (with its language
+    and teacher), customer sex and age band, so every query is answered
+    from the precomputed cells with one grouped query. Filters slice and
+    dice the cube, and leaving dimensions out rolls the measures up.
+
+    Args:
+        request: The HTTP request object; the query parameters are described
+            in api.cube.parse_cube_query.
+
+    Returns:
+        Response: The dimensions, the measures and the rows of the result.
+    """
+    try:
+        dimensions, measures, lookups = parse_cube_query(request.query_params)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+
+    return Response({
+        'dimensions': dimensions,
+        'measures': measures,
+        'rows': query_cube(dimensions, measures, lookups),
+    })
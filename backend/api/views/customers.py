@@ -1,15 +1,80 @@
 from django.shortcuts import render, get_object_or_404
+from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from ..bulk import delete_customers, get_dry_run, select_customers, update_customers, validate_update
+from ..conditional import CUSTOMER_SCOPES, conditional_on_versions
+from ..filters import filter_customers
+from ..imports import body_too_large, get_batch_size, import_customers
 from ..models import Customer
+from ..pagination import cursor_integer, cursor_string, decode_cursor, get_limit, paginate_keyset
+from ..parsers import CSVParser, StreamingJSONParser, read_csv
+from ..renderers import TABULAR_RENDERERS
+from ..search import search_customers
 from ..serializers import CustomerSerializer
 
+CUSTOMER_ORDERING = ('last_name', 'id')
+
+
+def parse_fields(value):
+    """
+    Parses the 'fields' query parameter into a list of serializer fields.
+
+    Raises:
+        ValueError: If an unknown field is requested.
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = set(fields) - set(CustomerSerializer().fields)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    return fields
+
+
 class CustomersView(APIView):
+    renderer_classes = TABULAR_RENDERERS
+
+    @method_decorator(conditional_on_versions(CUSTOMER_SCOPES))
     def get(self, request):
-        customers = Customer.objects.all()
-        serializer = CustomerSerializer(customers, many=True)
-        return Response(serializer.data)
+        """
+        Returns the list of customers.
+
+        Query parameters:
+            - sex, birth_date_from, birth_date_to, name: Filters, see filter_customers.
+            - fields: Comma separated list of fields to return.
+            - limit, cursor: Keyset pagination ordered by (last_name, id). The list
+              is always paginated; without a limit a page has 50 customers.
+            - format: 'columnar' or 'msgpack' for a compact table, see api.renderers.
+
+        Responses carry an ETag and Last-Modified derived from the customer
+        version counter; a matching conditional request gets 304.
+        """
+        try:
+            fields = parse_fields(request.query_params.get('fields'))
+            customers = filter_customers(Customer.objects.all(), request.query_params)
+            after = decode_cursor(
+                request.query_params.get('cursor'), len(CUSTOMER_ORDERING), (cursor_string, cursor_integer)
+            )
+            limit = get_limit(request, default=50, maximum=500)
+        except (TypeError, ValueError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if fields:
+            customers = customers.only(*set(fields) | set(CUSTOMER_ORDERING))
+
+        page, next_cursor = paginate_keyset(
+            customers, CUSTOMER_ORDERING, after, limit,
+            key=lambda customer: (customer.last_name, customer.id)
+        )
+        serializer = CustomerSerializer(page, many=True, fields=fields)
+        return Response({
+            'results': serializer.data,
+            'next_cursor': next_cursor,
+        })
 
     def post(self, request):
         serializer = CustomerSerializer(data=request.data)
@@ -26,18 +91,131 @@ class CustomersView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def patch(self, request):
+        """
+        Updates several customers at once.
+
+        Body:
+            - ids or filter: The selected customers, see select_customers.
+            - data: The new field values; phone_number can not be changed.
+            - dry_run: If true, only the number of matching customers is returned.
+
+        Returns:
+            The number of updated customers.
+        """
+        try:
+            customers = select_customers(request.data)
+            data = validate_update(request.data.get('data'))
+            dry_run = get_dry_run(request)
+        except (TypeError, ValueError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'updated': update_customers(customers, data, dry_run),
+            'dry_run': dry_run,
+        })
+
     def delete(self, request):
+        """
+        Deletes a customer by 'id', or several customers by 'ids' or 'filter'.
+
+        A bulk delete removes the customers together with their payments and
+        accepts 'dry_run' to only count the rows that would be deleted.
+        """
+        if not isinstance(request.data, dict):
+            return Response({
+                'detail': 'Тело запроса должно быть объектом с id, ids или filter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'ids' in request.data or 'filter' in request.data:
+            try:
+                customers = select_customers(request.data)
+                dry_run = get_dry_run(request)
+            except (TypeError, ValueError) as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'deleted': delete_customers(customers, dry_run),
+                'dry_run': dry_run,
+            })
+
         try:
-            customer = Customer.objects.get(id=request.data.get('id'))
-            customer.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Customer.DoesNotExist:
+            customers = Customer.objects.filter(id=request.data.get('id'))
+        except (TypeError, ValueError):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        # Платежи удаляются вместе с покупателем, сводка и куб пересчитываются один раз
+        if not delete_customers(customers)['customers']:
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class CustomerImportView(APIView):
+    # JSON читается из потока, поэтому тело ограничено CUSTOMER_IMPORT_MAX_SIZE, а не лимитом Django
+    parser_classes = [StreamingJSONParser, CSVParser, MultiPartParser]
+
+    def post(self, request):
+        """
+        Imports customers from a JSON array, a CSV body or an uploaded CSV file.
+
+        Query parameters:
+            - batch_size: The number of rows validated and inserted per transaction.
+
+        Returns:
+            The number of created customers and the errors of rejected rows,
+            or 413 if the body is larger than CUSTOMER_IMPORT_MAX_SIZE.
+        """
+        if body_too_large(request):
+            return Response({
+                'detail': 'Слишком большой файл импорта'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            batch_size = get_batch_size(request.query_params.get('batch_size'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = request.data
+        if 'file' in request.FILES:
+            rows = read_csv(request.FILES['file'])
+        if not isinstance(rows, list):
+            return Response({
+                'detail': 'Ожидается массив покупателей или CSV-файл'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = import_customers(rows, batch_size)
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+
+class CustomerSearchView(APIView):
+    def get(self, request):
+        """
+        Searches customers by a part of the name or by the phone number prefix.
+
+        Query parameters:
+            - q: The search string.
+            - limit, offset: Pagination of the ranked results.
+        """
+        try:
+            limit = get_limit(request, default=20, maximum=100)
+            offset = int(request.query_params.get('offset', 0))
+            if offset < 0:
+                raise ValueError('Параметр offset не может быть отрицательным')
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        customers = search_customers(request.query_params.get('q', ''), limit + 1, offset)
+        serializer = CustomerSerializer(customers[:limit], many=True)
+        return Response({
+            'results': serializer.data,
+            'next_offset': offset + limit if len(customers) > limit else None,
+        })
+
 
 class CustomerDetailView(APIView):
     def get_object(self, pk):
         return get_object_or_404(Customer, pk=pk)
 
+    @method_decorator(conditional_on_versions(CUSTOMER_SCOPES))
     def get(self, request, pk):
         customer = self.get_object(pk)
         serializer = CustomerSerializer(customer)
@@ -53,5 +231,5 @@ class CustomerDetailView(APIView):
 
     def delete(self, request, pk):
         customer = self.get_object(pk)
-        customer.delete()
+        delete_customers(Customer.objects.filter(pk=customer.pk))
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,83 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.response import Response
+
+from ..pagination import cursor_date, cursor_integer, decode_cursor, get_limit, keyset_filter, paginate_keyset
+from ..renderers import TABULAR_RENDERERS
+from ..report_cache import normalize_period
+from .financial_report import DETAIL_FIELDS, detail_row, get_filtered_payments
+
+DETAIL_ORDERING = ('payment_date', 'id')
+STREAM_CHUNK_SIZE = 2000
+
+
+def stream_ndjson(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields detail rows as newline-delimited JSON.
+
+    Rows are read with a server-side cursor in chunks of chunk_size, and
+    every chunk is sent as soon as it is encoded, so memory usage does not
+    depend on the number of payments.
+    """
+    lines = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        lines.append(json.dumps(detail_row(row[1:]), ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+@api_view(['GET'])
+@renderer_classes(TABULAR_RENDERERS)
+def financial_report_detail(request):
+    """
+    Returns the detail rows of the financial report page by page.
+
+    Rows are ordered by (payment_date, id) and paginated with an opaque
+    cursor, so each page costs the same regardless of its position. With
+    'stream=ndjson' all rows after the cursor are streamed as NDJSON, and
+    with 'format=columnar' or 'format=msgpack' a page is sent as a compact table.
+
+    Args:
+        request: The HTTP request object containing query parameters 'start_date',
+            'end_date', 'cursor', 'limit' and 'stream'.
+
+    Returns:
+        Response: A page of detail rows with the cursor of the next page, or a
+        StreamingHttpResponse with all rows in NDJSON.
+    """
+    try:
+        start_date, end_date = normalize_period(
+            request.query_params.get('start_date'),
+            request.query_params.get('end_date')
+        )
+        after = decode_cursor(
+            request.query_params.get('cursor'), len(DETAIL_ORDERING), (cursor_date, cursor_integer)
+        )
+        limit = get_limit(request)
+    except (TypeError, ValueError) as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = get_filtered_payments(start_date, end_date).values_list('id', *DETAIL_FIELDS)
+
+    if request.query_params.get('stream') == 'ndjson':
+        if after is not None:
+            rows = rows.filter(keyset_filter(DETAIL_ORDERING, after))
+        return StreamingHttpResponse(
+            stream_ndjson(rows.order_by(*DETAIL_ORDERING)),
+            content_type='application/x-ndjson'
+        )
+
+    page, next_cursor = paginate_keyset(
+        rows, DETAIL_ORDERING, after, limit,
+        key=lambda row: (row[1], row[0])
+    )
+    return Response({
+        'results': [detail_row(row[1:]) for row in page],
+        'next_cursor': next_cursor,
+    })
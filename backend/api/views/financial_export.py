@@ -0,0 +1,209 @@
+import csv
+import tempfile
+from urllib.parse import urlencode
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from ..authentication import DownloadLinkAuthentication, get_download_link_config, sign_download
+from ..report_cache import normalize_period
+from .financial_detail import DETAIL_ORDERING, STREAM_CHUNK_SIZE
+from .financial_report import (
+    DETAIL_FIELDS,
+    detail_row,
+    get_filtered_payments,
+    get_monthly_statistics,
+    get_teacher_monthly_activity,
+    get_teacher_statistics,
+)
+
+EXPORT_TYPES = ('csv', 'xlsx')
+# Параметры выгрузки, которые переносятся в ссылку для скачивания
+EXPORT_PARAMS = ('start_date', 'end_date', 'type')
+
+DETAIL_COLUMNS = [
+    ('date', 'Дата'),
+    ('course', 'Курс'),
+    ('customer', 'Плательщик'),
+    ('amount', 'Сумма, ₽'),
+    ('status', 'Статус'),
+]
+
+MONTHLY_COLUMNS = [
+    ('month', 'Месяц'),
+    ('revenue', 'Выручка, ₽'),
+    ('expenses', 'Расходы, ₽'),
+    ('profit', 'Прибыль, ₽'),
+    ('count', 'Оплат'),
+]
+
+TEACHER_COLUMNS = [
+    ('name', 'Преподаватель'),
+    ('total_revenue', 'Доход от курсов, ₽'),
+    ('total_salary', 'Зарплата, ₽'),
+    ('efficiency', '% от дохода'),
+    ('total_students', 'Студентов'),
+    ('courses_count', 'Курсов'),
+]
+
+
+class Echo:
+    """An object that implements just the write method of the file-like interface."""
+
+    def write(self, value):
+        return value
+
+
+def iter_detail_rows(start_date, end_date):
+    rows = get_filtered_payments(start_date, end_date).values_list(
+        *DETAIL_FIELDS
+    ).order_by(*DETAIL_ORDERING)
+    for row in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        yield detail_row(row)
+
+
+def export_sections(start_date, end_date):
+    """
+    Yields the sections of the exported report.
+
+    Detail rows come first and are read from a server-side cursor, so the
+    export starts before the aggregated sections are computed.
+
+    Yields:
+        Tuples (title, columns, rows), where rows is an iterable of dictionaries.
+    """
+    yield 'Платежи', DETAIL_COLUMNS, iter_detail_rows(start_date, end_date)
+
+    activity = get_teacher_monthly_activity(start_date, end_date)
+    yield 'По месяцам', MONTHLY_COLUMNS, get_monthly_statistics(activity)
+    yield 'Преподаватели', TEACHER_COLUMNS, get_teacher_statistics(activity)
+
+
+def iter_csv(start_date, end_date):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel правильно определил кодировку UTF-8
+    yield '\ufeff'
+    for index, (title, columns, rows) in enumerate(export_sections(start_date, end_date)):
+        if index:
+            yield writer.writerow([])
+        yield writer.writerow([title])
+        yield writer.writerow([header for _, header in columns])
+        for row in rows:
+            yield writer.writerow([row[field] for field, _ in columns])
+
+
+def write_xlsx(start_date, end_date):
+    """
+    Writes the report into a temporary XLSX file in write-only mode.
+
+    openpyxl keeps the rows of a write-only worksheet in temporary files,
+    so memory usage does not depend on the number of payments.
+
+    Returns:
+        The open temporary file, positioned at its start.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for title, columns, rows in export_sections(start_date, end_date):
+        sheet = workbook.create_sheet(title)
+        sheet.append([header for _, header in columns])
+        for row in rows:
+            sheet.append([row[field] for field, _ in columns])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_filename(start_date, end_date, extension):
+    if start_date is None:
+        return f"financial_report.{extension}"
+    return f"financial_report_{start_date:%Y-%m-%d}_{end_date:%Y-%m-%d}.{extension}"
+
+
+@api_view(['GET'])
+@authentication_classes([*api_settings.DEFAULT_AUTHENTICATION_CLASSES, DownloadLinkAuthentication])
+def financial_report_export(request):
+    """
+    Exports the financial report as a CSV or XLSX file.
+
+    The export contains the detail rows, the monthly statistics and the
+    teacher statistics. CSV is streamed row by row; XLSX is written in
+    openpyxl write-only mode and sent as a file. Besides the usual
+    authentication, a link from financial_report_export_link is accepted.
+
+    Args:
+        request: The HTTP request object containing query parameters 'start_date',
+            'end_date' and 'type' ('csv' or 'xlsx').
+
+    Returns:
+        A StreamingHttpResponse with CSV or a FileResponse with XLSX.
+    """
+    try:
+        start_date, end_date = normalize_period(
+            request.query_params.get('start_date'),
+            request.query_params.get('end_date')
+        )
+    except (TypeError, ValueError) as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    export_type = request.query_params.get('type', 'csv')
+
+    if export_type == 'csv':
+        response = StreamingHttpResponse(iter_csv(start_date, end_date), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(start_date, end_date, "csv")}"'
+        return response
+
+    if export_type == 'xlsx':
+        try:
+            output = write_xlsx(start_date, end_date)
+        except ImportError:
+            return Response({
+                'detail': 'Экспорт в XLSX недоступен: не установлен пакет openpyxl'
+            }, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=export_filename(start_date, end_date, 'xlsx'),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    return Response({'detail': 'Параметр type должен быть csv или xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+def financial_report_export_link(request):
+    """
+    Returns a short-lived link that downloads the export without the token header.
+
+    The browser follows the link itself and writes the file to disk as it
+    arrives, so the page never holds the whole export in memory.
+
+    Args:
+        request: The HTTP request object containing the query parameters of
+            the export: 'start_date', 'end_date' and 'type'.
+
+    Returns:
+        Response: The absolute 'url' of the download and the number of
+        seconds it stays valid, 'expires_in'.
+    """
+    try:
+        normalize_period(request.query_params.get('start_date'), request.query_params.get('end_date'))
+    except (TypeError, ValueError) as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if request.query_params.get('type', 'csv') not in EXPORT_TYPES:
+        return Response({'detail': 'Параметр type должен быть csv или xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+
+    path = reverse('financial-report-export')
+    params = {key: [request.query_params[key]] for key in EXPORT_PARAMS if key in request.query_params}
+    params['signature'] = [sign_download(request.user, path, params)]
+    return Response({
+        'url': request.build_absolute_uri(f'{path}?{urlencode(params, doseq=True)}'),
+        'expires_in': get_download_link_config()['MAX_AGE'],
+    })
@@ -1,43 +1,193 @@
-from rest_framework.decorators import api_view
+import logging
+
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Max, F
 from django.db.models.functions import TruncMonth
-from ..models import Payment, Course, Teacher
+from ..analytics import numpy_payment_activity, use_numpy
+from ..conditional import conditional_on_versions, request_period
+from ..models import ClosedMonth, Payment, Teacher
+from ..periods import split_range, to_date
+from ..renderers import TABULAR_RENDERERS
+from ..report_cache import REPORT_SCOPES, ReportCache, normalize_period
+from ..rollup import rollup_activity_rows
+from ..snapshots import close_month, closed_activity_rows, closed_months, month_activity
 from datetime import datetime
+from functools import cached_property, partial
+from itertools import chain
+
+logger = logging.getLogger('api.financial_report')
+
+REPORT_SECTIONS = ('totals', 'monthly', 'teachers', 'detail')
 
 
 def get_filtered_payments(start_date=None, end_date=None):
     """
-    Returns a queryset of all payments, with the course prefetched.
+    Returns a queryset of all payments.
     If start_date and end_date are given, it filters the queryset by the payment date.
-    
+
     """
-    payments = Payment.objects.select_related(
-        'customer', 'course'
-    ).all()
+    payments = Payment.objects.all()
 
     if start_date and end_date:
         payments = payments.filter(payment_date__range=[start_date, end_date])
-    
+
     return payments
 
 
-def calculate_total_payments(payments):
+def payment_activity_rows(payments):
+    """
+    Returns the unevaluated, unordered queryset of get_payment_activity.
+
+    The columns match rollup_activity_rows, so the querysets can be combined.
+    """
+    return payments.filter(
+        status='paid'
+    ).annotate(
+        month=TruncMonth('payment_date')
+    ).values(
+        'month', teacher_id=F('course__teacher')
+    ).annotate(
+        salary=Max('course__teacher__salary'),
+        revenue=Sum('amount'),
+        count=Count('id')
+    )
+
+
+def get_payment_activity(payments):
+    """
+    Aggregates paid payments by (month, teacher) in a single grouped query.
+
+    Every row describes one teacher who had paid payments in one month, so
+    the result size depends on the number of active teacher-months rather
+    than on the number of payments.
+
+    Args:
+        payments: A queryset of payment objects.
+
+    Returns:
+        A list of dictionaries ordered by month and teacher, each containing:
+        - 'month': The first day of the month.
+        - 'teacher_id': The teacher of the paid courses.
+        - 'salary': The monthly salary of the teacher.
+        - 'revenue': The total paid amount of the teacher's courses for this month.
+        - 'count': The number of paid payments for this month.
+
+    """
+    return list(payment_activity_rows(payments).order_by('month', 'teacher_id'))
+
+
+def aggregate_payments(payments, engine=None):
+    """
+    Aggregates paid payments by (month, teacher) with the SQL or the NumPy engine.
+
+    Both engines return the same rows. The engine is taken from
+    FINANCIAL_REPORT_ENGINE unless given; 'auto' picks NumPy for large
+    selections when it is installed (see api.analytics).
+    """
+    if use_numpy(engine, payments):
+        return numpy_payment_activity(payments)
+    return get_payment_activity(payments)
+
+
+def get_activity_queries(start_date=None, end_date=None, engine=None):
+    """
+    Returns the independent queries that make up the activity of a period.
+
+    Whole closed months are read from their frozen snapshots, other whole
+    months from the MonthlyRevenue rollup, and only the incomplete months at
+    the edges of the period are aggregated from the payments. The queries
+    do not depend on each other and can run concurrently.
+
+    The cost of the whole months does not depend on the number of payments,
+    so the engine is only used for the edge months: a multi-year report
+    reads at most two months of payments whatever the engine.
+
+    Args:
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+        engine: The engine aggregating the payments of the edge months,
+            see aggregate_payments.
+
+    Returns:
+        A list of callables without arguments, each returning activity rows.
+    """
+    if not (start_date and end_date):
+        return [month_activity]
+
+    full_months, partial_ranges = split_range(to_date(start_date), to_date(end_date))
+
+    queries = []
+    if full_months:
+        queries.append(partial(month_activity, *full_months))
+    for start, end in partial_ranges:
+        queries.append(partial(aggregate_payments, get_filtered_payments(start, end), engine))
+    return queries
+
+
+def get_activity_rows(start_date=None, end_date=None):
+    """
+    Returns the activity of a period as one unevaluated UNION ALL queryset.
+
+    The parts are the same as in get_activity_queries, so the database can
+    aggregate the activity further, for example by teacher, in the same query.
+    """
+    if not (start_date and end_date):
+        full_months, partial_ranges = (None, None), []
+    else:
+        full_months, partial_ranges = split_range(to_date(start_date), to_date(end_date))
+
+    parts = []
+    if full_months:
+        parts.append(rollup_activity_rows(*full_months, exclude_months=closed_months()))
+        parts.append(closed_activity_rows(*full_months))
+    for start, end in partial_ranges:
+        parts.append(payment_activity_rows(get_filtered_payments(start, end)))
+    if not parts:
+        return payment_activity_rows(Payment.objects.none())
+    return parts[0].union(*parts[1:], all=True)
+
+
+def merge_activity(parts):
+    return sorted(chain.from_iterable(parts), key=lambda row: (row['month'], row['teacher_id']))
+
+
+def get_teacher_monthly_activity(start_date=None, end_date=None, engine=None):
+    """
+    Returns the (month, teacher) activity rows for the given period.
+
+    The rows are collected by the queries of get_activity_queries, so the
+    cost depends on the number of months in the period.
+
+    Args:
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+        engine: The engine aggregating payments, see aggregate_payments.
+
+    Returns:
+        Rows in the format of get_payment_activity.
+    """
+    return merge_activity(query() for query in get_activity_queries(start_date, end_date, engine))
+
+
+def calculate_total_payments(activity):
     """
     Returns the total sum of all paid payments.
 
+    Args:
+        activity: Rows returned by get_teacher_monthly_activity.
+
     """
-    return payments.filter(status='paid').aggregate(
-        total=Sum('course__price')
-    )['total'] or 0
+    return sum((row['revenue'] for row in activity), 0)
 
 
-def get_monthly_statistics(payments):
+def get_monthly_statistics(activity):
     """
     Calculates statistics for each month based on the payments.
 
     Args:
-        payments: A queryset of payment objects.
+        activity: Rows returned by get_teacher_monthly_activity.
 
     Returns:
         A list of dictionaries, each containing:
@@ -48,121 +198,107 @@ def get_monthly_statistics(payments):
         - 'count': The number of paid payments for this month.
 
     """
-    monthly_stats = []
-    monthly_data = payments.filter(
-        status='paid'
-    ).annotate(
-        month=TruncMonth('payment_date')
-    ).values('month').annotate(
-        revenue=Sum('course__price'),
-        count=Count('id')
-    ).order_by('month')
-
-    for data in monthly_data:
-        month_payments = payments.filter(
-            payment_date__year=data['month'].year,
-            payment_date__month=data['month'].month,
-            status='paid'
-        )
-        
-        teacher_salaries = calculate_teacher_salaries(month_payments)
+    months = {}
+    for row in activity:
+        month = months.setdefault(row['month'], {'revenue': 0, 'expenses': 0, 'count': 0})
+        month['revenue'] += row['revenue']
+        month['expenses'] += row['salary']
+        month['count'] += row['count']
 
+    monthly_stats = []
+    for month, data in sorted(months.items()):
         monthly_stats.append({
-            'month': data['month'].strftime('%Y-%m'),
+            'month': month.strftime('%Y-%m'),
             'revenue': float(data['revenue']),
-            'expenses': float(teacher_salaries),
-            'profit': float(data['revenue']) - float(teacher_salaries),
+            'expenses': float(data['expenses']),
+            'profit': float(data['revenue']) - float(data['expenses']),
             'count': data['count']
         })
-    
+
     return monthly_stats
 
 
-def calculate_teacher_salaries(payments):
+def calculate_teacher_salaries(activity):
     """
     Calculate the total salaries of the teachers for the given payments.
     Salary is calculated per month for each teacher who had active courses.
 
     Args:
-        payments: A Django QuerySet of Payment objects.
+        activity: Rows returned by get_teacher_monthly_activity.
 
     Returns:
         The total salaries of the teachers for the given payments.
     """
-    # Получаем уникальные месяцы из платежей
-    months = payments.dates('payment_date', 'month')
-    total_salaries = 0
-    
-    # Для каждого месяца находим активных преподавателей
-    for month in months:
-        month_payments = payments.filter(
-            payment_date__year=month.year,
-            payment_date__month=month.month
-        )
-        # Получаем уникальных преподавателей за этот месяц
-        active_teachers = set(payment.course.teacher for payment in month_payments)
-        # Добавляем их месячную зарплату
-        for teacher in active_teachers:
-            total_salaries += float(teacher.salary)
-    
-    return total_salaries
+    # Каждая строка - уникальная пара (месяц, преподаватель)
+    return float(sum((row['salary'] for row in activity), 0))
 
 
-def get_teacher_statistics(payments, start_date, end_date):
+def get_teacher_statistics(activity):
     """
     Calculate statistics for each teacher in the given payments.
     Salary is calculated per month of activity.
 
     Args:
-        payments: A Django QuerySet of Payment objects.
-        start_date: The start date of the period.
-        end_date: The end date of the period.
+        activity: Rows returned by get_teacher_monthly_activity.
 
     Returns:
         A list of dictionaries containing teacher statistics.
     """
+    totals = {}
+    for row in activity:
+        teacher = totals.setdefault(row['teacher_id'], {
+            'salary': 0, 'revenue': 0, 'students': 0
+        })
+        teacher['salary'] += row['salary']
+        teacher['revenue'] += row['revenue']
+        teacher['students'] += row['count']
+
+    # Имена и количество курсов - одним запросом для всех активных преподавателей
+    teachers = Teacher.objects.filter(
+        pk__in=list(totals)
+    ).annotate(
+        courses_count=Count('course')
+    ).values('id', 'last_name', 'first_name', 'courses_count').order_by('id')
+
     teacher_stats = []
-    
-    for teacher in Teacher.objects.all():
-        teacher_courses = Course.objects.filter(teacher=teacher)
-        total_revenue = 0
-        total_students = 0
-        
-        # Получаем все месяцы работы преподавателя
-        teacher_payments = payments.filter(
-            course__in=teacher_courses,
-            status='paid',
-            payment_date__range=[start_date, end_date]
-        )
-        active_months = teacher_payments.dates('payment_date', 'month').count()
-        
-        # Считаем общий доход и количество студентов
-        for course in teacher_courses:
-            course_payments = payments.filter(
-                course=course,
-                status='paid',
-                payment_date__range=[start_date, end_date]
-            )
-            total_revenue += sum(float(payment.course.price) for payment in course_payments)
-            total_students += course_payments.count()
-        
-        # Зарплата за все месяцы работы
-        total_salary = float(teacher.salary) * active_months
-        
-        if total_students > 0:
-            teacher_stats.append({
-                'name': f"{teacher.last_name} {teacher.first_name}",
-                'total_salary': total_salary,
-                'total_revenue': total_revenue,
-                'total_students': total_students,
-                'courses_count': teacher_courses.count(),
-                'efficiency': round((total_salary / total_revenue * 100) if total_revenue > 0 else 0, 2)
-            })
+    for teacher in teachers:
+        data = totals[teacher['id']]
+        total_salary = float(data['salary'])
+        total_revenue = float(data['revenue'])
+        teacher_stats.append({
+            'name': f"{teacher['last_name']} {teacher['first_name']}",
+            'total_salary': total_salary,
+            'total_revenue': total_revenue,
+            'total_students': data['students'],
+            'courses_count': teacher['courses_count'],
+            'efficiency': round((total_salary / total_revenue * 100) if total_revenue > 0 else 0, 2)
+        })
 
     return sorted(teacher_stats, key=lambda x: x['total_revenue'], reverse=True)
 
 
-def get_detailed_data(payments):
+DETAIL_FIELDS = (
+    'payment_date', 'course__name', 'customer__last_name',
+    'customer__first_name', 'amount', 'status'
+)
+
+
+def detail_row(values):
+    """
+    Converts a values_list row of DETAIL_FIELDS into a detail dictionary.
+
+    """
+    payment_date, course_name, last_name, first_name, amount, status = values
+    return {
+        'date': payment_date.strftime('%Y-%m-%d'),
+        'course': course_name,
+        'customer': f"{last_name} {first_name}",
+        'amount': float(amount),
+        'status': status
+    }
+
+
+def get_detailed_data(payments, cancelled=None):
     """
     Generate a list of dictionaries containing detailed information for each payment in the given queryset.
 
@@ -170,41 +306,153 @@ def get_detailed_data(payments):
         - date: The payment date in the format '%Y-%m-%d'.
         - course: The course name.
         - customer: The customer's full name.
-        - amount: The course price.
+        - amount: The paid amount.
         - status: The payment status.
 
     Args:
         payments: A Django QuerySet of Payment objects.
+        cancelled: An optional threading.Event; once it is set, reading
+            stops and the rows collected so far are returned.
 
     Returns:
         List of dictionaries containing detailed information for each payment.
 
     """
+    rows = payments.values_list(*DETAIL_FIELDS)
+    if cancelled is None:
+        return [detail_row(row) for row in rows.iterator()]
+
     detailed_data = []
-    for payment in payments:
-        customer_name = f"{payment.customer.last_name} {payment.customer.first_name}"
-
-        detailed_data.append({
-            'date': payment.payment_date.strftime('%Y-%m-%d'),
-            'course': payment.course.name,
-            'customer': customer_name,
-            'amount': float(payment.course.price),
-            'status': payment.status
-        })
+    for row in rows.iterator():
+        if cancelled.is_set():
+            break
+        detailed_data.append(detail_row(row))
     return detailed_data
 
 
+def parse_sections(value):
+    """
+    Parses the 'sections' query parameter.
+
+    Args:
+        value: A comma separated list of section names, or None for all sections.
+
+    Returns:
+        A tuple of section names in the order of REPORT_SECTIONS.
+
+    Raises:
+        ValueError: If an unknown section is requested.
+    """
+    if not value:
+        return REPORT_SECTIONS
+    requested = {section.strip() for section in value.split(',') if section.strip()}
+    unknown = requested - set(REPORT_SECTIONS)
+    if unknown:
+        raise ValueError(f"Неизвестные разделы отчета: {', '.join(sorted(unknown))}")
+    return tuple(section for section in REPORT_SECTIONS if section in requested)
+
+
+class FinancialReport:
+    """
+    Builds the sections of the financial report for a period.
+
+    Intermediate results shared by several sections, such as the filtered
+    payments and the (month, teacher) activity, are computed once on first
+    use, so a report with only some sections runs only the queries it needs.
+    The report is built from a fixed number of grouped queries, so the number
+    of SQL queries does not depend on the number of teachers, courses or payments.
+    """
+
+    def __init__(self, start_date=None, end_date=None, engine=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.engine = engine
+
+    @cached_property
+    def payments(self):
+        return get_filtered_payments(self.start_date, self.end_date)
+
+    @cached_property
+    def activity(self):
+        return get_teacher_monthly_activity(self.start_date, self.end_date, self.engine)
+
+    def totals(self):
+        total_payments = calculate_total_payments(self.activity)
+        total_teacher_salaries = calculate_teacher_salaries(self.activity)
+        return {
+            'total_payments': float(total_payments),
+            'total_teacher_salaries': float(total_teacher_salaries),
+            'total_profit': float(total_payments) - float(total_teacher_salaries),
+        }
+
+    def monthly(self):
+        return {'monthly_stats': get_monthly_statistics(self.activity)}
+
+    def teachers(self):
+        return {'teacher_stats': get_teacher_statistics(self.activity)}
+
+    def detail(self):
+        return {'detailed_data': get_detailed_data(self.payments)}
+
+    def build(self, sections=REPORT_SECTIONS):
+        """
+        Computes the requested sections.
+
+        Args:
+            sections: Names of the sections to compute.
+
+        Returns:
+            A dictionary with the keys of the requested sections.
+        """
+        data = {}
+        for section in sections:
+            data.update(getattr(self, section)())
+        return data
+
+
+def build_financial_report(start_date=None, end_date=None, sections=REPORT_SECTIONS, engine=None):
+    """
+    Builds the financial report for the given period.
+
+    Args:
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+        sections: Names of the sections to compute, all sections by default.
+        engine: The engine aggregating payments, see aggregate_payments.
+
+    Returns:
+        A dictionary with total payments, teacher salaries, profit, monthly
+        statistics, detailed data and teacher statistics, limited to the
+        requested sections.
+    """
+    return FinancialReport(start_date, end_date, engine).build(sections)
+
+
 @api_view(['GET'])
+@renderer_classes(TABULAR_RENDERERS)
+@conditional_on_versions(REPORT_SCOPES, get_period=request_period)
 def financial_report(request):
     """
     Generates a financial report based on the filtered payments within a specified date range.
 
+    Reports are served from ReportCache while the payments, courses, teachers
+    and customers of the requested months are unchanged. The 'X-Report-Cache'
+    header tells whether the report was taken from the cache. The ETag and
+    Last-Modified headers are derived from the same version counters, so a
+    conditional request for an unchanged period is answered with 304.
+
+    The optional 'sections' parameter (for example 'totals,monthly') limits
+    the report to the listed sections: totals, monthly, teachers and detail.
+    The monthly and detail tables can be requested in the columnar layout,
+    see api.renderers.
+
     Args:
-        request: The HTTP request object containing query parameters for 'start_date' and 'end_date'.
+        request: The HTTP request object containing query parameters for 'start_date',
+            'end_date' and 'sections'.
 
     Returns:
-        Response: A Django REST Framework Response object containing the financial report data, 
-        including total payments, teacher salaries, profit, monthly statistics, detailed data, 
+        Response: A Django REST Framework Response object containing the financial report data,
+        including total payments, teacher salaries, profit, monthly statistics, detailed data,
         teacher statistics.
 
     Raises:
@@ -212,27 +460,65 @@ def financial_report(request):
 
     """
     try:
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-
-        payments = get_filtered_payments(start_date, end_date)
-        total_payments = calculate_total_payments(payments)
-        monthly_stats = get_monthly_statistics(payments)
-        teacher_stats = get_teacher_statistics(payments, start_date, end_date)
-        detailed_data = get_detailed_data(payments)
-        total_teacher_salaries = calculate_teacher_salaries(payments.filter(status='paid'))
+        start_date, end_date = normalize_period(
+            request.query_params.get('start_date'),
+            request.query_params.get('end_date')
+        )
+        sections = parse_sections(request.query_params.get('sections'))
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
 
-        response_data = {
-            'total_payments': float(total_payments),
-            'total_teacher_salaries': float(total_teacher_salaries),
-            'total_profit': float(total_payments) - float(total_teacher_salaries),
-            'monthly_stats': monthly_stats,
-            'detailed_data': detailed_data,
-            'teacher_stats': teacher_stats,
-        }
+    try:
+        response_data, hit = ReportCache().get_or_build(
+            start_date, end_date,
+            lambda: build_financial_report(start_date, end_date, sections),
+            '+'.join(sections),
+            versions=getattr(request, 'data_versions', None)
+        )
 
-        return Response(response_data)
+        response = Response(response_data)
+        response['X-Report-Cache'] = 'HIT' if hit else 'MISS'
+        return response
 
     except Exception as e:
-        print(f"Error generating report: {str(e)}")
+        logger.exception('Error generating report')
         return Response({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def financial_report_cache_stats(request):
+    """
+    Returns the hit, miss and eviction counters of the financial report cache.
+
+    """
+    return Response(ReportCache().stats())
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def financial_report_periods(request):
+    """
+    Lists the closed months or closes a past month.
+
+    A closed month is served from its frozen snapshot: later changes to its
+    payments no longer affect the monthly figures, the teacher statistics
+    or the totals of any report.
+
+    Args:
+        request: The HTTP request object; a POST request contains 'month' ('YYYY-MM').
+
+    Returns:
+        Response: The closed months, or the closed month with status 201.
+    """
+    if request.method == 'POST':
+        try:
+            closed = close_month(request.data.get('month'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        return Response({'month': closed.month.strftime('%Y-%m'), 'closed_at': closed.closed_at}, status=201)
+
+    return Response([
+        {'month': month.strftime('%Y-%m'), 'closed_at': closed_at}
+        for month, closed_at in ClosedMonth.objects.order_by('month').values_list('month', 'closed_at')
+    ])
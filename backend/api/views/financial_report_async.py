@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+
+from ..authentication import get_request_user
+from ..report_cache import ReportCache, normalize_period
+from .financial_report import (
+    FinancialReport,
+    get_activity_queries,
+    get_detailed_data,
+    merge_activity,
+    parse_sections,
+)
+
+# Тот же журнал, что и у синхронного отчета
+logger = logging.getLogger('api.financial_report')
+
+DEFAULTS = {
+    'MAX_WORKERS': 4,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FINANCIAL_REPORT_ASYNC', {})}
+
+
+def get_executor():
+    """
+    Returns the thread pool for report queries, or None to run them in the request thread.
+
+    """
+    max_workers = get_config()['MAX_WORKERS']
+    if not max_workers:
+        return None
+    with _executors_lock:
+        if max_workers not in _executors:
+            _executors[max_workers] = ThreadPoolExecutor(max_workers, thread_name_prefix='financial-report')
+        return _executors[max_workers]
+
+
+def with_connection_cleanup(func):
+    # Потоки пула держат свои соединения с базой; закрываем их так же, как в конце запроса
+    def wrapper(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+async def run(func, *args):
+    """Runs a blocking function in the report thread pool."""
+    executor = get_executor()
+    if executor is None:
+        return await sync_to_async(func)(*args)
+    return await sync_to_async(with_connection_cleanup(func), thread_sensitive=False, executor=executor)(*args)
+
+
+async def timed(timings, name, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+async def activity_sections(report, sections, timings):
+    """Computes the sections built from the (month, teacher) activity."""
+    parts = await timed(timings, 'activity', asyncio.gather(
+        *(run(query) for query in get_activity_queries(report.start_date, report.end_date, report.engine))
+    ))
+    report.activity = merge_activity(parts)
+
+    data = {}
+    if 'totals' in sections:
+        data['totals'] = report.totals()
+    if 'monthly' in sections:
+        data['monthly'] = report.monthly()
+    if 'teachers' in sections:
+        data['teachers'] = await timed(timings, 'teachers', run(report.teachers))
+    return data
+
+
+async def detail_section(report, cancelled, timings):
+    rows = await timed(timings, 'detail', run(get_detailed_data, report.payments, cancelled))
+    return {'detail': {'detailed_data': rows}}
+
+
+async def build_financial_report_async(start_date, end_date, sections, cancelled, timings, engine=None):
+    """
+    Builds the financial report with the independent sections computed concurrently.
+
+    The activity queries (rollup and edge months) and the detail rows run
+    at the same time in the report thread pool, so the report takes about
+    as long as its slowest part. Totals and monthly statistics are derived
+    from the activity in memory; teacher statistics need one more query.
+
+    Args:
+        start_date: The start date of the period.
+        end_date: The end date of the period.
+        sections: Names of the sections to compute.
+        cancelled: A threading.Event that stops reading the detail rows.
+        timings: A dictionary that receives the duration of every part in ms.
+        engine: The engine aggregating payments, see aggregate_payments.
+
+    Returns:
+        The same dictionary as build_financial_report.
+    """
+    report = FinancialReport(start_date, end_date, engine)
+    tasks = []
+    if {'totals', 'monthly', 'teachers'} & set(sections):
+        tasks.append(activity_sections(report, sections, timings))
+    if 'detail' in sections:
+        tasks.append(detail_section(report, cancelled, timings))
+
+    parts = {}
+    for result in await asyncio.gather(*tasks):
+        parts.update(result)
+
+    data = {}
+    for section in sections:
+        data.update(parts[section])
+    return data
+
+
+@require_GET
+async def financial_report_async(request):
+    """
+    Asynchronous version of financial_report for ASGI servers.
+
+    Returns the same report, served from the same ReportCache. On a cache
+    miss the independent sections are computed concurrently in a bounded
+    thread pool (FINANCIAL_REPORT_ASYNC['MAX_WORKERS']). When the client
+    disconnects, Django cancels the view: pending queries are cancelled and
+    reading of the detail rows stops. The duration of every part is
+    returned in the 'Server-Timing' header.
+
+    Args:
+        request: The HTTP request object containing query parameters 'start_date',
+            'end_date' and 'sections'.
+
+    Returns:
+        JsonResponse: The financial report.
+    """
+    try:
+        user = await sync_to_async(get_request_user)(request)
+    except AuthenticationFailed as e:
+        user, error = None, e.detail
+    else:
+        error = NotAuthenticated.default_detail
+    if user is None:
+        response = JsonResponse({'detail': str(error)}, status=status.HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = 'Token'
+        return response
+
+    try:
+        sections = parse_sections(request.GET.get('sections'))
+        start_date, end_date = normalize_period(request.GET.get('start_date'), request.GET.get('end_date'))
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cache = ReportCache()
+    timings = {}
+    cancelled = threading.Event()
+    try:
+        report, key, versions = await run(cache.lookup, start_date, end_date, '+'.join(sections))
+        hit = report is not None
+        if not hit:
+            report = await build_financial_report_async(start_date, end_date, sections, cancelled, timings)
+            await run(cache.store, key, versions, report)
+    except asyncio.CancelledError:
+        # Клиент отключился: останавливаем чтение строк в потоках пула
+        cancelled.set()
+        raise
+    except Exception as e:
+        logger.exception('Error generating report')
+        return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Тот же компактный JSON, что и у JSONRenderer в DRF
+    response = JsonResponse(report, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+    response['X-Report-Cache'] = 'HIT' if hit else 'MISS'
+    if timings:
+        response['Server-Timing'] = ', '.join(f'{name};dur={duration:.1f}' for name, duration in timings.items())
+    return response
@@ -0,0 +1,56 @@
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from ..leaderboard import parse_sort, teacher_leaderboard
+from ..pagination import get_limit
+from ..report_cache import normalize_period
+
+
+def get_offset(request):
+    offset = request.query_params.get('offset', 0)
+    try:
+        offset = int(offset)
+    except ValueError:
+        raise ValueError('Параметр offset должен быть целым числом')
+    if offset < 0:
+        raise ValueError('Параметр offset не может быть отрицательным')
+    return offset
+
+
+@api_view(['GET'])
+def financial_report_teachers(request):
+    """
+    Returns one page of the teacher leaderboard for a period.
+
+    Teachers are ranked in the database, so a request for the top 10 reads
+    and serializes only ten teachers. The rows have the format of the
+    report's teacher statistics, with the rank and the teacher id added.
+
+    Args:
+        request: The HTTP request object containing query parameters for
+            'start_date', 'end_date', 'sort' (revenue, salary, students,
+            courses or efficiency), 'order' (desc or asc), 'limit' and 'offset'.
+
+    Returns:
+        Response: The ranked teachers, their total number and the offset of
+        the next page, or None on the last page.
+    """
+    try:
+        sort, order = parse_sort(request.query_params.get('sort'), request.query_params.get('order'))
+        limit = get_limit(request, default=10)
+        offset = get_offset(request)
+        start_date, end_date = normalize_period(
+            request.query_params.get('start_date'),
+            request.query_params.get('end_date')
+        )
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+
+    results, count = teacher_leaderboard(start_date, end_date, sort, order, limit, offset)
+    return Response({
+        'sort': sort,
+        'order': order,
+        'count': count,
+        'results': results,
+        'next_offset': offset + limit if offset + limit < count else None,
+    })
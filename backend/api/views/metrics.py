@@ -0,0 +1,17 @@
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from ..metrics import registry
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Returns the request metrics of this process in the Prometheus text format.
+
+    Includes per-route latency histograms, database time, query and
+    response size counters and the financial report cache counters.
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,117 @@
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from ..models import ReportJob
+from ..report_cache import normalize_period
+from ..report_jobs import decompress_report, resume_orphaned_job, submit_job
+from ..serializers import ReportJobSerializer
+from .financial_report import parse_sections
+
+# Клиенту предлагается опрашивать задание не чаще, чем раз в столько секунд
+POLL_INTERVAL = 2
+
+
+def accepts_gzip(request):
+    """
+    Tells whether the Accept-Encoding header of a request allows gzip.
+
+    Codings with q=0 are refused; 'gzip' may also be allowed by '*'.
+    """
+    weights = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    weight = weights.get('gzip', weights.get('x-gzip', weights.get('*', 0.0)))
+    return weight > 0
+
+
+@api_view(['POST'])
+def financial_report_jobs(request):
+    """
+    Starts computing the financial report in the background.
+
+    The body has the same parameters as financial_report: 'start_date',
+    'end_date' and 'sections' (a list or a comma separated string). A
+    request identical to a job that is still pending or running returns
+    that job instead of starting a new one.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        Response: The job with status 202 and its URL in the 'Location' header.
+    """
+    sections = request.data.get('sections')
+    if isinstance(sections, list):
+        sections = ','.join(str(section) for section in sections)
+    try:
+        sections = parse_sections(sections)
+        start_date, end_date = normalize_period(request.data.get('start_date'), request.data.get('end_date'))
+    except (TypeError, ValueError) as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    job, _ = submit_job(start_date, end_date, sections)
+    data = ReportJobSerializer(job).data
+    return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
+
+
+@api_view(['GET'])
+def financial_report_job(request, job_id):
+    """
+    Returns the status of a background report job.
+
+    A job left pending by a restarted process is queued again, see
+    resume_orphaned_job.
+    """
+    job = get_object_or_404(ReportJob.objects.defer('result'), pk=job_id)
+    resume_orphaned_job(job)
+    response = Response(ReportJobSerializer(job).data)
+    if job.status in ('pending', 'running'):
+        response['Retry-After'] = str(POLL_INTERVAL)
+    return response
+
+
+@api_view(['GET'])
+def financial_report_job_result(request, job_id):
+    """
+    Returns the report computed by a background job.
+
+    The report is stored gzip-compressed and is sent as is to clients that
+    accept gzip, so serving it costs no decompression or JSON encoding.
+
+    Returns:
+        The report JSON when the job is done, the job status with status 202
+        while it is pending or running, or the error with status 500.
+    """
+    job = get_object_or_404(ReportJob, pk=job_id)
+    if resume_orphaned_job(job) and job.status == 'done':
+        job.refresh_from_db(fields=['result'])
+    if job.status == 'failed':
+        return Response({'error': job.error}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if job.status != 'done':
+        return Response(
+            ReportJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Retry-After': str(POLL_INTERVAL)}
+        )
+
+    if accepts_gzip(request):
+        response = HttpResponse(bytes(job.result), content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(decompress_report(job.result))
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
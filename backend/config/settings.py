@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,12 +54,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 # Настройки REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -91,6 +94,12 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Заголовки ответа, доступные скриптам фронтенда
+CORS_EXPOSE_HEADERS = [
+    'server-timing',
+    'x-profile',
+]
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -123,6 +132,94 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Токены аутентификации: ключ токена -> (id, is_active, is_staff) пользователя, до 10000
+    # записей с временем жизни 5 минут. Redis из AUTH_CACHE_REDIS_URL (нужен пакет redis)
+    # общий для всех процессов сервера; без него кэш свой в каждом процессе, см. TOKEN_AUTH_CACHE
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['AUTH_CACHE_REDIS_URL'],
+        'TIMEOUT': 5 * 60,
+    } if os.environ.get('AUTH_CACHE_REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tokens',
+        'TIMEOUT': 5 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Кэш токенов аутентификации. Кэш в памяти процесса не видит выход и деактивацию
+# пользователя в других процессах сервера, поэтому раз в VERSION_CHECK_INTERVAL секунд
+# каждый процесс сверяет счетчик отозванных токенов в базе и при изменении очищает
+# свой кэш: в других процессах отзыв действует с задержкой до этого интервала.
+# С общим кэшем (Redis) отзыв действует сразу и проверка не нужна
+TOKEN_AUTH_CACHE = {
+    'ALIAS': 'auth',
+    'TIMEOUT': 5 * 60,
+    'VERSION_CHECK_INTERVAL': None if os.environ.get('AUTH_CACHE_REDIS_URL') else 1,
+}
+
+# Ссылки для скачивания выгрузок без заголовка с токеном: время действия в секундах
+DOWNLOAD_LINKS = {
+    'MAX_AGE': 60,
+}
+
+# Кэш финансовых отчетов: алиас кэша, максимальное число отчетов и время жизни
+FINANCIAL_REPORT_CACHE = {
+    'ALIAS': 'default',
+    'MAX_ENTRIES': 32,
+    'TIMEOUT': 60 * 60,
+}
+
+# Асинхронный финансовый отчет: число потоков для параллельного расчета разделов
+FINANCIAL_REPORT_ASYNC = {
+    'MAX_WORKERS': 4,
+}
+
+# Расчет неполных месяцев на краях периода отчета по платежам: sql, numpy или auto (NumPy,
+# если он установлен и оплат в этих месяцах не меньше NUMPY_THRESHOLD); CHUNK_SIZE - строк
+# в одном массиве. Полные месяцы читаются из сводки и снимков независимо от способа расчета.
+# На SQLite группировка в базе быстрее, поэтому по умолчанию sql
+FINANCIAL_REPORT_ENGINE = {
+    'ENGINE': 'sql',
+    'NUMPY_THRESHOLD': 200000,
+    'CHUNK_SIZE': 100000,
+}
+
+# Фоновые задания отчета: число потоков, срок хранения результатов, время, после
+# которого незавершенное задание считается прерванным, и время, после которого
+# не начатое задание снова ставится в очередь (в секундах)
+REPORT_JOBS = {
+    'MAX_WORKERS': 2,
+    'RETENTION': 24 * 60 * 60,
+    'TIMEOUT': 60 * 60,
+    'PENDING_TIMEOUT': 60,
+}
+
+# Количество покупателей, которые проверяются и вставляются за одну транзакцию при импорте
+CUSTOMER_IMPORT_BATCH_SIZE = 1000
+
+# Метрики запросов: запросы к базе дольше SLOW_QUERY_MS миллисекунд пишутся в лог api.performance
+PERFORMANCE_METRICS = {
+    'SLOW_QUERY_MS': 500,
+}
+
+# Профилирование запросов сотрудников с параметром profile=1: каталог для файлов .prof и .sql.json
+PROFILING = {
+    'DIRECTORY': BASE_DIR / 'profiles',
+}
+
+# Наибольший размер тела запроса импорта покупателей (JSON, CSV или файл) в байтах;
+# общий лимит Django DATA_UPLOAD_MAX_MEMORY_SIZE для остальных запросов не меняется
+CUSTOMER_IMPORT_MAX_SIZE = 64 * 1024 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 